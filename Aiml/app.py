@@ -28,29 +28,182 @@ Models:
   "both"      -> Confidence-adaptive blend
 """
 
+import asyncio
+import gc
+import gzip
 import hashlib
+import hmac
 import json
 import math
+import re
+import threading
 import time
 import joblib
 import numpy as np
 import pandas as pd
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+from pydantic_core import PydanticCustomError
 from typing import Optional, Dict, Any, List, Tuple
 import logging
 import os
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from logging_config import StructuredLogger, parse_category_map, setup_queue_logging
+
 # ===================================================================
 # LOGGING
 # ===================================================================
 
-logging.basicConfig(level=logging.INFO)
+# Engine records go through a queue; a background listener does JSON
+# formatting and I/O. Categories ("feasibility" per excluded crop,
+# "pipeline" per-stage notes) are sampled and rate-limited (records/s)
+# before they are queued; WARNING and above always pass. Other module
+# loggers (district_tables, shap_stage, ...) reach the same queue through
+# the root logger.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_SAMPLE_RATES = parse_category_map(
+    os.getenv("LOG_SAMPLE_RATES", "feasibility=0.05,pipeline=0.2"))
+LOG_RATE_LIMITS = parse_category_map(
+    os.getenv("LOG_RATE_LIMITS", "feasibility=10,pipeline=20"))
+
+_LOG_LISTENER, _LOG_SAMPLING = setup_queue_logging(
+    "ml_api_v7", LOG_LEVEL, LOG_SAMPLE_RATES, LOG_RATE_LIMITS,
+)
 logger = logging.getLogger("ml_api_v7")
+decision_log = StructuredLogger("ml_api_v7", LOG_LEVEL, configure_handlers=False)
+
+# ===================================================================
+# RESPONSE RENDERING — fast JSON, pre-encoded static fragments
+# ===================================================================
+
+RECOMMEND_VERSION = "9.0-ncs"
+RECOMMEND_DISCLAIMER = (
+    "This AI advisory is based on provided environmental parameters. "
+    "Consult local agricultural experts before final decision."
+)
+
+
+def _wire_default(obj: Any) -> Any:
+    """Convert NumPy values the encoder cannot handle natively."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Cannot serialise {type(obj).__name__}")
+
+
+def render_json(content: Any) -> bytes:
+    """
+    Encode with orjson when available: NumPy scalars/arrays are handled
+    natively and orjson.Fragment values are spliced in without re-encoding.
+    Falls back to the standard library with the same compact layout.
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            content, default=_wire_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(
+        content, default=_wire_default, ensure_ascii=False,
+        allow_nan=False, separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered by render_json."""
+
+    def render(self, content: Any) -> bytes:
+        return render_json(content)
+
+
+_HAS_FRAGMENT = orjson is not None and hasattr(orjson, "Fragment")
+
+
+def _fragment(value: Any) -> Any:
+    """Pre-encode a static value once (plain value when Fragment is unavailable)."""
+    return orjson.Fragment(orjson.dumps(value)) if _HAS_FRAGMENT else value
+
+
+_STATIC_FRAGMENTS = {
+    "disclaimer": (RECOMMEND_DISCLAIMER, _fragment(RECOMMEND_DISCLAIMER)),
+    "version": (RECOMMEND_VERSION, _fragment(RECOMMEND_VERSION)),
+}
+_NUTRITION_FRAGMENTS: Dict[str, Any] = {}
+
+
+def _with_fragments(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Shallow copy of a response with its static parts (disclaimer,
+    version, per-crop nutrition) swapped for pre-encoded fragments.
+    The original dict is left untouched — coalesced callers share it.
+    """
+    if not _HAS_FRAGMENT:
+        return body
+    out = dict(body)
+    for key, (plain, frag) in _STATIC_FRAGMENTS.items():
+        if out.get(key) == plain:
+            out[key] = frag
+    for key in ("top_recommendations", "predictions", "top_3"):
+        entries = out.get(key)
+        if not entries:
+            continue
+        swapped = []
+        for entry in entries:
+            if entry.get("nutrition") is not None:
+                crop = entry["crop"]
+                frag = _NUTRITION_FRAGMENTS.get(crop)
+                if frag is None:
+                    frag = _NUTRITION_FRAGMENTS[crop] = _fragment(entry["nutrition"])
+                entry = {**entry, "nutrition": frag}
+            swapped.append(entry)
+        out[key] = swapped
+    return out
+
+
+class SerializationStats:
+    """Running share of request time spent encoding response bodies."""
+
+    def __init__(self):
+        self._totals: Dict[str, List[float]] = {}
+
+    def record(self, endpoint: str, encode_ms: float, total_ms: float) -> None:
+        t = self._totals.setdefault(endpoint, [0, 0.0, 0.0])
+        t[0] += 1
+        t[1] += encode_ms
+        t[2] += total_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            ep: {
+                "requests": int(n),
+                "encode_ms_mean": round(enc / n, 3),
+                "share_of_request": round(enc / total, 4) if total else 0.0,
+            }
+            for ep, (n, enc, total) in self._totals.items()
+        }
+
 
-app = FastAPI(title="Crop Recommendation ML API", version="9.0")
+_SERIALIZATION = SerializationStats()
+
+
+app = FastAPI(
+    title="Crop Recommendation ML API", version="9.0",
+    default_response_class=FastJSONResponse,
+)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -94,6 +247,11 @@ RELIABILITY_WEIGHT_CONFIDENCE = 0.7
 RELIABILITY_WEIGHT_ENTROPY = 0.3
 AGREEMENT_BONUS = 5.0
 
+# Epistemic uncertainty from soil-stack fold disagreement: mutual information
+# between the prediction and the fold member, as a share of log(n_crops).
+UNCERTAINTY_MI_MODERATE = 0.05
+UNCERTAINTY_MI_HIGH = 0.15
+
 MODE_ALIASES = {
     "soil": "soil", "extended": "extended", "both": "both",
     "original": "soil", "synthetic": "extended",
@@ -101,6 +259,20 @@ MODE_ALIASES = {
 VALID_MODES = set(MODE_ALIASES.keys())
 CANONICAL_MODES = {"soil", "extended", "both"}
 
+# Confidence-gated cascade for /recommend: the calibrated RF runs first and
+# the 15-model stack + hybrid only run when its top-1 is not clearly dominant
+# (NCS / dominance below threshold) or the feasibility gate removes a leader.
+# Thresholds are validated offline with cascade_eval.py.
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "false").lower() == "true"
+CASCADE_MIN_NCS = float(os.getenv("CASCADE_MIN_NCS", "50"))
+CASCADE_MIN_DOMINANCE = float(os.getenv("CASCADE_MIN_DOMINANCE", "3.0"))
+CASCADE_PATHS = {"auto", "full", "cheap"}
+
+# Caller deadline propagated by the Django gateway (hf_service). The value is
+# the remaining budget in milliseconds when the request was sent.
+DEADLINE_HEADER = "X-Deadline-Ms"
+DEADLINE_RESERVE_MS = float(os.getenv("DEADLINE_RESERVE_MS", "250"))
+
 # ===================================================================
 # STEP 1 — AGRONOMIC HARD CONSTRAINT DICTIONARY
 # Per-crop biologically feasible ranges (ICAR / FAO literature)
@@ -189,12 +361,92 @@ def compute_entropy(proba: np.ndarray) -> float:
     return float(-np.sum(p * np.log(p)))
 
 
+def fold_disagreement(fold_probs: List[np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Epistemic uncertainty from the per-fold base-learner probabilities of
+    one SoilPredictor pass (one (folds, n, crops) array per learner):
+
+      variance           — (n, crops) inter-fold variance, averaged over learners
+      mutual_information — (n,) H(mean member) − mean H(member) over all
+                           learner×fold members (BALD); 0 when they all agree
+    """
+    variance = np.mean([f.var(axis=0) for f in fold_probs], axis=0)
+    members = np.concatenate(fold_probs, axis=0)
+    p = np.clip(members, 1e-12, 1.0)
+    member_entropy = -(p * np.log(p)).sum(axis=2).mean(axis=0)
+    mean_p = np.clip(members.mean(axis=0), 1e-12, 1.0)
+    total_entropy = -(mean_p * np.log(mean_p)).sum(axis=1)
+    return {
+        "variance": variance,
+        "mutual_information": np.maximum(total_entropy - member_entropy, 0.0),
+        "members": members.shape[0],
+    }
+
+
+def epistemic_summary(fold_uncertainty: Optional[Dict[str, Any]], n_crops: int) -> Dict[str, Any]:
+    """Response-level view of fold_disagreement: MI normalised by log(n_crops) → level."""
+    if fold_uncertainty is None:
+        return {"available": False, "reason": "soil stack not run for this request"}
+    mi = fold_uncertainty["mutual_information"]
+    normalized = mi / np.log(n_crops) if n_crops > 1 else 0.0
+    if normalized >= UNCERTAINTY_MI_HIGH:
+        level = "high"
+    elif normalized >= UNCERTAINTY_MI_MODERATE:
+        level = "moderate"
+    else:
+        level = "low"
+    return {
+        "available": True,
+        "source": "soil-stack fold disagreement",
+        "mutual_information": round(mi, 4),
+        "normalized": round(float(normalized), 4),
+        "level": level,
+        "members": fold_uncertainty["members"],
+    }
+
+
 # ===================================================================
 # V8 PHASE 1 — HARD AGRONOMIC FEASIBILITY GATE
 # Biologically non-viable crops MUST NOT appear in Top-3.
 # Applied BEFORE stress penalty and ranking.
 # ===================================================================
 
+def _feasibility_reasons(
+    crop: str,
+    temperature: float,
+    ph: float,
+    rainfall: float,
+) -> List[str]:
+    """
+    Return the hard-gate violations for a single crop (empty = viable).
+    Crops without a constraint entry are always viable.
+    """
+    agro = CROP_AGRO_CONSTRAINTS.get(crop)
+    if agro is None:
+        return []
+
+    reasons: List[str] = []
+
+    # Temperature gate (±5°C margin) — V8 FINAL STABLE
+    t_min, t_max = agro["temp_range"]
+    if temperature < t_min - 5:
+        reasons.append(f"temp {temperature:.1f}C < min {t_min}-5")
+    if temperature > t_max + 5:
+        reasons.append(f"temp {temperature:.1f}C > max {t_max}+5")
+
+    # pH gate (±0.5 margin)
+    ph_min, ph_max = agro["ph_range"]
+    if ph < ph_min - 0.5 or ph > ph_max + 0.5:
+        reasons.append(f"pH {ph:.1f} outside [{ph_min-0.5:.1f}, {ph_max+0.5:.1f}]")
+
+    # Rainfall gate (< 30% of min requirement)
+    r_min = agro["rainfall_range"][0]
+    if r_min > 0 and rainfall < r_min * 0.3:
+        reasons.append(f"rain {rainfall:.0f}mm < 30% of min {r_min}")
+
+    return reasons
+
+
 def _hard_feasibility_filter(
     candidates: dict,
     temperature: float,
@@ -218,39 +470,13 @@ def _hard_feasibility_filter(
     excluded_info: list = []  # V8F: track exclusion reasons
 
     for cname, cdata in candidates.items():
-        agro = CROP_AGRO_CONSTRAINTS.get(cname)
-        if agro is None:
-            filtered[cname] = cdata
-            continue
+        reasons = _feasibility_reasons(cname, temperature, ph, rainfall)
 
-        excluded = False
-        reasons = []
-
-        # Temperature gate (±5°C margin) — V8 FINAL STABLE
-        t_min, t_max = agro["temp_range"]
-        if temperature < t_min - 5:
-            excluded = True
-            reasons.append(f"temp {temperature:.1f}C < min {t_min}-5")
-        if temperature > t_max + 5:
-            excluded = True
-            reasons.append(f"temp {temperature:.1f}C > max {t_max}+5")
-
-        # pH gate (±0.5 margin)
-        ph_min, ph_max = agro["ph_range"]
-        if ph < ph_min - 0.5 or ph > ph_max + 0.5:
-            excluded = True
-            reasons.append(f"pH {ph:.1f} outside [{ph_min-0.5:.1f}, {ph_max+0.5:.1f}]")
-
-        # Rainfall gate (< 30% of min requirement)
-        r_min = agro["rainfall_range"][0]
-        if r_min > 0 and rainfall < r_min * 0.3:
-            excluded = True
-            reasons.append(f"rain {rainfall:.0f}mm < 30% of min {r_min}")
-
-        if excluded:
+        if reasons:
             logger.info(
                 "FEASIBILITY EXCLUDED %s: %s",
                 cname, "; ".join(reasons),
+                extra={"category": "feasibility"},
             )
             excluded_info.append({"crop": cname, "reasons": reasons})
             continue
@@ -337,6 +563,7 @@ def _fallback_least_violating(
     logger.info(
         "FALLBACK selected %s (violation=%.3f, conf=%.1f%%)",
         best_name, best_violation, best_data["confidence"],
+        extra={"category": "pipeline"},
     )
 
     return {best_name: best_data}
@@ -376,7 +603,8 @@ def _salinity_stress_override(
     if ph < 8.8 or rainfall < 2500:
         return candidates  # no saline conditions
 
-    logger.info("SALINITY OVERRIDE triggered (pH=%.1f, rainfall=%.0f)", ph, rainfall)
+    logger.info("SALINITY OVERRIDE triggered (pH=%.1f, rainfall=%.0f)", ph, rainfall,
+                extra={"category": "pipeline"})
 
     adjusted: dict = {}
     for cname, cdata in candidates.items():
@@ -614,6 +842,38 @@ def apply_agronomic_constraints(
     return adjusted, violations
 
 
+def apply_agronomic_constraints_batch(proba: np.ndarray, crops_list: list,
+                                      X: pd.DataFrame) -> np.ndarray:
+    """
+    apply_agronomic_constraints for a batch: (n, crops) probabilities and
+    one row of conditions each in X. Same penalties, same renormalisation.
+    """
+    ph, temp, rain, hum = (X[f].to_numpy(dtype=float)[:, None]
+                           for f in ("ph", "temperature", "rainfall", "humidity"))
+    constraints = [CROP_AGRO_CONSTRAINTS.get(c) for c in crops_list]
+
+    def _outside(value: np.ndarray, key: str) -> np.ndarray:
+        # crops without a constraint entry are never penalised
+        lo = np.array([c[key][0] if c else -np.inf for c in constraints])
+        hi = np.array([c[key][1] if c else np.inf for c in constraints])
+        return (value < lo) | (value > hi)
+
+    mult = np.ones_like(proba)
+    ph_extreme = (ph < 4.0) | (ph > 9.5)
+    temp_extreme = (temp < 0) | (temp > 48)
+    mult *= np.where(_outside(ph, "ph_range"),
+                     np.where(ph_extreme, AGRONOMIC_PENALTY_EXTREME, AGRONOMIC_PENALTY_MILD), 1.0)
+    mult *= np.where(_outside(temp, "temp_range"),
+                     np.where(temp_extreme, AGRONOMIC_PENALTY_EXTREME, AGRONOMIC_PENALTY_MILD), 1.0)
+    mult *= np.where(_outside(rain, "rainfall_range"), AGRONOMIC_PENALTY_MILD, 1.0)
+    mult *= np.where(_outside(hum, "humidity_range"), AGRONOMIC_PENALTY_MILD, 1.0)
+
+    adjusted = proba * mult
+    total = adjusted.sum(axis=1, keepdims=True)
+    uniform = np.full_like(adjusted, 1.0 / adjusted.shape[1])
+    return np.where(total > 0, adjusted / np.where(total > 0, total, 1.0), uniform)
+
+
 # ===================================================================
 # STEP 2 — OOD CONFIDENCE DAMPENING
 # ===================================================================
@@ -1003,15 +1263,23 @@ except Exception as e:
     nutrients_df = pd.DataFrame()
 
 
+# Nutrient.csv is static: each crop is looked up once (the substring scan
+# over the table was the bulk of the "nutrition" stage).
+_NUTRITION_CACHE: Dict[str, Optional[dict]] = {}
+
+
 def get_nutrition(crop_name: str) -> Optional[dict]:
+    if crop_name in _NUTRITION_CACHE:
+        return _NUTRITION_CACHE[crop_name]
     try:
         search = NUTRITION_MAPPING.get(crop_name.lower(), crop_name.lower())
         match = nutrients_df[
             nutrients_df["food_name"].str.contains(search, case=False, na=False)
         ]
+        result = None
         if not match.empty:
             row = match.iloc[0]
-            return {
+            result = {
                 "protein_g": float(row["protein_g_per_kg"]),
                 "fat_g": float(row["fat_g_per_kg"]),
                 "carbs_g": float(row["carbs_g_per_kg"]),
@@ -1021,6 +1289,8 @@ def get_nutrition(crop_name: str) -> Optional[dict]:
                 "energy_kcal": float(row["energy_kcal_per_kg"]),
                 "water_g": float(row["water_g_per_kg"]),
             }
+        _NUTRITION_CACHE[crop_name] = result
+        return result
     except Exception as e:
         logger.warning("Nutrition lookup failed for %s: %s", crop_name, e)
     return None
@@ -1033,11 +1303,18 @@ def get_nutrition(crop_name: str) -> Optional[dict]:
 class SoilPredictor:
     """V6 Stacked Ensemble — 51 crops, 10 features."""
 
-    def __init__(self):
+    BASE_LEARNERS = ("BalancedRF", "XGBoost", "LightGBM")
+
+    def __init__(
+        self,
+        model_file: str = "stacked_ensemble_v6.joblib",
+        encoder_file: str = "label_encoder_v6.joblib",
+        config_file: str = "stacked_v6_config.joblib",
+    ):
         t0 = time.time()
-        model_file = os.path.join(BASE_DIR, "stacked_ensemble_v6.joblib")
-        encoder_file = os.path.join(BASE_DIR, "label_encoder_v6.joblib")
-        config_file = os.path.join(BASE_DIR, "stacked_v6_config.joblib")
+        model_file = os.path.join(BASE_DIR, model_file)
+        encoder_file = os.path.join(BASE_DIR, encoder_file)
+        config_file = os.path.join(BASE_DIR, config_file)
 
         stacked = joblib.load(model_file)
         self.fold_models = stacked["fold_models"]
@@ -1058,34 +1335,58 @@ class SoilPredictor:
         )
 
     def predict_proba(self, input_dict: dict) -> np.ndarray:
-        X = pd.DataFrame([input_dict])[self.features]
-        base_preds = []
-        for name in ["BalancedRF", "XGBoost", "LightGBM"]:
-            fold_probs = np.mean(
-                [m.predict_proba(X)[0] for m in self.fold_models[name]], axis=0
-            )
-            base_preds.append(fold_probs)
+        return self.predict_proba_batch(pd.DataFrame([input_dict]))[0]
+
+    def predict_proba_with_uncertainty(self, input_dict: dict) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Probabilities plus fold-disagreement uncertainty for one input (same pass)."""
+        proba, fold_probs = self.predict_with_folds(pd.DataFrame([input_dict]))
+        unc = fold_disagreement(fold_probs)
+        return proba[0], {
+            "fold_std": np.sqrt(unc["variance"][0]),
+            "mutual_information": float(unc["mutual_information"][0]),
+            "members": unc["members"],
+        }
 
-        meta_features = np.hstack(base_preds).reshape(1, -1)
-        proba = self.meta_learner.predict_proba(meta_features)[0]
+    def predict_proba_batch(self, X: pd.DataFrame) -> np.ndarray:
+        """(n_rows, n_crops) probabilities — one call per fold model for the whole batch."""
+        return self.predict_with_folds(X)[0]
+
+    def predict_with_folds(self, X: pd.DataFrame) -> Tuple[np.ndarray, List[np.ndarray]]:
+        """
+        Meta-learner probabilities (n, crops) and, from the same pass, the
+        per-fold base-learner probabilities: one (folds, n, crops) array
+        per learner in BASE_LEARNERS.
+        """
+        X = X[self.features]
+        fold_probs = [
+            np.stack([m.predict_proba(X) for m in self.fold_models[name]])
+            for name in self.BASE_LEARNERS
+        ]
+
+        meta_features = np.hstack([f.mean(axis=0) for f in fold_probs])
+        proba = self.meta_learner.predict_proba(meta_features)
 
         if self.temperature_param != 1.0:
             log_p = np.log(np.clip(proba, 1e-10, 1.0))
             scaled = log_p / self.temperature_param
-            scaled -= scaled.max()
+            scaled -= scaled.max(axis=1, keepdims=True)
             e = np.exp(scaled)
-            proba = e / e.sum()
+            proba = e / e.sum(axis=1, keepdims=True)
 
-        return proba
+        return proba, fold_probs
 
 
 class ExtendedPredictor:
     """Calibrated Random Forest — 51 crops, 10 features."""
 
-    def __init__(self):
+    def __init__(
+        self,
+        model_file: str = "model_rf.joblib",
+        encoder_file: str = "label_encoder.joblib",
+    ):
         t0 = time.time()
-        model_file = os.path.join(BASE_DIR, "model_rf.joblib")
-        encoder_file = os.path.join(BASE_DIR, "label_encoder.joblib")
+        model_file = os.path.join(BASE_DIR, model_file)
+        encoder_file = os.path.join(BASE_DIR, encoder_file)
 
         self.model = joblib.load(model_file)
         self.label_encoder = joblib.load(encoder_file)
@@ -1105,8 +1406,10 @@ class ExtendedPredictor:
         )
 
     def predict_proba(self, input_dict: dict) -> np.ndarray:
-        X = pd.DataFrame([input_dict])[self.features]
-        return self.model.predict_proba(X)[0]
+        return self.predict_proba_batch(pd.DataFrame([input_dict]))[0]
+
+    def predict_proba_batch(self, X: pd.DataFrame) -> np.ndarray:
+        return self.model.predict_proba(X[self.features])
 
 
 class HybridPredictor:
@@ -1116,98 +1419,347 @@ class HybridPredictor:
     RF_WEIGHT = 0.3
     CONFIDENCE_THRESHOLD = 0.3
 
-    def __init__(self, soil: SoilPredictor, extended: ExtendedPredictor):
+    def __init__(
+        self,
+        soil: SoilPredictor,
+        extended: ExtendedPredictor,
+        blend_weights: Optional[Dict[str, float]] = None,
+    ):
         self.soil = soil
         self.extended = extended
+        if blend_weights:
+            self.V6_WEIGHT = float(blend_weights.get("soil", self.V6_WEIGHT))
+            self.RF_WEIGHT = float(blend_weights.get("extended", self.RF_WEIGHT))
 
         soil_set = set(soil.crops)
         ext_set = set(extended.crops)
         self.unified_crops = sorted(soil_set | ext_set)
         self.crop_count = len(self.unified_crops)
         self.crop_to_idx = {c: i for i, c in enumerate(self.unified_crops)}
+        self.soil_idx = np.array([self.crop_to_idx[c] for c in soil.crops])
+        self.ext_idx = np.array([self.crop_to_idx[c] for c in extended.crops])
 
         logger.info("Hybrid predictor ready: %d crops", self.crop_count)
 
     def predict_proba(self, input_dict: dict) -> np.ndarray:
-        soil_proba = self.soil.predict_proba(input_dict)
-        ext_proba = self.extended.predict_proba(input_dict)
-
-        sc = float(np.max(soil_proba))
-        ec = float(np.max(ext_proba))
-
-        if sc > self.CONFIDENCE_THRESHOLD and ec > self.CONFIDENCE_THRESHOLD:
-            sw, ew = self.V6_WEIGHT, self.RF_WEIGHT
-        elif sc > self.CONFIDENCE_THRESHOLD:
-            sw, ew = 0.85, 0.15
-        elif ec > self.CONFIDENCE_THRESHOLD:
-            sw, ew = 0.15, 0.85
-        else:
-            sw, ew = 0.5, 0.5
+        return self.predict_proba_batch(pd.DataFrame([input_dict]))[0]
+
+    def predict_proba_batch(self, X: pd.DataFrame) -> np.ndarray:
+        return self.blend(self.soil.predict_proba_batch(X), self.extended.predict_proba_batch(X))
+
+    def blend(self, soil_proba: np.ndarray, ext_proba: np.ndarray) -> np.ndarray:
+        """Row-wise confidence-adaptive blend of (n, soil crops) and (n, RF crops) → (n, unified)."""
+        sc = soil_proba.max(axis=1) > self.CONFIDENCE_THRESHOLD
+        ec = ext_proba.max(axis=1) > self.CONFIDENCE_THRESHOLD
+        sw = np.select([sc & ec, sc, ec], [self.V6_WEIGHT, 0.85, 0.15], default=0.5)
+        ew = np.select([sc & ec, sc, ec], [self.RF_WEIGHT, 0.15, 0.85], default=0.5)
+
+        unified = np.zeros((len(soil_proba), self.crop_count))
+        unified[:, self.soil_idx] += soil_proba * sw[:, None]
+        unified[:, self.ext_idx] += ext_proba * ew[:, None]
 
-        unified = np.zeros(self.crop_count)
-        for i, crop in enumerate(self.soil.crops):
-            if crop in self.crop_to_idx:
-                unified[self.crop_to_idx[crop]] += soil_proba[i] * sw
-        for i, crop in enumerate(self.extended.crops):
-            if crop in self.crop_to_idx:
-                unified[self.crop_to_idx[crop]] += ext_proba[i] * ew
+        total = unified.sum(axis=1, keepdims=True)
+        return np.divide(unified, total, out=unified, where=total > 0)
 
-        total = unified.sum()
-        if total > 0:
-            unified /= total
-        return unified
+    def to_unified(self, proba: np.ndarray, model: str) -> np.ndarray:
+        """(n, soil or RF crops) → (n, unified crops), zero for crops the model lacks."""
+        out = np.zeros((len(proba), self.crop_count))
+        out[:, self.soil_idx if model == "soil" else self.ext_idx] = proba
+        return out
 
 
 # ===================================================================
-# LOAD MODELS AT STARTUP
+# MODEL MANAGER — registry-driven model sets, zero-downtime hot-swap
 # ===================================================================
 
-_soil: Optional[SoilPredictor] = None
-_extended: Optional[ExtendedPredictor] = None
-_hybrid: Optional[HybridPredictor] = None
+MODEL_REGISTRY_PATH = os.getenv("MODEL_REGISTRY_PATH", "model_registry.json")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+ADMIN_HEADER = "X-Admin-Token"
+# Keep the replaced model set resident so /admin/models/rollback is instant.
+# Costs one extra set of model memory until the next swap.
+MODEL_KEEP_PREVIOUS = os.getenv("MODEL_KEEP_PREVIOUS", "true").lower() == "true"
+# Refuse a swap when current RSS + the expected size of a new set would
+# exceed this many MB (0 = no limit). Both sets are resident during warm-up.
+MODEL_SWAP_MAX_RSS_MB = float(os.getenv("MODEL_SWAP_MAX_RSS_MB", "0"))
 
-try:
-    _soil = SoilPredictor()
-except Exception as e:
-    logger.error("FAILED to load soil model: %s", e)
 
-try:
-    _extended = ExtendedPredictor()
-except Exception as e:
-    logger.error("FAILED to load extended model: %s", e)
+def _rss_mb() -> float:
+    """Current resident set size in MB (Linux /proc; 0.0 where unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2, 1)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
 
-if _soil and _extended:
-    _hybrid = HybridPredictor(_soil, _extended)
-else:
-    logger.error("Cannot build hybrid — missing base model(s)")
 
+def _resolve_registry(path: Optional[str]) -> str:
+    path = path or MODEL_REGISTRY_PATH
+    return path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
 
-def _assert_startup():
-    """V8 Phase 7 — Fail fast if any inconsistency detected."""
+
+class ModelSet:
+    """
+    One generation of predictors built from a single registry snapshot.
+
+    Never mutated after construction: a request takes a reference to the
+    active set when it starts and uses it to the end, so a swap mid-request
+    cannot mix models from two versions.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        soil: Optional[SoilPredictor],
+        extended: Optional[ExtendedPredictor],
+        hybrid: Optional[HybridPredictor],
+        registry_file: str,
+        load_ms: float,
+        rss_delta_mb: float,
+    ):
+        self.version = version
+        self.soil = soil
+        self.extended = extended
+        self.hybrid = hybrid
+        self.registry_file = registry_file
+        self.load_ms = load_ms
+        self.rss_delta_mb = rss_delta_mb
+        self.loaded_at = time.time()
+
+    @property
+    def checksum(self) -> str:
+        parts = [p.checksum for p in (self.soil, self.extended) if p is not None]
+        return "+".join(parts) if parts else "n/a"
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "checksum": self.checksum,
+            "registry_file": os.path.basename(self.registry_file),
+            "loaded_at": self.loaded_at,
+            "load_ms": self.load_ms,
+            "rss_delta_mb": self.rss_delta_mb,
+            "models": {
+                "soil": self.soil is not None,
+                "extended": self.extended is not None,
+                "hybrid": self.hybrid is not None,
+            },
+        }
+
+
+def load_model_set(registry_path: Optional[str] = None) -> ModelSet:
+    """Build a ModelSet from the model file names listed in model_registry.json."""
+    path = _resolve_registry(registry_path)
+    with open(path, encoding="utf-8") as f:
+        registry = json.load(f)
+    entries = registry.get("models", {})
+    version = str(registry.get("version", "unknown"))
+
+    rss_before = _rss_mb()
+    t0 = time.time()
+    soil: Optional[SoilPredictor] = None
+    extended: Optional[ExtendedPredictor] = None
+    hybrid: Optional[HybridPredictor] = None
+
+    try:
+        e = entries.get("soil", {})
+        soil = SoilPredictor(
+            model_file=e.get("model_file") or "stacked_ensemble_v6.joblib",
+            encoder_file=e.get("encoder_file") or "label_encoder_v6.joblib",
+            config_file=e.get("config_file") or "stacked_v6_config.joblib",
+        )
+    except Exception as e:
+        logger.error("FAILED to load soil model: %s", e)
+
+    try:
+        e = entries.get("extended", {})
+        extended = ExtendedPredictor(
+            model_file=e.get("model_file") or "model_rf.joblib",
+            encoder_file=e.get("encoder_file") or "label_encoder.joblib",
+        )
+    except Exception as e:
+        logger.error("FAILED to load extended model: %s", e)
+
+    if soil and extended:
+        hybrid = HybridPredictor(
+            soil, extended, blend_weights=entries.get("both", {}).get("blend_weights"),
+        )
+    else:
+        logger.error("Cannot build hybrid — missing base model(s)")
+
+    return ModelSet(
+        version=version, soil=soil, extended=extended, hybrid=hybrid,
+        registry_file=path,
+        load_ms=round((time.time() - t0) * 1000, 1),
+        rss_delta_mb=round(_rss_mb() - rss_before, 1),
+    )
+
+
+def _startup_errors(models: ModelSet) -> List[str]:
+    """V8 Phase 7 checks that depend on the loaded models."""
     errors = []
-    warnings = []
+    soil, extended, hybrid = models.soil, models.extended, models.hybrid
 
     # Model presence
-    if not _soil:
+    if not soil:
         errors.append("Soil model not loaded")
-    elif _soil.crop_count != 51:
-        errors.append(f"Soil has {_soil.crop_count} crops, expected 51")
-    if not _extended:
+    elif soil.crop_count != 51:
+        errors.append(f"Soil has {soil.crop_count} crops, expected 51")
+    if not extended:
         errors.append("Extended RF not loaded")
-    elif _extended.crop_count != 51:
-        errors.append(f"Extended RF has {_extended.crop_count} crops, expected 51")
-    if not _hybrid:
+    elif extended.crop_count != 51:
+        errors.append(f"Extended RF has {extended.crop_count} crops, expected 51")
+    if not hybrid:
         errors.append("Hybrid not available")
 
     # Validate crop constraint dictionary completeness
-    if _soil:
-        missing = [c for c in _soil.crops if c not in CROP_AGRO_CONSTRAINTS]
+    if soil:
+        missing = [c for c in soil.crops if c not in CROP_AGRO_CONSTRAINTS]
         if missing:
             errors.append(f"Missing agronomic constraints for: {missing}")
-    if _extended:
-        missing_ext = [c for c in _extended.crops if c not in CROP_AGRO_CONSTRAINTS]
+    if extended:
+        missing_ext = [c for c in extended.crops if c not in CROP_AGRO_CONSTRAINTS]
         if missing_ext:
             errors.append(f"Extended model — missing constraints for: {missing_ext}")
+    return errors
+
+
+class ModelManager:
+    """
+    Owns the active ModelSet and replaces it without dropping requests.
+
+    A swap loads the new registry in a background thread, validates it
+    with the startup assertions, warms it with synthetic /recommend calls
+    and only then publishes it with a single reference assignment.
+    Requests already running keep the set they started with; the old set
+    is freed once the last of them finishes (or kept for rollback).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current: Optional[ModelSet] = None
+        self._previous: Optional[ModelSet] = None
+        self._job: Dict[str, Any] = {"state": "idle"}
+        self._listeners: List[Any] = []
+
+    def add_listener(self, fn) -> None:
+        """Call fn(model_set) whenever a different set becomes active."""
+        self._listeners.append(fn)
+
+    def _notify(self, models: ModelSet) -> None:
+        for fn in self._listeners:
+            try:
+                fn(models)
+            except Exception as e:
+                logger.error("Model-set listener %s failed: %s", getattr(fn, "__name__", fn), e)
+
+    @property
+    def current(self) -> ModelSet:
+        return self._current
+
+    def load_initial(self) -> ModelSet:
+        self._current = load_model_set()
+        return self._current
+
+    def start_swap(self, registry_path: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            if self._job["state"] in ("loading", "warming"):
+                raise RuntimeError("A model swap is already in progress")
+            rss = _rss_mb()
+            expected = self._current.rss_delta_mb if self._current else 0.0
+            if MODEL_SWAP_MAX_RSS_MB and rss + expected > MODEL_SWAP_MAX_RSS_MB:
+                raise MemoryError(
+                    f"Swap needs ~{expected:.0f} MB on top of {rss:.0f} MB RSS "
+                    f"(limit {MODEL_SWAP_MAX_RSS_MB:.0f} MB)"
+                )
+            self._job = {
+                "state": "loading",
+                "registry_file": os.path.basename(_resolve_registry(registry_path)),
+                "started_at": time.time(),
+                "memory_mb": {"rss_before": rss, "expected_new_set": expected},
+            }
+            job = dict(self._job)
+
+        threading.Thread(
+            target=self._swap_worker, args=(registry_path,),
+            name="model-swap", daemon=True,
+        ).start()
+        return job
+
+    def _update_job(self, memory: Optional[Dict[str, float]] = None, **fields) -> None:
+        """Apply swap progress to the job record under the manager lock."""
+        with self._lock:
+            if memory:
+                self._job["memory_mb"] = {**self._job["memory_mb"], **memory}
+            self._job.update(fields)
+
+    def _swap_worker(self, registry_path: Optional[str]) -> None:
+        try:
+            candidate = load_model_set(registry_path)
+            self._update_job(memory={"rss_overlap": _rss_mb()})
+            errors = _startup_errors(candidate)
+            if errors:
+                raise RuntimeError("; ".join(errors))
+
+            self._update_job(state="warming")
+            warmup = _warm_model_set(candidate)
+
+            with self._lock:
+                old = self._current
+                self._current = candidate
+                self._previous = old if MODEL_KEEP_PREVIOUS else None
+                self._job["warmup"] = warmup
+            del old
+            gc.collect()
+            self._notify(candidate)
+
+            rss_after = _rss_mb()
+            self._update_job(memory={"rss_after_swap": rss_after}, state="done",
+                             version=candidate.version, checksum=candidate.checksum,
+                             finished_at=time.time())
+            logger.info(
+                "MODEL SWAP done: version=%s checksum=%s load=%.0fms rss_after=%.0fMB",
+                candidate.version, candidate.checksum, candidate.load_ms, rss_after,
+            )
+        except Exception as e:
+            self._update_job(state="failed", error=str(e), finished_at=time.time())
+            logger.error("MODEL SWAP failed — keeping version %s: %s",
+                         self._current.version if self._current else "?", e)
+
+    def rollback(self) -> ModelSet:
+        with self._lock:
+            if self._job["state"] in ("loading", "warming"):
+                raise RuntimeError("A model swap is in progress")
+            if self._previous is None:
+                raise RuntimeError("No previous model set is resident")
+            self._current, self._previous = self._previous, self._current
+            logger.info("MODEL ROLLBACK to version=%s checksum=%s",
+                        self._current.version, self._current.checksum)
+            current = self._current
+        self._notify(current)
+        return current
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            job = dict(self._job)
+        return {
+            "current": self._current.describe() if self._current else None,
+            "previous": self._previous.describe() if self._previous else None,
+            "last_swap": job,
+            "rss_mb": _rss_mb(),
+            "keep_previous": MODEL_KEEP_PREVIOUS,
+            "max_rss_mb": MODEL_SWAP_MAX_RSS_MB or None,
+        }
+
+
+MODEL_MANAGER = ModelManager()
+MODEL_MANAGER.load_initial()
+
+
+def _assert_startup():
+    """V8 Phase 7 — Fail fast if any inconsistency detected."""
+    errors = _startup_errors(MODEL_MANAGER.current)
+    warnings = []
 
     # Validate constraint structure
     required_keys = {"ph_range", "temp_range", "rainfall_range", "humidity_range"}
@@ -1241,7 +1793,7 @@ def _assert_startup():
     else:
         logger.info(
             "V8 startup assertions PASSED — %d crops, %d constraints, all models loaded.",
-            _soil.crop_count if _soil else 0,
+            MODEL_MANAGER.current.soil.crop_count,
             len(CROP_AGRO_CONSTRAINTS),
         )
 _assert_startup()
@@ -1278,7 +1830,7 @@ class PredictionInput(BaseModel):
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     return JSONResponse(
         status_code=422,
-        content={"detail": exc.errors(), "message": "Invalid input"},
+        content={"detail": jsonable_encoder(exc.errors()), "message": "Invalid input"},
     )
 
 
@@ -1291,12 +1843,26 @@ def run_model_pipeline(
     model_name: str, model_type: str, checksum: str,
     feature_count: int, label_encoder=None,
     ood_warnings: list = None,
+    with_nutrition: bool = True,
+    scores: Optional[Tuple[np.ndarray, Optional[Dict[str, Any]]]] = None,
 ) -> dict:
     """
         Full model pipeline:
             Raw proba -> agronomic constraints -> OOD dampening -> hard cap
+
+        with_nutrition=False skips the per-crop nutrition lookup for callers
+        (/recommend) that attach nutrition only to the final ranking.
+
+        scores: (raw proba, fold uncertainty) already computed for this
+        input by score_batch; the predictor is not called again.
     """
-    raw_proba = predictor.predict_proba(input_dict)
+    fold_uncertainty = None
+    if scores is not None:
+        raw_proba, fold_uncertainty = scores
+    elif isinstance(predictor, SoilPredictor):
+        raw_proba, fold_uncertainty = predictor.predict_proba_with_uncertainty(input_dict)
+    else:
+        raw_proba = predictor.predict_proba(input_dict)
 
     # Step 1: Agronomic constraints (before normalisation)
     constrained_proba, agro_violations = apply_agronomic_constraints(
@@ -1344,7 +1910,7 @@ def run_model_pipeline(
             "crop": cname,
             "confidence": cpct,
             "advisory_tier": tier,
-            "nutrition": get_nutrition(cname),
+            "nutrition": get_nutrition(cname) if with_nutrition else None,
         })
 
     # Reliability score
@@ -1372,16 +1938,88 @@ def run_model_pipeline(
         "crops_list": crops_list,
         "agro_violations": agro_violations,
         "ood_dampening": ood_reason,
+        "fold_uncertainty": fold_uncertainty,
     }
 
 
+# ===================================================================
+# WIRE FORMAT — negotiated response encoding (JSON default)
+# ===================================================================
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+WIRE_GZIP = os.getenv("WIRE_GZIP", "true").lower() == "true"
+WIRE_GZIP_MIN_BYTES = int(os.getenv("WIRE_GZIP_MIN_BYTES", "1024"))
+WIRE_GZIP_LEVEL = int(os.getenv("WIRE_GZIP_LEVEL", "5"))
+
+
+def encode_body(body: Any, fmt: str = "json") -> bytes:
+    """Encode a response dict as "json" (render_json + fragments) or "msgpack"."""
+    if fmt == "msgpack":
+        return msgpack.packb(body, default=_wire_default, use_bin_type=True)
+    return render_json(_with_fragments(body))
+
+
+def _negotiated_response(request: Request, body: Dict[str, Any]) -> Tuple[Response, float]:
+    """
+    Honour Accept: application/msgpack and Accept-Encoding: gzip; JSON
+    otherwise. The body is encoded here rather than by FastAPI, which
+    skips the recursive jsonable_encoder pass. Returns (response, encode_ms).
+    """
+    t0 = time.perf_counter()
+    accept = request.headers.get("accept", "")
+    use_msgpack = msgpack is not None and any(t in accept for t in MSGPACK_MEDIA_TYPES)
+    want_gzip = WIRE_GZIP and "gzip" in request.headers.get("accept-encoding", "")
+
+    payload = encode_body(body, "msgpack" if use_msgpack else "json")
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if want_gzip and len(payload) >= WIRE_GZIP_MIN_BYTES:
+        payload = gzip.compress(payload, compresslevel=WIRE_GZIP_LEVEL)
+        headers["Content-Encoding"] = "gzip"
+    response = Response(
+        content=payload,
+        media_type=MSGPACK_MEDIA_TYPES[0] if use_msgpack else "application/json",
+        headers=headers,
+    )
+    return response, (time.perf_counter() - t0) * 1000
+
+
 # ===================================================================
 # PREDICT ENDPOINT — V7 Advisory Engine
 # ===================================================================
 
 @app.post("/predict")
-async def predict(data: PredictionInput):
+async def predict(data: PredictionInput, request: Request):
+    start = time.time()
+    _DRIFT.observe(data.model_dump())
+    resp, shared = await _SINGLE_FLIGHT.run(
+        SingleFlight.key("predict", data), lambda: _predict_pipeline(data),
+    )
+    response, encode_ms = _negotiated_response(request, resp)
+    latency_ms = (time.time() - start) * 1000
+    _SERIALIZATION.record("predict", encode_ms, latency_ms)
+    decision_log.log_decision(
+        "predict", latency_ms,
+        coalesced=shared,
+        best_model=resp["best_model"],
+        crop=resp["best_crop"],
+        calibrated_confidence=resp["calibrated_confidence"],
+        tier=resp["advisory_tier"],
+        ood=len(resp.get("ood_warnings", [])),
+        inputs={k: getattr(data, k) for k in DRIFT_FEATURES},
+    )
+    return response
+
+
+def _predict_pipeline(
+    data: PredictionInput,
+    models: Optional[ModelSet] = None,
+) -> Dict[str, Any]:
+    """/predict advisory pipeline; models defaults to the active set."""
     start = time.time()
+    # Snapshot the active model set — a concurrent hot-swap must not
+    # change models halfway through this request.
+    models = models or MODEL_MANAGER.current
+    soil, extended, hybrid = models.soil, models.extended, models.hybrid
     raw_mode = (data.mode or "soil").strip().lower()
 
     if raw_mode not in VALID_MODES:
@@ -1393,17 +2031,9 @@ async def predict(data: PredictionInput):
     deprecated_mode = raw_mode != mode
 
     # Season
-    season = (data.season if data.season is not None
-              else infer_season(data.temperature))
-
-    input_dict = {
-        "N": data.N, "P": data.P, "K": data.K,
-        "temperature": data.temperature, "humidity": data.humidity,
-        "ph": data.ph, "rainfall": data.rainfall,
-        "season": season,
-        "soil_type": data.soil_type,
-        "irrigation": data.irrigation,
-    }
+    input_dict = _model_input(data)
+    season = input_dict["season"]
+    scores = scores or {}
 
     canonical = {
         "N": data.N, "P": data.P, "K": data.K,
@@ -1427,37 +2057,37 @@ async def predict(data: PredictionInput):
     )
 
     try:
-        if _soil:
+        if soil:
             model_results["soil"] = run_model_pipeline(
-                predictor=_soil, crops_list=_soil.crops,
+                predictor=soil, crops_list=soil.crops,
                 model_name="soil", model_type="stacked-ensemble-v6",
-                checksum=_soil.checksum,
-                feature_count=len(_soil.features),
-                label_encoder=_soil.label_encoder, **pkw,
+                checksum=soil.checksum,
+                feature_count=len(soil.features),
+                label_encoder=soil.label_encoder, **pkw,
             )
     except Exception as e:
         logger.warning("Soil pipeline failed: %s", e)
 
     try:
-        if _extended:
+        if extended:
             model_results["extended"] = run_model_pipeline(
-                predictor=_extended, crops_list=_extended.crops,
+                predictor=extended, crops_list=extended.crops,
                 model_name="extended", model_type="calibrated-rf",
-                checksum=_extended.checksum,
-                feature_count=len(_extended.features),
-                label_encoder=_extended.label_encoder, **pkw,
+                checksum=extended.checksum,
+                feature_count=len(extended.features),
+                label_encoder=extended.label_encoder, **pkw,
             )
     except Exception as e:
         logger.warning("Extended pipeline failed: %s", e)
 
     try:
-        if _hybrid:
+        if hybrid:
             model_results["hybrid"] = run_model_pipeline(
-                predictor=_hybrid, crops_list=_hybrid.unified_crops,
+                predictor=hybrid, crops_list=hybrid.unified_crops,
                 model_name="hybrid", model_type="hybrid-v6-rf",
                 checksum=(
-                    f"{_soil.checksum}+{_extended.checksum}"
-                    if _soil and _extended else "n/a"
+                    f"{soil.checksum}+{extended.checksum}"
+                    if soil and extended else "n/a"
                 ),
                 feature_count=10, label_encoder=None, **pkw,
             )
@@ -1538,10 +2168,10 @@ async def predict(data: PredictionInput):
     pri_proba = primary["proba"]
     pri_crops = primary["crops_list"]
     pri_le = None
-    if primary["model_name"] == "soil" and _soil:
-        pri_le = _soil.label_encoder
-    elif primary["model_name"] == "extended" and _extended:
-        pri_le = _extended.label_encoder
+    if primary["model_name"] == "soil" and soil:
+        pri_le = soil.label_encoder
+    elif primary["model_name"] == "extended" and extended:
+        pri_le = extended.label_encoder
 
     top_idx = np.argsort(pri_proba)[-top_n_count:][::-1]
     predictions = []
@@ -1650,26 +2280,66 @@ async def predict(data: PredictionInput):
     if warning_parts:
         resp["warning"] = " ".join(warning_parts)
 
-    logger.info(
-        "PREDICT best=%s crop=%s cal=%.1f%% raw=%.1f%% tier=%s "
-        "ood=%d ms=%.0f "
-        "N=%.1f P=%.1f K=%.1f T=%.1f H=%.1f pH=%.1f R=%.1f",
-        best_name, best["crop"], calibrated_conf_pct,
-        best["raw_model_probability"], best_tier,
-        len(ood_warnings), latency,
-        data.N, data.P, data.K, data.temperature, data.humidity,
-        data.ph, data.rainfall,
-    )
-
     return resp
 
 
 # ===================================================================
-# INFO ENDPOINTS
+# INFO ENDPOINTS — pre-encoded bodies with strong ETags
 # ===================================================================
 
+INFO_CACHE_MAX_AGE = int(os.getenv("INFO_CACHE_MAX_AGE", "60"))
+
+
+class InfoBodies:
+    """
+    Encoded bodies + ETags for the read-only info endpoints.
+
+    Bodies are built once per model set (startup and every swap or
+    rollback) and served as bytes; If-None-Match hits answer 304.
+    """
+
+    def __init__(self):
+        self._builders: Dict[str, Any] = {}
+        self._bodies: Dict[str, Tuple[bytes, str]] = {}
+        self.cache_control = (f"public, max-age={INFO_CACHE_MAX_AGE}"
+                              if INFO_CACHE_MAX_AGE > 0 else "no-cache")
+
+    def builder(self, name: str):
+        def register(fn):
+            self._builders[name] = fn
+            return fn
+        return register
+
+    def rebuild(self, models: ModelSet) -> None:
+        bodies = {}
+        for name, build in self._builders.items():
+            payload = render_json(build(models))
+            bodies[name] = (payload, '"%s"' % hashlib.sha256(payload).hexdigest()[:32])
+        self._bodies = bodies   # single assignment — readers see old or new set
+        logger.info("Info bodies rebuilt for model version %s (%d endpoints)",
+                    models.version, len(bodies))
+
+    def respond(self, name: str, request: Request) -> Response:
+        payload, etag = self._bodies[name]
+        headers = {"ETag": etag, "Cache-Control": self.cache_control}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+            if "*" in tags or etag in tags:
+                return Response(status_code=304, headers=headers)
+        return Response(content=payload, media_type="application/json", headers=headers)
+
+
+_INFO_BODIES = InfoBodies()
+
+
 @app.get("/predict")
-def predict_hint():
+def predict_hint(request: Request):
+    return _INFO_BODIES.respond("predict_hint", request)
+
+
+@_INFO_BODIES.builder("predict_hint")
+def _predict_hint_body(models: ModelSet) -> Dict[str, Any]:
     return {
         "message": "Use POST with JSON body.",
         "version": "8.1",
@@ -1685,7 +2355,13 @@ def predict_hint():
 
 
 @app.get("/")
-def health():
+def health(request: Request):
+    return _INFO_BODIES.respond("health", request)
+
+
+@_INFO_BODIES.builder("health")
+def _health_body(models: ModelSet) -> Dict[str, Any]:
+    soil, extended, hybrid = models.soil, models.extended, models.hybrid
     return {
         "status": "online",
         "version": "8.2-final",
@@ -1707,63 +2383,418 @@ def health():
         },
         "models": {
             "soil": {
-                "loaded": _soil is not None,
+                "loaded": soil is not None,
                 "type": "stacked-ensemble-v6",
-                "crops": _soil.crop_count if _soil else 0,
+                "crops": soil.crop_count if soil else 0,
             },
             "extended": {
-                "loaded": _extended is not None,
+                "loaded": extended is not None,
                 "type": "calibrated-rf",
-                "crops": _extended.crop_count if _extended else 0,
+                "crops": extended.crop_count if extended else 0,
             },
             "hybrid": {
-                "loaded": _hybrid is not None,
+                "loaded": hybrid is not None,
                 "type": "hybrid-v6-rf",
-                "crops": _hybrid.crop_count if _hybrid else 0,
+                "crops": hybrid.crop_count if hybrid else 0,
             },
         },
+        "model_version": models.version,
+        "model_checksum": models.checksum,
     }
 
 
 @app.get("/crops")
-def get_crops():
+def get_crops(request: Request):
+    return _INFO_BODIES.respond("crops", request)
+
+
+@_INFO_BODIES.builder("crops")
+def _crops_body(models: ModelSet) -> Dict[str, Any]:
+    soil, extended, hybrid = models.soil, models.extended, models.hybrid
     out = {}
-    if _soil:
-        out["soil"] = sorted(_soil.crops)
-    if _extended:
-        out["extended"] = sorted(_extended.crops)
-    if _hybrid:
-        out["both"] = sorted(_hybrid.unified_crops)
+    if soil:
+        out["soil"] = sorted(soil.crops)
+    if extended:
+        out["extended"] = sorted(extended.crops)
+    if hybrid:
+        out["both"] = sorted(hybrid.unified_crops)
     return out
 
 
+@app.get("/metrics")
+def metrics():
+    """Runtime counters: coalescing, dropped log records, serialization share, stage costs."""
+    return {
+        "coalescing": _SINGLE_FLIGHT.snapshot(),
+        "log_records_dropped": dict(_LOG_SAMPLING.dropped),
+        "serialization": _SERIALIZATION.snapshot(),
+        "stage_costs_ms": _STAGE_COSTS.snapshot(),
+    }
+
+
 @app.get("/limits")
-def get_limits():
+def get_limits(request: Request):
+    return _INFO_BODIES.respond("limits", request)
+
+
+@_INFO_BODIES.builder("limits")
+def _limits_body(models: ModelSet) -> Dict[str, Any]:
     return FEATURE_RANGES
 
 
 @app.get("/constraints")
-def get_constraints():
+def get_constraints(request: Request):
     """Per-crop agronomic constraint dictionary."""
+    return _INFO_BODIES.respond("constraints", request)
+
+
+@_INFO_BODIES.builder("constraints")
+def _constraints_body(models: ModelSet) -> Dict[str, Any]:
     return CROP_AGRO_CONSTRAINTS
 
 
+# ===================================================================
+# DEADLINE BUDGET — caller time left, per-stage cost estimates
+# ===================================================================
+
+class StageCosts:
+    """EWMA of observed per-stage latency (ms), seeded with conservative defaults."""
+
+    ALPHA = 0.2
+
+    def __init__(self, defaults: Dict[str, float]):
+        self._ms = dict(defaults)
+
+    def estimate(self, stage: str) -> float:
+        return self._ms.get(stage, 0.0)
+
+    def record(self, stage: str, elapsed_ms: float) -> None:
+        prev = self._ms.get(stage)
+        self._ms[stage] = (elapsed_ms if prev is None
+                           else (1 - self.ALPHA) * prev + self.ALPHA * elapsed_ms)
+
+    def stages(self) -> List[str]:
+        return sorted(self._ms)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {k: round(v, 2) for k, v in self._ms.items()}
+
+
+_STAGE_COSTS = StageCosts({
+    "extended": 30.0,
+    "soil": 250.0,
+    "hybrid": 300.0,
+    "explanations": 5.0,
+    "nutrition": 20.0,
+})
+
+
+class Deadline:
+    """
+    Remaining caller budget, started when the request reaches the handler.
+
+    budget_ms=None means unbounded (no header) — every stage is allowed.
+    DEADLINE_RESERVE_MS is kept back for serialisation and the trip home.
+    """
+
+    def __init__(self, budget_ms: Optional[float]):
+        self.budget_ms = budget_ms if budget_ms is None or budget_ms > 0 else 0.0
+        self._t0 = time.monotonic()
+
+    @property
+    def bounded(self) -> bool:
+        return self.budget_ms is not None
+
+    def remaining_ms(self) -> float:
+        if self.budget_ms is None:
+            return math.inf
+        return self.budget_ms - (time.monotonic() - self._t0) * 1000
+
+    def allows(self, stage: str) -> bool:
+        return self.remaining_ms() - DEADLINE_RESERVE_MS >= _STAGE_COSTS.estimate(stage)
+
+    def plan(self) -> Optional[List[str]]:
+        """
+        Optional stages the budget affords right now; None when unbounded.
+
+        A coarse bucket for keying shared work: callers with the same plan
+        get the same degradation, whatever their exact budget.
+        """
+        if not self.bounded:
+            return None
+        return [stage for stage in _STAGE_COSTS.stages() if self.allows(stage)]
+
+    def wait_s(self) -> Optional[float]:
+        """Seconds this caller can wait on someone else's result; None when unbounded."""
+        if not self.bounded:
+            return None
+        return max(0.0, (self.remaining_ms() - DEADLINE_RESERVE_MS) / 1000)
+
+
+# ===================================================================
+# ONLINE DRIFT MONITOR — streaming moments + fixed-bin histograms
+# ===================================================================
+
+DRIFT_BINS = int(os.getenv("DRIFT_BINS", "20"))
+DRIFT_MIN_SAMPLES = int(os.getenv("DRIFT_MIN_SAMPLES", "100"))
+DRIFT_FEATURES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+
+_DRIFT_REPORT_PATH = os.path.join(BASE_DIR, "drift_report.json")
+try:
+    with open(_DRIFT_REPORT_PATH, encoding="utf-8") as _f:
+        _OFFLINE_DRIFT: dict = json.load(_f)
+except (OSError, ValueError):
+    _OFFLINE_DRIFT = {}
+
+
+def _drift_edges(feature: str) -> np.ndarray:
+    """
+    Bin edges from feature_ranges.json: DRIFT_BINS equal bins over the
+    training p1..p99 span plus one tail bin each side out to the
+    acceptance limits.
+    """
+    fr = _V6_FEAT[feature]
+    inner = np.linspace(fr["p1"], fr["p99"], DRIFT_BINS + 1)
+    return np.concatenate(([_ACC[feature]["min"]], inner, [_ACC[feature]["max"]]))
+
+
+def _reference_histogram(feature: str, edges: np.ndarray) -> np.ndarray:
+    """
+    Expected training bin mass: mixture of per-crop normals from
+    crop_stats.json, weighted by the training class share recorded in
+    drift_report.json (uniform when unavailable).
+    """
+    shares = _OFFLINE_DRIFT.get("class_distribution_mismatch", {}).get("per_class", {})
+    erf = np.vectorize(math.erf)
+    mass = np.zeros(len(edges) - 1)
+    total_w = 0.0
+    for crop, stats in CROP_STATS.items():
+        st = stats.get(feature)
+        if not st:
+            continue
+        w = float(shares.get(crop, {}).get("train_pct", 1.0))
+        sd = max(float(st["std"]), 1e-6)
+        cdf = 0.5 * (1.0 + erf((edges - st["mean"]) / (sd * math.sqrt(2.0))))
+        cdf[0], cdf[-1] = 0.0, 1.0   # tail bins absorb everything outside
+        mass += w * np.diff(cdf)
+        total_w += w
+    mass = mass / total_w if total_w else np.full(len(mass), 1.0 / len(mass))
+    return mass / mass.sum()
+
+
+class DriftMonitor:
+    """
+    Constant-memory input drift tracker.
+
+    Per request: one Welford update over the feature vector and one
+    histogram increment per feature — O(features) work. State is
+    O(features × bins) regardless of traffic. KL divergence and mean
+    shift against the training statistics are computed only on demand.
+    """
+
+    def __init__(self, features: List[str]):
+        self.features = features
+        self.edges = np.vstack([_drift_edges(f) for f in features])
+        self.reference = np.vstack([
+            _reference_histogram(f, e) for f, e in zip(features, self.edges)
+        ])
+        per_feat = _OFFLINE_DRIFT.get("per_feature_drift", {})
+        self.train_mean = np.array([
+            per_feat.get(f, {}).get("train_mean", _V6_FEAT[f]["mean"]) for f in features
+        ], dtype=float)
+        self.train_std = np.array([
+            per_feat.get(f, {}).get("train_std", _V6_FEAT[f]["std"]) for f in features
+        ], dtype=float)
+        self._rows = np.arange(len(features))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.n = 0
+            self.mean = np.zeros(len(self.features))
+            self.m2 = np.zeros(len(self.features))
+            self.counts = np.zeros(self.reference.shape, dtype=np.int64)
+            self.since = time.time()
+
+    def observe(self, values: Dict[str, float]) -> None:
+        x = np.array([values[f] for f in self.features], dtype=float)
+        # Bin index = number of interior edges at or below x
+        idx = (x[:, None] >= self.edges[:, 1:-1]).sum(axis=1)
+        with self._lock:
+            self.n += 1
+            delta = x - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (x - self.mean)
+            self.counts[self._rows, idx] += 1
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self.n
+            mean = self.mean.copy()
+            m2 = self.m2.copy()
+            counts = self.counts.copy()
+            since = self.since
+
+        out: Dict[str, Any] = {
+            "samples": n,
+            "since": since,
+            "bins": int(counts.shape[1]),
+            "reference": "crop_stats.json mixture / drift_report.json train moments",
+        }
+        if n == 0:
+            out["per_feature_drift"] = {}
+            return out
+
+        live_std = np.sqrt(m2 / (n - 1)) if n > 1 else np.zeros_like(mean)
+        eps = 1e-6
+        p = (counts + eps) / (counts + eps).sum(axis=1, keepdims=True)
+        q = (self.reference + eps) / (self.reference + eps).sum(axis=1, keepdims=True)
+        kl = (p * np.log(p / q)).sum(axis=1)
+        shift_std = (mean - self.train_mean) / np.maximum(self.train_std, 1e-9)
+
+        per_feature = {}
+        summary = {"severe": 0, "moderate": 0, "minor": 0, "none": 0}
+        for i, f in enumerate(self.features):
+            if n < DRIFT_MIN_SAMPLES:
+                severity = "insufficient_data"
+            elif kl[i] > 0.5 or abs(shift_std[i]) > 1.0:
+                severity = "severe"
+            elif kl[i] > 0.2 or abs(shift_std[i]) > 0.5:
+                severity = "moderate"
+            elif kl[i] > 0.1 or abs(shift_std[i]) > 0.25:
+                severity = "minor"
+            else:
+                severity = "none"
+            if severity in summary:
+                summary[severity] += 1
+            per_feature[f] = {
+                "train_mean": round(float(self.train_mean[i]), 4),
+                "live_mean": round(float(mean[i]), 4),
+                "mean_shift_pct": round(float(
+                    (mean[i] - self.train_mean[i]) / abs(self.train_mean[i]) * 100
+                ), 2) if self.train_mean[i] else None,
+                "mean_shift_std": round(float(shift_std[i]), 4),
+                "train_std": round(float(self.train_std[i]), 4),
+                "live_std": round(float(live_std[i]), 4),
+                "std_shift_pct": round(float(
+                    (live_std[i] - self.train_std[i]) / self.train_std[i] * 100
+                ), 2) if self.train_std[i] else None,
+                "kl_divergence": round(float(kl[i]), 4),
+                "severity": severity,
+            }
+        out["per_feature_drift"] = per_feature
+        out["drift_summary"] = summary
+        return out
+
+
+_DRIFT = DriftMonitor(DRIFT_FEATURES)
+
+
+@app.get("/drift")
+def drift():
+    """Live input drift vs training statistics (computed on demand)."""
+    return _DRIFT.report()
+
+
+# ===================================================================
+# REQUEST COALESCING — single-flight for identical in-flight inputs
+# ===================================================================
+
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() == "true"
+
+
+class SingleFlight:
+    """
+    Collapse concurrent identical requests onto one computation.
+
+    The first caller for a key runs the pipeline in the threadpool;
+    callers that arrive while it is still running await the same future.
+    The entry is dropped as soon as the computation finishes, so this is
+    not a result cache — a later identical request computes afresh.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.counts = {"leaders": 0, "coalesced": 0, "follower_timeouts": 0, "errors": 0}
+
+    @staticmethod
+    def key(endpoint: str, data: BaseModel, *extra: Any) -> str:
+        """Canonical key: endpoint + validated fields (defaults applied) + extras."""
+        raw = json.dumps([endpoint, data.model_dump(), *extra], sort_keys=True)
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    async def run(self, key: str, fn, wait_s: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Return (result, shared) — shared is True when another caller computed it.
+
+        wait_s bounds how long a follower waits on the leader; past it the
+        follower computes its own (budget-degraded) result instead.
+        """
+        if not self.enabled:
+            return await run_in_threadpool(fn), False
+
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.counts["coalesced"] += 1
+            try:
+                # shield: a follower disconnecting or timing out must not cancel shared work
+                return await asyncio.wait_for(asyncio.shield(fut), wait_s), True
+            except asyncio.TimeoutError:
+                self.counts["follower_timeouts"] += 1
+                return await run_in_threadpool(fn), False
+
+        self.counts["leaders"] += 1
+        fut = asyncio.ensure_future(run_in_threadpool(fn))
+        self._inflight[key] = fut
+
+        def _done(f: asyncio.Future) -> None:
+            self._inflight.pop(key, None)
+            if not f.cancelled() and f.exception() is not None:
+                self.counts["errors"] += 1
+
+        fut.add_done_callback(_done)
+        return await asyncio.shield(fut), False
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = self.counts["leaders"] + self.counts["coalesced"]
+        return {
+            "enabled": self.enabled,
+            **self.counts,
+            "in_flight": len(self._inflight),
+            "coalesced_ratio": round(self.counts["coalesced"] / total, 4) if total else 0.0,
+        }
+
+
+_SINGLE_FLIGHT = SingleFlight(enabled=COALESCE_ENABLED)
+
+
 # ===================================================================
 # /recommend — UNIFIED ADVISORY ENDPOINT (no mode exposed)
 # ===================================================================
 
 class RecommendInput(BaseModel):
-    """Input schema for /recommend — no mode field."""
+    """
+    Input schema for /recommend — no mode field.
+
+    temperature / humidity / rainfall may be omitted when `district`
+    (and, if the name is ambiguous, `state`) is given: they are then
+    filled from the climate index for `season` (default: the season of
+    the current month). Rainfall is filled with the annual normal, the
+    scale the models were trained on; humidity only where the index has
+    humidity normals.
+    """
     N: float = Field(..., ge=_ACC["N"]["min"], le=_ACC["N"]["max"])
     P: float = Field(..., ge=_ACC["P"]["min"], le=_ACC["P"]["max"])
     K: float = Field(..., ge=_ACC["K"]["min"], le=_ACC["K"]["max"])
-    temperature: float = Field(..., ge=_ACC["temperature"]["min"],
-                               le=_ACC["temperature"]["max"])
-    humidity: float = Field(..., ge=_ACC["humidity"]["min"],
-                            le=_ACC["humidity"]["max"])
+    temperature: Optional[float] = Field(None, ge=_ACC["temperature"]["min"],
+                                         le=_ACC["temperature"]["max"])
+    humidity: Optional[float] = Field(None, ge=_ACC["humidity"]["min"],
+                                      le=_ACC["humidity"]["max"])
     ph: float = Field(..., ge=_ACC["ph"]["min"], le=_ACC["ph"]["max"])
-    rainfall: float = Field(..., ge=_ACC["rainfall"]["min"],
-                            le=_ACC["rainfall"]["max"])
+    rainfall: Optional[float] = Field(None, ge=_ACC["rainfall"]["min"],
+                                      le=_ACC["rainfall"]["max"])
     moisture: Optional[float] = Field(43.5, ge=_ACC["moisture"]["min"],
                                       le=_ACC["moisture"]["max"])
     season: Optional[int] = Field(None, ge=_ACC["season"]["min"],
@@ -1772,6 +2803,47 @@ class RecommendInput(BaseModel):
                                      le=_ACC["soil_type"]["max"])
     irrigation: Optional[int] = Field(0, ge=_ACC["irrigation"]["min"],
                                       le=_ACC["irrigation"]["max"])
+    district: Optional[str] = None
+    state: Optional[str] = None
+
+    _climate_lookup: Optional[Dict[str, Any]] = PrivateAttr(default=None)
+
+    @model_validator(mode="after")
+    def _fill_climate(self) -> "RecommendInput":
+        missing = [f for f in CLIMATE_FIELDS if getattr(self, f) is None]
+        if not missing:
+            return self
+        if not self.district:
+            raise PydanticCustomError(
+                "climate_missing", "{fields} required unless district is given",
+                {"fields": ", ".join(missing)})
+        season_source = "request"
+        if self.season is None:
+            self.season = season_for_month(time.localtime().tm_mon)
+            season_source = "calendar"
+        try:
+            climate = _CLIMATE_INDEX.lookup(self.district, self.state, season=self.season)
+        except ValueError as e:
+            raise PydanticCustomError("climate_lookup", "{reason}", {"reason": str(e)})
+        unknown = [f for f in missing if climate[f] is None]
+        if unknown:
+            raise PydanticCustomError(
+                "climate_missing", "{fields} not in the climate index; send them with the request",
+                {"fields": ", ".join(unknown)})
+        for f in missing:
+            setattr(self, f, climate[f])
+        self._climate_lookup = {
+            "state": climate["state"], "district": climate["district"],
+            "season": get_season_name(self.season), "season_source": season_source,
+            "filled": missing,
+        }
+        return self
+
+    @property
+    def season_inferred(self) -> bool:
+        """True unless the caller sent `season` (a district fill may set it from the calendar)."""
+        return self.season is None or bool(
+            self._climate_lookup and self._climate_lookup["season_source"] == "calendar")
 
 
 def _consensus_label(vote_count: int, total_models: int) -> str:
@@ -1783,29 +2855,200 @@ def _consensus_label(vote_count: int, total_models: int) -> str:
     return "weak"
 
 
+def _cascade_gate(cheap: dict, data: RecommendInput) -> Tuple[bool, str, dict]:
+    """
+    Decide whether the calibrated RF result is clear-cut enough to skip
+    the stacked ensemble + hybrid pass.
+
+    Returns (accept, reason, stats). The RF is accepted only when its
+    top-1 is "strong" on the NCS scale, clears the configured NCS and
+    dominance thresholds, and none of its top-3 leaders would be removed
+    by the hard feasibility gate.
+    """
+    proba = cheap["proba"]
+    top2 = np.sort(proba)[-2:][::-1]
+    ncs_info = compute_ncs(float(top2[0]), float(top2[1]) if len(top2) > 1 else 0.0)
+    leaders = [e["crop"] for e in cheap["top_3"]]
+    infeasible = [
+        c for c in leaders
+        if _feasibility_reasons(c, data.temperature, data.ph, data.rainfall)
+    ]
+    stats = {
+        "ncs": ncs_info["ncs"],
+        "dominance": ncs_info["dominance"],
+        "confidence_level": ncs_info["confidence_level"],
+        "leaders_infeasible": infeasible,
+    }
+
+    if infeasible:
+        return False, "feasibility_gate_removed_leader", stats
+    if ncs_info["confidence_level"] != "strong":
+        return False, "top1_not_dominant", stats
+    if ncs_info["ncs"] < CASCADE_MIN_NCS:
+        return False, "ncs_below_threshold", stats
+    if ncs_info["dominance"] < CASCADE_MIN_DOMINANCE:
+        return False, "dominance_below_threshold", stats
+    return True, "clear_cut", stats
+
+
 @app.post("/recommend")
-async def recommend(data: RecommendInput):
+async def recommend(
+    data: RecommendInput,
+    request: Request,
+    x_deadline_ms: Optional[float] = Header(None, alias=DEADLINE_HEADER),
+):
     """
     Unified advisory endpoint.
 
     Runs all 3 internal models, collects 3×Top-3 = 9 candidates,
     scores them with the aggregation formula, and returns the
     global Top-3 with no model architecture exposed.
+
+    An optional X-Deadline-Ms header carries the caller's remaining time
+    budget; stages that no longer fit are skipped and listed in
+    "skipped_stages".
+
+    Responds in MessagePack for Accept: application/msgpack and gzips
+    bodies over WIRE_GZIP_MIN_BYTES when the caller accepts it.
+
+    Identical concurrent requests share one computation (SingleFlight).
+    Callers are keyed by the stages their budget affords (Deadline.plan),
+    so a degraded result is never handed to a caller with room for more,
+    and a bounded follower waits on the leader only while its own budget
+    lasts.
     """
     start = time.time()
+    deadline = Deadline(x_deadline_ms)
+    _DRIFT.observe(data.model_dump())
+    resp, shared = await _SINGLE_FLIGHT.run(
+        SingleFlight.key("recommend", data, deadline.plan()),
+        lambda: _recommend_pipeline(data, deadline=deadline),
+        wait_s=deadline.wait_s(),
+    )
+    top = resp["top_recommendations"]
+    response, encode_ms = _negotiated_response(request, resp)
+    latency_ms = (time.time() - start) * 1000
+    _SERIALIZATION.record("recommend", encode_ms, latency_ms)
+    decision_log.log_decision(
+        "recommend", latency_ms,
+        coalesced=shared,
+        top_crops=[c["crop"] for c in top],
+        confidence=top[0]["confidence"] if top else 0,
+        tier=top[0]["advisory_tier"] if top else None,
+        ncs=top[0].get("ncs") if top else None,
+        epistemic=resp["epistemic_uncertainty"].get("level"),
+        pipeline_path=resp.get("cascade", {}).get("path", "full"),
+        skipped_stages=resp["skipped_stages"],
+        excluded=len(resp["excluded_crops"]),
+        viable=resp["viable_count"],
+        fallback_mode=resp["fallback_mode"],
+        model_version=resp["model_version"],
+        inputs={k: getattr(data, k) for k in DRIFT_FEATURES},
+    )
+    return response
 
-    season = (data.season if data.season is not None
-              else infer_season(data.temperature))
 
-    input_dict = {
+def _model_input(data: RecommendInput) -> Dict[str, Any]:
+    """The 10 model features for one validated request (season inferred when absent)."""
+    return {
         "N": data.N, "P": data.P, "K": data.K,
         "temperature": data.temperature, "humidity": data.humidity,
         "ph": data.ph, "rainfall": data.rainfall,
-        "season": season,
+        "season": (data.season if data.season is not None
+                   else infer_season(data.temperature)),
         "soil_type": data.soil_type,
         "irrigation": data.irrigation,
     }
 
+
+def score_batch(
+    inputs: List[RecommendInput],
+    path: str = "full",
+    models: Optional[ModelSet] = None,
+) -> List[Dict[str, Tuple[np.ndarray, Optional[Dict[str, Any]]]]]:
+    """
+    Raw model scores for many requests: one predict_proba pass per model.
+
+    Returns, per input, {model name: (raw proba, fold uncertainty)} to pass
+    to _recommend_pipeline(scores=...). The hybrid reuses the soil and RF
+    passes. path="cheap" scores the RF only; "auto" scores every model,
+    since the cascade gate is decided per row afterwards. A model whose
+    batch pass fails is left out, and its rows are scored one at a time.
+    """
+    models = models or MODEL_MANAGER.current
+    out: List[Dict[str, Any]] = [{} for _ in inputs]
+    if not inputs:
+        return out
+    X = pd.DataFrame([_model_input(d) for d in inputs])
+    soil_p = ext_p = None
+
+    if models.extended:
+        try:
+            ext_p = models.extended.predict_proba_batch(X)
+            for row, p in zip(out, ext_p):
+                row["extended"] = (p, None)
+        except Exception as e:
+            logger.warning("extended batch pass failed: %s", e)
+    if path == "cheap":
+        return out
+
+    if models.soil:
+        try:
+            soil_p, fold_probs = models.soil.predict_with_folds(X)
+            unc = fold_disagreement(fold_probs)
+            for i, row in enumerate(out):
+                row["soil"] = (soil_p[i], {
+                    "fold_std": np.sqrt(unc["variance"][i]),
+                    "mutual_information": float(unc["mutual_information"][i]),
+                    "members": unc["members"],
+                })
+        except Exception as e:
+            soil_p = None
+            logger.warning("soil batch pass failed: %s", e)
+    if models.hybrid and soil_p is not None and ext_p is not None:
+        for row, p in zip(out, models.hybrid.blend(soil_p, ext_p)):
+            row["hybrid"] = (p, None)
+    return out
+
+
+def _recommend_pipeline(
+    data: RecommendInput,
+    path: Optional[str] = None,
+    deadline: Optional[Deadline] = None,
+    models: Optional[ModelSet] = None,
+    scores: Optional[Dict[str, Tuple[np.ndarray, Optional[Dict[str, Any]]]]] = None,
+) -> Dict[str, Any]:
+    """
+    /recommend advisory pipeline.
+
+    path:
+      "full"  — run soil, extended and hybrid (pre-cascade behaviour)
+      "cheap" — calibrated RF only (used by cascade_eval.py)
+      "auto"  — cascade: RF first, escalate to the full stack via _cascade_gate
+    Defaults to "auto" when CASCADE_ENABLED, otherwise "full".
+
+    deadline: caller time budget. Optional stages (soil stack, hybrid,
+    explanations, nutrition) run only while their estimated cost fits.
+
+    models: model set to score with; defaults to the active set, taken
+    once here so a hot-swap cannot change models mid-request.
+
+    scores: this input's entry from score_batch; models found there are
+    not called again.
+    """
+    start = time.time()
+    deadline = deadline or Deadline(None)
+    models = models or MODEL_MANAGER.current
+    soil, extended, hybrid = models.soil, models.extended, models.hybrid
+    if path is None:
+        path = "auto" if CASCADE_ENABLED else "full"
+    if path not in CASCADE_PATHS:
+        raise ValueError(f"Unknown pipeline path '{path}'")
+
+    input_dict = _model_input(data)
+    season = input_dict["season"]
+    scores = scores or {}
+
     canonical = {
         "N": data.N, "P": data.P, "K": data.K,
         "temperature": data.temperature, "humidity": data.humidity,
@@ -1824,31 +3067,70 @@ async def recommend(data: RecommendInput):
     # Run all 3 models through V7 pipeline
     model_results: Dict[str, dict] = {}
     model_configs = []
-    if _soil:
-        model_configs.append(("soil", _soil, _soil.crops, "stacked-ensemble-v6",
-                              _soil.checksum, len(_soil.features), _soil.label_encoder))
-    if _extended:
-        model_configs.append(("extended", _extended, _extended.crops, "calibrated-rf",
-                              _extended.checksum, len(_extended.features), _extended.label_encoder))
-    if _hybrid:
-        model_configs.append(("hybrid", _hybrid, _hybrid.unified_crops, "hybrid-v6-rf",
-                              f"{_soil.checksum}+{_extended.checksum}" if _soil and _extended else "n/a",
+    if soil:
+        model_configs.append(("soil", soil, soil.crops, "stacked-ensemble-v6",
+                              soil.checksum, len(soil.features), soil.label_encoder))
+    if extended:
+        model_configs.append(("extended", extended, extended.crops, "calibrated-rf",
+                              extended.checksum, len(extended.features), extended.label_encoder))
+    if hybrid:
+        model_configs.append(("hybrid", hybrid, hybrid.unified_crops, "hybrid-v6-rf",
+                              f"{soil.checksum}+{extended.checksum}" if soil and extended else "n/a",
                               10, None))
 
-    for mname, pred, crops, mtype, chk, fcnt, le in model_configs:
+    configs_by_name = {c[0]: c for c in model_configs}
+    skipped_stages: List[str] = []
+
+    def _run(mname: str) -> None:
+        _, pred, crops, mtype, chk, fcnt, le = configs_by_name[mname]
+        t0 = time.monotonic()
         try:
             model_results[mname] = run_model_pipeline(
                 predictor=pred, crops_list=crops,
                 model_name=mname, model_type=mtype,
                 checksum=chk, feature_count=fcnt,
-                label_encoder=le, **pkw,
+                label_encoder=le, with_nutrition=False,
+                scores=scores.get(mname), **pkw,
             )
         except Exception as e:
             logger.warning("%s pipeline failed: %s", mname, e)
+        _STAGE_COSTS.record(mname, (time.monotonic() - t0) * 1000)
+
+    # The calibrated RF is the cheapest model: it always runs first when a
+    # cascade or a caller deadline is in play, so a degraded response can
+    # still be served from it.
+    pending = [c[0] for c in model_configs]
+    cascade_info: Optional[Dict[str, Any]] = None
+    if (path != "full" or deadline.bounded) and "extended" in configs_by_name:
+        _run("extended")
+        pending.remove("extended")
+
+        if path != "full" and "extended" in model_results:
+            accept, reason, gate_stats = _cascade_gate(model_results["extended"], data)
+            if path == "cheap":
+                accept, reason = True, "forced"
+            cascade_info = {
+                "path": "cheap" if accept else "full",
+                "reason": reason,
+                **gate_stats,
+            }
+            if accept:
+                pending = []
+
+    for mname in pending:
+        if model_results and not deadline.allows(mname):
+            skipped_stages.append(mname)
+            continue
+        _run(mname)
 
     if not model_results:
         raise HTTPException(503, "All models failed")
 
+    # Keep the canonical soil → extended → hybrid order for tie-breaking
+    model_results = {
+        m: model_results[m] for m in ("soil", "extended", "hybrid") if m in model_results
+    }
+
     total_models = len(model_results)
 
     # Collect 9 candidates (3 models × top 3)
@@ -1911,19 +3193,10 @@ async def recommend(data: RecommendInput):
                     "crop": cname,
                     "confidence": tier_pct,
                     "advisory_tier": "Not Recommended",
-                    "explanation": generate_explanation(
-                        crop=cname,
-                        input_dict=canonical,
-                        stress_per_feature={},
-                        agro_violations=mres.get("agro_violations", {}),
-                        confidence_pct=tier_pct,
-                        is_ood=is_ood,
-                        tier="Not Recommended",
-                    ),
-                    "nutrition": get_nutrition(cname),
                     "_score": score,
                     "_ems_info": ems_info,
                     "_raw_prob": raw_prob,
+                    "_agro_violations": mres.get("agro_violations", {}),
                 }
 
     # ── V8 Phase 1: Hard Feasibility Gate (±5°C) ─────────────────────
@@ -1940,6 +3213,7 @@ async def recommend(data: RecommendInput):
         logger.info(
             "FEASIBILITY GATE removed %d/%d candidates",
             excluded_count, len(candidates),
+            extra={"category": "pipeline"},
         )
 
     # ── V8.1 Phase 2: Guarantee non-empty response ─────────────────
@@ -1952,7 +3226,8 @@ async def recommend(data: RecommendInput):
             rainfall=data.rainfall,
         )
         fallback_mode = True
-        logger.info("FALLBACK MODE activated — all crops failed feasibility")
+        logger.info("FALLBACK MODE activated — all crops failed feasibility",
+                    extra={"category": "pipeline"})
 
     # V9: No legacy stress override or stress-penalty stage
 
@@ -1971,6 +3246,11 @@ async def recommend(data: RecommendInput):
     global_p1 = sorted_raw[0] if len(sorted_raw) > 0 else 0.0
     global_p2 = sorted_raw[1] if len(sorted_raw) > 1 else 0.0
 
+    # Fold disagreement comes free with the soil stack's inference pass
+    soil_res = model_results.get("soil")
+    fold_unc = soil_res.get("fold_uncertainty") if soil_res else None
+    soil_idx = {cname: i for i, cname in enumerate(soil_res["crops_list"])} if fold_unc else {}
+
     # V9 Phase 4: Re-compute advisory tier with NCS + EMS decision matrix
     for c in ranked:
         ems_info = c.get("_ems_info")
@@ -1993,6 +3273,8 @@ async def recommend(data: RecommendInput):
         c["ncs_level"] = ncs_info["confidence_level"]
         c["environmental_match"] = ems_info["match_level"] if ems_info else "unknown"
         c["ems"] = ems_info["ems"] if ems_info else 1.0
+        c["fold_std"] = (round(float(fold_unc["fold_std"][soil_idx[c["crop"]]]), 4)
+                         if c["crop"] in soil_idx else None)
 
         # V8.1: Fallback mode hard cap
         if fallback_mode:
@@ -2019,6 +3301,28 @@ async def recommend(data: RecommendInput):
     # ── V8F: Clean top-3 info ──────────────────────────────────────
     viable_count = len(viable)
 
+    # Explanation + nutrition only for the final ranking, budget permitting
+    # (the fallback crop already carries its own explanation).
+    for stage in ("explanations", "nutrition"):
+        if not deadline.allows(stage):
+            skipped_stages.append(stage)
+            continue
+        t0 = time.monotonic()
+        for c in ranked:
+            if stage == "nutrition":
+                c["nutrition"] = get_nutrition(c["crop"])
+            elif "explanation" not in c:
+                c["explanation"] = generate_explanation(
+                    crop=c["crop"],
+                    input_dict=canonical,
+                    stress_per_feature={},
+                    agro_violations=c.get("_agro_violations", {}),
+                    confidence_pct=c["confidence"],
+                    is_ood=is_ood,
+                    tier="Not Recommended",
+                )
+        _STAGE_COSTS.record(stage, (time.monotonic() - t0) * 1000)
+
     # Strip internal scoring fields
     top_recommendations = []
     for c in ranked:
@@ -2027,6 +3331,9 @@ async def recommend(data: RecommendInput):
         c.pop("_severe_count", None)
         c.pop("_ems_info", None)
         c.pop("_raw_prob", None)
+        c.pop("_agro_violations", None)
+        c.setdefault("explanation", "")
+        c.setdefault("nutrition", None)
         top_recommendations.append(c)
 
     latency = round((time.time() - start) * 1000, 1)
@@ -2037,22 +3344,31 @@ async def recommend(data: RecommendInput):
         "all_not_recommended": all_not_recommended,
         "global_unsuitable": global_unsuitable,
         "limiting_factor": limiting,
+        "epistemic_uncertainty": epistemic_summary(
+            fold_unc, len(soil_idx) if fold_unc else 0),
         "viable_count": viable_count,
         "excluded_crops": excluded_crops_info if excluded_crops_info else [],
         "environment_info": {
             "season_used": get_season_name(season),
-            "season_inferred": data.season is None,
+            "season_inferred": data.season_inferred,
             "soil_type": data.soil_type,
             "irrigation": data.irrigation,
             "moisture": data.moisture,
+            "climate_lookup": data._climate_lookup,
         },
-        "disclaimer": (
-            "This AI advisory is based on provided environmental parameters. "
-            "Consult local agricultural experts before final decision."
-        ),
-        "version": "9.0-ncs",
+        "disclaimer": RECOMMEND_DISCLAIMER,
+        "version": RECOMMEND_VERSION,
+        "model_version": models.version,
         "latency_ms": latency,
     }
+    if cascade_info is not None:
+        resp["cascade"] = cascade_info
+    resp["skipped_stages"] = skipped_stages
+    if deadline.bounded:
+        resp["deadline"] = {
+            "budget_ms": round(deadline.budget_ms, 1),
+            "remaining_ms": round(deadline.remaining_ms(), 1),
+        }
 
     warning_parts = []
     if fallback_mode:
@@ -2065,28 +3381,35 @@ async def recommend(data: RecommendInput):
         warning_parts.append(f"Some values ({fields}) fall outside typical ranges. Confidence adjusted.")
     if top_recommendations and top_recommendations[0]["confidence"] < 40:
         warning_parts.append("Conditions may be challenging for most crops. Consider consulting local experts.")
+    if skipped_stages:
+        warning_parts.append(
+            f"Reduced analysis under time budget (skipped: {', '.join(skipped_stages)})."
+        )
     if warning_parts:
         resp["warning"] = " ".join(warning_parts)
 
-    logger.info(
-        "RECOMMEND top=%s conf=%.1f%% tier=%s ood=%d ms=%.0f",
-        top_recommendations[0]["crop"] if top_recommendations else "?",
-        top_recommendations[0]["confidence"] if top_recommendations else 0,
-        top_recommendations[0]["advisory_tier"] if top_recommendations else "?",
-        len(ood_warnings), latency,
-    )
-
     return resp
 
 
 @app.get("/recommend")
-def recommend_hint():
+def recommend_hint(request: Request):
+    return _INFO_BODIES.respond("recommend_hint", request)
+
+
+@_INFO_BODIES.builder("recommend_hint")
+def _recommend_hint_body(models: ModelSet) -> Dict[str, Any]:
     return {
         "message": "Use POST with JSON body.",
-        "version": "9.0-ncs",
+        "version": RECOMMEND_VERSION,
         "description": "V9 NCS+EMS Decision Matrix — normalized confidence, per-crop environmental match.",
         "required_fields": ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"],
-        "optional_fields": ["soil_type", "irrigation", "moisture", "season"],
+        "optional_fields": ["soil_type", "irrigation", "moisture", "season", "district", "state"],
+        "climate_from_district": {
+            "available": _CLIMATE_INDEX.loaded,
+            "fills": list(CLIMATE_FIELDS),
+            "note": "Omit temperature/humidity/rainfall and send district (+ state if ambiguous) "
+                    "and season; see GET /climate.",
+        },
         "phases": [
             "Hard feasibility gate (±5°C, ±0.5 pH, <30% min rain)",
             "Fallback: least-violating crop if all excluded (cap 35%)",
@@ -2098,6 +3421,12 @@ def recommend_hint():
             "Confidence interpretation labels (Weak/Moderate/Strong via NCS)",
             "Global unsuitable detection (NCS<10 + max_conf<25% or all not-rec)",
         ],
+        "deadline_header": DEADLINE_HEADER,
+        "cascade": {
+            "enabled": CASCADE_ENABLED,
+            "min_ncs": CASCADE_MIN_NCS,
+            "min_dominance": CASCADE_MIN_DOMINANCE,
+        },
         "top_recommendation_fields": [
             "crop",
             "confidence",
@@ -2106,5 +3435,675 @@ def recommend_hint():
             "environmental_match",
             "ems",
             "advisory_tier",
+            "fold_std",
         ],
+        "epistemic_uncertainty": {
+            "source": "mutual information across soil-stack fold models",
+            "levels": {"moderate": UNCERTAINTY_MI_MODERATE, "high": UNCERTAINTY_MI_HIGH},
+        },
     }
+
+
+# ===================================================================
+# DISTRICT TABLES — precomputed /recommend results per district × season
+# ===================================================================
+
+# Built offline by district_tables.py from the ICRISAT district crop areas
+# and the temperature / rainfall normals. Missing file = endpoint disabled.
+DISTRICT_TABLE_PATH = os.getenv("DISTRICT_TABLE_PATH", "district_recommendations.json")
+SEASON_KEYS = ("kharif", "rabi", "zaid")
+
+
+def norm_name(name: str) -> str:
+    """Lookup key for state / district names: lower-case alphanumerics, single spaces."""
+    return re.sub(r"[^a-z0-9]+", " ", str(name).lower()).strip()
+
+
+def resolve_district(entries: Dict[str, Any], by_district: Dict[str, List[str]],
+                     district: str, state: Optional[str] = None) -> Tuple[Optional[str], List[str]]:
+    """
+    "<state>/<district>" key for a lookup (None if unknown or ambiguous)
+    and the candidate keys. `state` is only needed when the district name
+    exists in several states.
+    """
+    name = norm_name(district)
+    if state:
+        key = f"{norm_name(state)}/{name}"
+        return (key, [key]) if key in entries else (None, [])
+    keys = by_district.get(name, [])
+    return (keys[0] if len(keys) == 1 else None), keys
+
+
+def season_key(season: str) -> Optional[str]:
+    """'kharif' / 'Rabi' / '2' → canonical season key, None if unknown."""
+    value = str(season).strip().lower()
+    if value.isdigit() and int(value) < len(SEASON_KEYS):
+        return SEASON_KEYS[int(value)]
+    return value if value in SEASON_KEYS else None
+
+
+class DistrictTable:
+    """
+    district_recommendations.json held in memory: entries keyed by
+    "<state>/<district>" plus a district-name index, so a lookup is two
+    dict probes and no model call.
+    """
+
+    def __init__(self, path: str):
+        self.path = path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
+        self.meta: Dict[str, Any] = {}
+        self.districts: Dict[str, Dict[str, Any]] = {}
+        self.by_district: Dict[str, List[str]] = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                table = json.load(f)
+            self.meta = table.get("_meta", {})
+            self.districts = table.get("districts", {})
+            self.by_district = table.get("by_district", {})
+            logger.info("Loaded %s (%d districts, model %s)", os.path.basename(self.path),
+                        len(self.districts), self.meta.get("model_version"))
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.districts)
+
+    def resolve(self, district: str, state: Optional[str] = None) -> Tuple[Optional[str], List[str]]:
+        return resolve_district(self.districts, self.by_district, district, state)
+
+
+_DISTRICT_TABLE = DistrictTable(DISTRICT_TABLE_PATH)
+
+
+@app.get("/district-recommendations")
+def district_recommendations(district: str, state: Optional[str] = None,
+                             season: Optional[str] = None):
+    """
+    Precomputed top-3 per season for a district (no inference). `state`
+    is needed only when the district name exists in several states;
+    `season` (kharif / rabi / zaid or 0-2) narrows the answer to one.
+    """
+    if not _DISTRICT_TABLE.loaded:
+        raise HTTPException(503, "District tables not built (run district_tables.py)")
+    key, candidates = _DISTRICT_TABLE.resolve(district, state)
+    if key is None:
+        if len(candidates) > 1:
+            states = [_DISTRICT_TABLE.districts[k]["state"] for k in candidates]
+            raise HTTPException(400, f"District '{district}' exists in several states; "
+                                     f"pass state= one of {states}")
+        raise HTTPException(404, f"District '{district}' not in the precomputed tables")
+
+    entry = _DISTRICT_TABLE.districts[key]
+    seasons = entry["seasons"]
+    if season is not None:
+        skey = season_key(season)
+        if skey is None:
+            raise HTTPException(400, f"Unknown season '{season}' (use {', '.join(SEASON_KEYS)})")
+        if skey not in seasons:
+            raise HTTPException(404, f"No {skey} entry for district '{entry['district']}'")
+        seasons = {skey: seasons[skey]}
+
+    meta = _DISTRICT_TABLE.meta
+    return FastJSONResponse(_with_fragments({
+        "state": entry["state"],
+        "district": entry["district"],
+        "seasons": seasons,
+        "precomputed": True,
+        "model_version": meta.get("model_version"),
+        "stale": meta.get("model_version") != MODEL_MANAGER.current.version,
+        "generated": meta.get("generated"),
+        "disclaimer": RECOMMEND_DISCLAIMER,
+    }))
+
+
+# ===================================================================
+# CLIMATE INDEX — district × month normals as aligned arrays
+# ===================================================================
+
+# Written by district_tables.py next to the district tables. Temperature,
+# rainfall and (when a humidity source was given) humidity are monthly
+# normals of the district's state (national when unmatched); humidity is
+# NaN otherwise and is never filled.
+CLIMATE_INDEX_PATH = os.getenv("CLIMATE_INDEX_PATH", "climate_index.npz")
+CLIMATE_FIELDS = ("temperature", "humidity", "rainfall")
+SEASON_MONTHS = {0: (6, 7, 8, 9, 10), 1: (11, 12, 1, 2), 2: (3, 4, 5)}
+
+
+def season_for_month(month: int) -> int:
+    """Calendar month → season code (Kharif Jun–Oct, Rabi Nov–Feb, Zaid Mar–May)."""
+    if 6 <= month <= 10:
+        return 0
+    if 3 <= month <= 5:
+        return 2
+    return 1
+
+
+class UnknownDistrict(ValueError):
+    """District not in the climate index (a ValueError so input validation reports it)."""
+
+
+class ClimateIndex:
+    """
+    Row i of every array belongs to keys[i] ("<state>/<district>"):
+    monthly[f] is (n, 12), seasonal[f] is (n, 3) — season means for
+    temperature / humidity; rainfall is the annual total in every season,
+    the scale the models were trained on — precomputed at load and
+    clipped to the acceptance ranges. NaN (no normals) is returned as
+    None. A lookup is one dict probe plus array indexing; no DataFrame is
+    kept.
+    """
+
+    def __init__(self, path: str):
+        self.path = path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
+        self.meta: Dict[str, Any] = {}
+        self.keys = np.array([], dtype=str)
+        self.states = self.districts = self.keys
+        self.monthly: Dict[str, np.ndarray] = {}
+        self.seasonal: Dict[str, np.ndarray] = {}
+        self._row: Dict[str, int] = {}
+        self._by_district: Dict[str, List[str]] = {}
+        if not os.path.exists(self.path):
+            return
+
+        with np.load(self.path, allow_pickle=False) as z:
+            self.keys, self.states, self.districts = z["keys"], z["states"], z["districts"]
+            self.monthly = {f: z[f].astype(np.float32) for f in CLIMATE_FIELDS}
+            self.meta = json.loads(str(z["meta"]))
+        self._row = {k: i for i, k in enumerate(self.keys.tolist())}
+        for key in self._row:
+            self._by_district.setdefault(key.split("/", 1)[1], []).append(key)
+        for f in CLIMATE_FIELDS:
+            if f == "rainfall":
+                cols = [self.monthly[f].sum(axis=1)] * len(SEASON_KEYS)
+            else:
+                cols = [self.monthly[f][:, [m - 1 for m in SEASON_MONTHS[s]]].mean(axis=1)
+                        for s in range(len(SEASON_KEYS))]
+            self.seasonal[f] = np.clip(np.stack(cols, axis=1),
+                                       _ACC[f]["min"], _ACC[f]["max"]).astype(np.float32)
+        logger.info("Loaded %s (%d districts)", os.path.basename(self.path), len(self.keys))
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._row)
+
+    def row(self, district: str, state: Optional[str] = None) -> int:
+        """Array row for a district; UnknownDistrict / ValueError if unknown / ambiguous."""
+        if not self.loaded:
+            raise ValueError("climate index not built (run district_tables.py)")
+        key, candidates = resolve_district(self._row, self._by_district, district, state)
+        if key is None:
+            if len(candidates) > 1:
+                states = [str(self.states[self._row[k]]) for k in candidates]
+                raise ValueError(f"district '{district}' exists in several states; "
+                                 f"pass state (one of {states})")
+            raise UnknownDistrict(f"district '{district}' not in the climate index")
+        return self._row[key]
+
+    def lookup(self, district: str, state: Optional[str] = None,
+               month: Optional[int] = None, season: Optional[int] = None) -> Dict[str, Any]:
+        """Climate features for one month, one season, or (neither) the whole year by month."""
+        i = self.row(district, state)
+        out: Dict[str, Any] = {"state": str(self.states[i]), "district": str(self.districts[i])}
+        if season is not None:
+            out["season"] = get_season_name(season)
+            out.update({f: _normal(self.seasonal[f][i, season]) for f in CLIMATE_FIELDS})
+        elif month is not None:
+            out["month"] = month
+            out.update({f: _normal(self.monthly[f][i, month - 1]) for f in CLIMATE_FIELDS})
+        else:
+            out["monthly"] = {f: [_normal(v) for v in self.monthly[f][i]] for f in CLIMATE_FIELDS}
+        return out
+
+
+def _normal(value: float) -> Optional[float]:
+    """One climate-index cell for a response: rounded, None where no normals exist."""
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+_CLIMATE_INDEX = ClimateIndex(CLIMATE_INDEX_PATH)
+
+
+@app.get("/climate")
+def climate(district: str, state: Optional[str] = None,
+            month: Optional[int] = None, season: Optional[str] = None):
+    """
+    Climate normals for a district: one month (1-12), one season
+    (kharif / rabi / zaid or 0-2; rainfall is the annual normal, the
+    models' scale), or all twelve months. These are the values /recommend
+    uses when a request gives `district` instead of temperature / humidity
+    / rainfall; null means the index has no normals for that field.
+    """
+    if not _CLIMATE_INDEX.loaded:
+        raise HTTPException(503, "Climate index not built (run district_tables.py)")
+    if month is not None and not 1 <= month <= 12:
+        raise HTTPException(400, "month must be 1-12")
+    season_code = None
+    if season is not None:
+        skey = season_key(season)
+        if skey is None:
+            raise HTTPException(400, f"Unknown season '{season}' (use {', '.join(SEASON_KEYS)})")
+        season_code = SEASON_KEYS.index(skey)
+    t0 = time.perf_counter()
+    try:
+        out = _CLIMATE_INDEX.lookup(district, state, month=month, season=season_code)
+    except UnknownDistrict as e:
+        raise HTTPException(404, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    out["units"] = {f: _ACC[f]["unit"] for f in CLIMATE_FIELDS}
+    out["lookup_us"] = round((time.perf_counter() - t0) * 1e6, 1)
+    return out
+
+
+# ===================================================================
+# INPUT OPTIMIZER — smallest N/P/K/pH correction for a target crop
+# ===================================================================
+
+# Candidates scored per request: a 5^4 grid toward the crop's training
+# mean plus random draws around it, then one refinement batch.
+OPTIMIZE_POPULATION = int(os.getenv("OPTIMIZE_POPULATION", "1024"))
+OPTIMIZE_SEED = 42
+CONTROLLABLE_FEATURES = ("N", "P", "K", "ph")
+_CONTROL_DECIMALS = np.array([1, 1, 1, 2])
+
+TIER_RANK = {
+    "Not Recommended": 0,
+    "Conditional": 1,
+    "Conditional / Trial Basis": 1,
+    "Recommended": 2,
+    "Strongly Recommended": 3,
+}
+_NCS_LEVELS = ("weak", "moderate", "strong")
+_EMS_LEVELS = ("weak", "acceptable", "strong")
+_TIER_GRID = [[decision_matrix_tier(c, m) for m in _EMS_LEVELS] for c in _NCS_LEVELS]
+_TIER_RANK_GRID = np.array([[TIER_RANK[t] for t in row] for row in _TIER_GRID])
+
+
+class OptimizeInput(RecommendInput):
+    target_crop: str
+    target_tier: str = Field("Recommended", description="Lowest acceptable advisory tier")
+    verify: bool = Field(True, description="Confirm the suggestion with one /recommend run")
+
+
+def _score_candidates(models: ModelSet, base: Dict[str, Any], crop: str,
+                      controls: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Vectorised stand-in for the /recommend tier of `crop` over a batch of
+    (N, P, K, ph) rows: every predictor scores the whole batch at once and
+    gets the same agronomic penalties as run_model_pipeline; the crop's
+    probability averaged over soil / RF / hybrid gives the NCS level, its
+    crop_stats Z-scores the EMS level, the decision matrix the tier, and
+    the hard feasibility gate zeroes infeasible rows.
+    """
+    X = pd.DataFrame([base] * len(controls))
+    X[list(CONTROLLABLE_FEATURES)] = controls
+
+    hybrid = models.hybrid
+    soil_p = models.soil.predict_proba_batch(X) if models.soil else None
+    ext_p = models.extended.predict_proba_batch(X) if models.extended else None
+    if hybrid is not None:
+        crops = hybrid.unified_crops
+        probas = [
+            hybrid.to_unified(apply_agronomic_constraints_batch(soil_p, models.soil.crops, X), "soil"),
+            hybrid.to_unified(apply_agronomic_constraints_batch(ext_p, models.extended.crops, X),
+                              "extended"),
+            apply_agronomic_constraints_batch(hybrid.blend(soil_p, ext_p), crops, X),
+        ]
+    else:
+        single = models.soil or models.extended
+        crops = single.crops
+        probas = [apply_agronomic_constraints_batch(
+            soil_p if soil_p is not None else ext_p, crops, X)]
+    if crop not in crops:
+        raise HTTPException(404, f"Unknown crop '{crop}'")
+
+    avg = np.mean(probas, axis=0)
+    t = crops.index(crop)
+    p1 = avg[:, t]
+    others = np.delete(avg, t, axis=1)
+    p2 = others.max(axis=1) if others.shape[1] else np.zeros(len(avg))
+
+    ncs = np.clip((p1 - _UNIFORM_BASELINE) / (1.0 - _UNIFORM_BASELINE) * 100.0, 0.0, 100.0)
+    dominance = np.where(p2 > 1e-9, p1 / np.maximum(p2, 1e-9), 50.0)
+    gap = p1 - p2
+    level = np.where(((ncs >= 40) & (dominance >= 2.0)) | (gap >= 0.15), 2,
+                     np.where(((ncs >= 20) & (dominance >= 1.5)) | (gap >= 0.08), 1, 0))
+
+    stats = CROP_STATS.get(crop)
+    if stats:
+        z = []
+        for f in _EMS_FEATURES:
+            col = X[f].to_numpy(dtype=float)
+            mean, std = stats[f]["mean"], stats[f]["std"]
+            if std < 1e-6:
+                z.append(np.where(np.abs(col - mean) < 1e-3, 0.0, 3.0))
+            else:
+                z.append(np.minimum(np.abs(col - mean) / std, 3.0))
+        ems = np.mean(z, axis=0)
+    else:
+        ems = np.ones(len(X))
+    match = np.where(ems < 1.0, 2, np.where(ems < 2.0, 1, 0))
+
+    ph = controls[:, CONTROLLABLE_FEATURES.index("ph")]
+    feasible = np.array([not _feasibility_reasons(crop, base["temperature"], v, base["rainfall"])
+                         for v in ph])
+    rank = np.where(feasible, _TIER_RANK_GRID[level, match], 0)
+    return {"probability": p1, "ncs": ncs, "ems": ems, "level": level,
+            "match": match, "feasible": feasible, "rank": rank}
+
+
+def _fraction_grid(dims: int, steps: int = 5) -> np.ndarray:
+    """All combinations of per-feature fractions {0, …, 1}: (steps**dims, dims)."""
+    axis = np.linspace(0.0, 1.0, steps)
+    return np.stack(np.meshgrid(*[axis] * dims, indexing="ij"), -1).reshape(-1, dims)
+
+
+def _population(x0: np.ndarray, mu: np.ndarray, sd: np.ndarray, lo: np.ndarray,
+                hi: np.ndarray, size: int, rng: np.random.Generator) -> np.ndarray:
+    """Grid from the current input toward the crop mean + random draws around the mean."""
+    grid = x0 + _fraction_grid(len(x0)) * (mu - x0)
+    n_rand = max(size - len(grid), 0)
+    draws = mu + sd * rng.standard_normal((n_rand, len(x0)))
+    frac = rng.uniform(0.0, 1.0, (n_rand, 1))
+    rand = x0 + frac * (draws - x0)
+    return np.clip(np.vstack([grid, rand]), lo, hi)
+
+
+def _refinement(x0: np.ndarray, best: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """Shrink the best correction: per-feature fractions {0, ¼, ½, ¾, 1} of its delta."""
+    return np.clip(x0 + _fraction_grid(len(x0)) * (best - x0), lo, hi)
+
+
+def _pick(cost: np.ndarray, scores: Dict[str, np.ndarray], target_rank: int) -> Tuple[int, bool]:
+    """Cheapest row reaching the tier; otherwise best tier, then highest probability."""
+    ok = scores["rank"] >= target_rank
+    if ok.any():
+        return int(np.flatnonzero(ok)[np.argmin(cost[ok])]), True
+    return int(np.lexsort((-scores["probability"], -scores["rank"]))[0]), False
+
+
+def _candidate_summary(controls: np.ndarray, scores: Dict[str, np.ndarray], i: int) -> Dict[str, Any]:
+    tier = (_TIER_GRID[int(scores["level"][i])][int(scores["match"][i])]
+            if scores["feasible"][i] else "Not Recommended")
+    return {
+        "inputs": {f: round(float(controls[i, j]), int(_CONTROL_DECIMALS[j]))
+                   for j, f in enumerate(CONTROLLABLE_FEATURES)},
+        "tier": tier,
+        "probability": round(float(scores["probability"][i]) * 100, 2),
+        "ncs": round(float(scores["ncs"][i]), 2),
+        "ems": round(float(scores["ems"][i]), 3),
+    }
+
+
+def optimize_inputs(data: OptimizeInput, models: Optional[ModelSet] = None) -> Dict[str, Any]:
+    """
+    Search N, P, K and pH (within the acceptance ranges) for the smallest
+    change — sum of |delta| / acceptance width — that lifts `target_crop`
+    to `target_tier`, then confirm the answer with one /recommend run.
+    When that run happens, `reached` also needs the verified tier.
+    """
+    start = time.time()
+    models = models or MODEL_MANAGER.current
+    if data.target_tier not in TIER_RANK:
+        raise HTTPException(400, f"Unknown target_tier '{data.target_tier}' "
+                                 f"(one of {sorted(TIER_RANK, key=TIER_RANK.get)})")
+    crop = data.target_crop.strip().lower()
+    if crop not in CROP_STATS:
+        raise HTTPException(404, f"Unknown crop '{data.target_crop}'")
+    target_rank = TIER_RANK[data.target_tier]
+
+    season = data.season if data.season is not None else infer_season(data.temperature)
+    base = {
+        "N": data.N, "P": data.P, "K": data.K,
+        "temperature": data.temperature, "humidity": data.humidity,
+        "ph": data.ph, "rainfall": data.rainfall,
+        "season": season, "soil_type": data.soil_type, "irrigation": data.irrigation,
+    }
+    x0 = np.array([base[f] for f in CONTROLLABLE_FEATURES], dtype=float)
+    lo = np.array([_ACC[f]["min"] for f in CONTROLLABLE_FEATURES], dtype=float)
+    hi = np.array([_ACC[f]["max"] for f in CONTROLLABLE_FEATURES], dtype=float)
+    width = np.maximum(hi - lo, 1e-6)
+    mu = np.array([CROP_STATS[crop][f]["mean"] for f in CONTROLLABLE_FEATURES])
+    sd = np.array([CROP_STATS[crop][f]["std"] for f in CONTROLLABLE_FEATURES])
+    scale = 10.0 ** _CONTROL_DECIMALS
+
+    # Temperature / rainfall gate violations cannot be fixed by soil inputs
+    blocked_by = [r for r in _feasibility_reasons(crop, data.temperature, data.ph, data.rainfall)
+                  if not r.startswith("pH")]
+    if blocked_by:
+        cands = x0[None, :]
+    else:
+        rng = np.random.default_rng(OPTIMIZE_SEED)
+        pop = _population(x0, mu, sd, lo, hi, OPTIMIZE_POPULATION, rng)
+        cands = np.vstack([x0, np.round(pop * scale) / scale])
+    scores = _score_candidates(models, base, crop, cands)
+    cost = (np.abs(cands - x0) / width).sum(axis=1)
+    evaluated = len(cands)
+    current = _candidate_summary(cands, scores, 0)
+
+    best, reached = _pick(cost, scores, target_rank)
+    reached = reached and not blocked_by
+    if reached and best != 0:
+        refine = np.round(_refinement(x0, cands[best], lo, hi) * scale) / scale
+        r_scores = _score_candidates(models, base, crop, refine)
+        r_cost = (np.abs(refine - x0) / width).sum(axis=1)
+        evaluated += len(refine)
+        r_best, r_ok = _pick(r_cost, r_scores, target_rank)
+        if r_ok and r_cost[r_best] < cost[best]:
+            cands, scores, cost, best = refine, r_scores, r_cost, r_best
+    suggested = _candidate_summary(cands, scores, best)
+    search_ms = round((time.time() - start) * 1000, 1)
+
+    verified = None
+    if not blocked_by and data.verify:
+        payload = {**data.model_dump(exclude={"target_crop", "target_tier", "verify",
+                                              "district", "state"}),
+                   **suggested["inputs"], "season": season}
+        resp = _recommend_pipeline(RecommendInput(**payload), path="full", models=models)
+        top = resp["top_recommendations"]
+        rank = next((i for i, r in enumerate(top, start=1) if r["crop"] == crop), None)
+        verified = {
+            "rank": rank,
+            "advisory_tier": top[rank - 1]["advisory_tier"] if rank else None,
+            "confidence": top[rank - 1]["confidence"] if rank else None,
+            "top_crop": top[0]["crop"] if top else None,
+        }
+        reached = reached and rank is not None and TIER_RANK.get(verified["advisory_tier"], 0) >= target_rank
+
+    return {
+        "target_crop": crop,
+        "target_tier": data.target_tier,
+        "reached": bool(reached),
+        "blocked_by": blocked_by,
+        "current": current,
+        "suggested": suggested,
+        "deltas": {f: round(suggested["inputs"][f] - current["inputs"][f], int(d))
+                   for f, d in zip(CONTROLLABLE_FEATURES, _CONTROL_DECIMALS)},
+        "change_cost": round(float(cost[best]), 4),
+        "verified": verified,
+        "candidates_evaluated": evaluated,
+        "search_ms": search_ms,
+        "latency_ms": round((time.time() - start) * 1000, 1),
+        "model_version": models.version,
+        "disclaimer": RECOMMEND_DISCLAIMER,
+    }
+
+
+@app.post("/optimize")
+def optimize(data: OptimizeInput):
+    """
+    Reverse question: the smallest N / P / K / pH correction that makes
+    `target_crop` reach `target_tier` (default "Recommended") under the
+    given conditions. `verified` is the /recommend result for the
+    suggested inputs; `reached` is only true when it agrees.
+    """
+    return FastJSONResponse(_with_fragments(optimize_inputs(data)))
+
+
+# ===================================================================
+# WARM-UP + READINESS
+# ===================================================================
+
+# Synthetic requests per model set: one per crop (0 = every crop).
+MODEL_WARMUP_CROPS = int(os.getenv("MODEL_WARMUP_CROPS", "0"))
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+
+_READINESS: Dict[str, Any] = {"ready": False, "state": "starting"}
+
+
+def _synthetic_inputs(limit: Optional[int] = None) -> List[Dict[str, float]]:
+    """One in-range input per crop at its training-mean conditions (crop_stats.json)."""
+    inputs = []
+    for crop in sorted(CROP_STATS)[:limit]:
+        stats = CROP_STATS[crop]
+        inputs.append({
+            f: min(max(float(stats[f]["mean"]), _ACC[f]["min"]), _ACC[f]["max"])
+            for f in ("N", "P", "K", "temperature", "humidity", "ph", "rainfall")
+        })
+    return inputs
+
+
+def _warm_model_set(models: ModelSet) -> Dict[str, Any]:
+    """
+    Push synthetic inputs through every predictor and both advisory
+    pipelines so lazy library initialisation (thread pools, first-call
+    allocations, page faults on the model files) happens before traffic.
+    """
+    t0 = time.time()
+    inputs = _synthetic_inputs(MODEL_WARMUP_CROPS or None)
+    predictors = [("soil", models.soil), ("extended", models.extended),
+                  ("hybrid", models.hybrid)]
+    failures: Dict[str, int] = {}
+    stage_ms: Dict[str, float] = {}
+
+    def _timed(stage: str, fn) -> None:
+        ts = time.monotonic()
+        try:
+            fn()
+        except Exception as e:
+            failures[stage] = failures.get(stage, 0) + 1
+            logger.warning("Warm-up %s failed: %s", stage, e)
+        stage_ms[stage] = stage_ms.get(stage, 0.0) + (time.monotonic() - ts) * 1000
+
+    for payload in inputs:
+        input_dict = {**payload, "season": infer_season(payload["temperature"]),
+                      "soil_type": 1, "irrigation": 0}
+        for name, pred in predictors:
+            if pred is not None:
+                _timed(name, lambda: pred.predict_proba(input_dict))
+        _timed("/predict", lambda: _predict_pipeline(
+            PredictionInput(**payload, mode="both"), models=models))
+        _timed("/recommend", lambda: _recommend_pipeline(
+            RecommendInput(**payload), path="full", models=models))
+
+    if inputs and failures.get("/recommend", 0) == len(inputs):
+        raise RuntimeError("every warm-up /recommend request failed")
+    return {
+        "inputs": len(inputs),
+        "failures": failures,
+        "stage_ms": {k: round(v, 1) for k, v in stage_ms.items()},
+        "ms": round((time.time() - t0) * 1000, 1),
+    }
+
+
+def _startup_warmup() -> None:
+    _READINESS["state"] = "warming"
+    models = MODEL_MANAGER.current
+    try:
+        if _startup_errors(models):
+            raise RuntimeError("startup assertions failed")
+        _READINESS["warmup"] = _warm_model_set(models)
+        _READINESS.update(ready=True, state="ready", model_version=models.version)
+        logger.info("WARM-UP complete: %s", _READINESS["warmup"])
+    except Exception as e:
+        _READINESS.update(ready=False, state="failed", error=str(e))
+        logger.error("WARM-UP failed — /ready will stay 503: %s", e)
+
+
+@app.on_event("startup")
+def _start_warmup() -> None:
+    if not WARMUP_ENABLED:
+        _READINESS.update(ready=True, state="ready (warm-up disabled)")
+        return
+    threading.Thread(target=_startup_warmup, name="warmup", daemon=True).start()
+
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 only once the active model set has been warmed."""
+    body = dict(_READINESS)
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+
+# ===================================================================
+# ADMIN — model hot-swap / rollback
+# ===================================================================
+
+class SwapRequest(BaseModel):
+    registry_file: Optional[str] = Field(
+        None, description="Registry file name in the Aiml directory (default MODEL_REGISTRY_PATH)",
+    )
+
+
+def _require_admin(token: Optional[str]) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(403, "Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(401, "Invalid admin token")
+
+
+@app.get("/admin/models")
+def admin_models(x_admin_token: Optional[str] = Header(None, alias=ADMIN_HEADER)):
+    """Active / previous model sets, last swap job and process memory."""
+    _require_admin(x_admin_token)
+    return MODEL_MANAGER.status()
+
+
+@app.post("/admin/models/swap", status_code=202)
+def admin_models_swap(
+    req: Optional[SwapRequest] = None,
+    x_admin_token: Optional[str] = Header(None, alias=ADMIN_HEADER),
+):
+    """
+    Load the models named in the registry in the background and switch to
+    them once warmed. Poll GET /admin/models for the job state.
+    """
+    _require_admin(x_admin_token)
+    registry_file = req.registry_file if req else None
+    if registry_file is not None:
+        if os.path.basename(registry_file) != registry_file:
+            raise HTTPException(400, "registry_file must be a file name in the Aiml directory")
+        if not os.path.exists(_resolve_registry(registry_file)):
+            raise HTTPException(404, f"Registry file '{registry_file}' not found")
+    try:
+        return MODEL_MANAGER.start_swap(registry_file)
+    except RuntimeError as e:
+        raise HTTPException(409, str(e))
+    except MemoryError as e:
+        raise HTTPException(507, str(e))
+
+
+@app.post("/admin/drift/reset")
+def admin_drift_reset(x_admin_token: Optional[str] = Header(None, alias=ADMIN_HEADER)):
+    """Start a fresh drift window (e.g. after a model swap or a seasonal change)."""
+    _require_admin(x_admin_token)
+    _DRIFT.reset()
+    return {"status": "reset", "since": _DRIFT.since}
+
+
+@app.post("/admin/models/rollback")
+def admin_models_rollback(x_admin_token: Optional[str] = Header(None, alias=ADMIN_HEADER)):
+    """Switch back to the previously active model set (MODEL_KEEP_PREVIOUS=true)."""
+    _require_admin(x_admin_token)
+    try:
+        models = MODEL_MANAGER.rollback()
+    except RuntimeError as e:
+        raise HTTPException(409, str(e))
+    return {"status": "rolled_back", "current": models.describe()}
+
+
+# ===================================================================
+# PRECOMPUTED INFO BODIES — built now, rebuilt on every model swap
+# ===================================================================
+
+_INFO_BODIES.rebuild(MODEL_MANAGER.current)
+MODEL_MANAGER.add_listener(_INFO_BODIES.rebuild)
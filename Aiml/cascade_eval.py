@@ -0,0 +1,177 @@
+"""
+Cascade Agreement Evaluation — /recommend cheap-first mode
+==========================================================
+Offline check for the confidence-gated cascade in app.py.
+
+Every training row is run through the /recommend pipeline twice:
+  - "full"  : V6 stacked ensemble + calibrated RF + hybrid (production path)
+  - "cheap" : calibrated RF only, with the cascade gate statistics
+
+The gate statistics (NCS, dominance, infeasible leaders) do not depend on
+the thresholds, so a single pass is enough to sweep a grid of
+(CASCADE_MIN_NCS, CASCADE_MIN_DOMINANCE) settings and report, for each:
+  - skip_rate            — share of requests that never touch the stack
+  - top1_agreement       — cascade top-1 == full top-1 (over all rows)
+  - top1_agreement_skip  — same, restricted to the skipped rows
+  - top3_overlap         — mean |top-3 ∩ top-3| / 3
+  - est_latency_ms       — expected mean latency under that setting
+
+Usage:
+    python cascade_eval.py --data Crop_recommendation_v2.csv --limit 3000
+
+Writes:
+    cascade_report.json
+"""
+
+import argparse
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+
+import app as engine
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s  %(levelname)-8s  %(message)s",
+    datefmt="%H:%M:%S",
+)
+log = logging.getLogger("cascade_eval")
+
+RANDOM_STATE = 42
+DEFAULT_DATA = "Crop_recommendation_v2.csv"
+REPORT_OUT = "cascade_report.json"
+
+NCS_GRID = [20, 30, 40, 50, 60, 70, 80]
+DOMINANCE_GRID = [1.5, 2.0, 3.0, 5.0, 10.0]
+
+INPUT_FIELDS = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall",
+                "season", "soil_type", "irrigation"]
+
+
+def _row_to_input(row: pd.Series):
+    payload = {f: row[f] for f in INPUT_FIELDS if f in row and not pd.isna(row[f])}
+    for f in ("season", "soil_type", "irrigation"):
+        if f in payload:
+            payload[f] = int(payload[f])
+    return engine.RecommendInput(**payload)
+
+
+def _top_crops(resp: dict) -> list:
+    return [r["crop"] for r in resp.get("top_recommendations", [])]
+
+
+def evaluate(df: pd.DataFrame) -> dict:
+    rows = []
+    skipped_invalid = 0
+
+    for i, (_, row) in enumerate(df.iterrows(), start=1):
+        try:
+            inp = _row_to_input(row)
+        except ValidationError:
+            skipped_invalid += 1
+            continue
+
+        full = engine._recommend_pipeline(inp, path="full")
+        cheap = engine._recommend_pipeline(inp, path="cheap")
+        gate = cheap.get("cascade", {})
+
+        full_top = _top_crops(full)
+        cheap_top = _top_crops(cheap)
+        rows.append({
+            "label": row.get("label"),
+            "ncs": gate.get("ncs", 0.0),
+            "dominance": gate.get("dominance", 0.0),
+            "strong": gate.get("confidence_level") == "strong",
+            "feasible": not gate.get("leaders_infeasible"),
+            "top1_match": bool(full_top and cheap_top and full_top[0] == cheap_top[0]),
+            "top3_overlap": len(set(full_top) & set(cheap_top)) / 3.0,
+            "full_top1": full_top[0] if full_top else None,
+            "cheap_top1": cheap_top[0] if cheap_top else None,
+            "full_ms": full["latency_ms"],
+            "cheap_ms": cheap["latency_ms"],
+        })
+
+        if i % 500 == 0:
+            log.info(f"    {i:,}/{len(df):,} rows evaluated")
+
+    ev = pd.DataFrame(rows)
+    log.info(f"    Evaluated {len(ev):,} rows ({skipped_invalid:,} outside acceptance limits)")
+
+    full_ms = float(ev["full_ms"].mean())
+    cheap_ms = float(ev["cheap_ms"].mean())
+    label_full = float((ev["full_top1"] == ev["label"]).mean())
+    label_cheap = float((ev["cheap_top1"] == ev["label"]).mean())
+
+    grid = []
+    for t_ncs in NCS_GRID:
+        for t_dom in DOMINANCE_GRID:
+            accept = (ev["strong"] & ev["feasible"]
+                      & (ev["ncs"] >= t_ncs) & (ev["dominance"] >= t_dom)).values
+            skip_rate = float(accept.mean())
+            top1_match = np.where(accept, ev["top1_match"].values, True)
+            top3 = np.where(accept, ev["top3_overlap"].values, 1.0)
+            grid.append({
+                "min_ncs": t_ncs,
+                "min_dominance": t_dom,
+                "skip_rate": round(skip_rate, 4),
+                "top1_agreement": round(float(top1_match.mean()), 4),
+                "top1_agreement_skip": (round(float(ev["top1_match"].values[accept].mean()), 4)
+                                        if accept.any() else None),
+                "top3_overlap": round(float(top3.mean()), 4),
+                "est_latency_ms": round(skip_rate * cheap_ms
+                                        + (1 - skip_rate) * (cheap_ms + full_ms), 1),
+            })
+
+    return {
+        "rows": int(len(ev)),
+        "rows_outside_limits": skipped_invalid,
+        "mean_latency_ms": {"full": round(full_ms, 1), "cheap": round(cheap_ms, 1)},
+        "label_top1": {"full": round(label_full, 4), "cheap": round(label_cheap, 4)},
+        "always_cheap_top1_agreement": round(float(ev["top1_match"].mean()), 4),
+        "grid": grid,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure /recommend cascade agreement offline.")
+    parser.add_argument("--data", default=DEFAULT_DATA, help="training CSV (N..irrigation, label)")
+    parser.add_argument("--limit", type=int, default=3000, help="rows to sample (0 = all)")
+    parser.add_argument("--out", default=REPORT_OUT)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        raise SystemExit(f"Dataset not found: {args.data}")
+
+    df = pd.read_csv(args.data, low_memory=False)
+    if args.limit and len(df) > args.limit:
+        df = df.sample(n=args.limit, random_state=RANDOM_STATE)
+    log.info(f"Evaluating cascade on {len(df):,} rows from {args.data}")
+
+    report = evaluate(df)
+    report.update({
+        "dataset": os.path.basename(args.data),
+        "configured": {
+            "enabled": engine.CASCADE_ENABLED,
+            "min_ncs": engine.CASCADE_MIN_NCS,
+            "min_dominance": engine.CASCADE_MIN_DOMINANCE,
+        },
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    })
+
+    log.info(f"    {'NCS':>5s}  {'dom':>5s}  {'skip':>7s}  {'top-1 agr':>9s}  {'top-3':>6s}  {'ms':>7s}")
+    for g in report["grid"]:
+        log.info(f"    {g['min_ncs']:5.0f}  {g['min_dominance']:5.1f}  {g['skip_rate'] * 100:6.1f}%  "
+                 f"{g['top1_agreement'] * 100:8.2f}%  {g['top3_overlap']:6.3f}  {g['est_latency_ms']:7.1f}")
+
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    log.info(f"Saved: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Dataset Cache — columnar, dtype-optimized training inputs
+=========================================================
+The training scripts read their source CSVs through load_dataset(). The
+first read of a given file parses the CSV once and stores a Parquet copy
+keyed by the sha256 of the source bytes; every later read of the same
+bytes loads the Parquet file instead.
+
+Stored dtypes:
+  - float64 columns            → float32 (tree learners split on float32 anyway)
+  - integer-valued columns     → smallest signed int (int8 / int16 / int32)
+  - low-cardinality text       → category (crop labels, season names, ...)
+
+A JSON manifest next to each Parquet file records the source hash, size
+and mtime, so an unchanged file is recognised from a stat() without
+re-hashing. Editing the CSV changes the hash and rebuilds the cache.
+Without pyarrow the loader falls back to CSV (still dtype-optimized).
+
+Usage:
+    python dataset_cache.py build                       # default training sources
+    python dataset_cache.py build my.csv --force
+    python dataset_cache.py verify                      # compare cache vs CSV
+
+Writes:
+    .dataset_cache/<stem>-<sha12>.parquet  (+ .json manifest)
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s  %(levelname)-8s  %(message)s",
+    datefmt="%H:%M:%S",
+)
+log = logging.getLogger("dataset_cache")
+
+BASE_DIR = Path(__file__).parent
+CACHE_DIR = Path(os.getenv("DATASET_CACHE_DIR", str(BASE_DIR / ".dataset_cache")))
+CACHE_ENABLED = os.getenv("DATASET_CACHE", "1") == "1"
+DEFAULT_SOURCES = ["real_world_merged_dataset.csv", "Crop_recommendation_v2.csv"]
+
+CATEGORY_MAX_RATIO = 0.5   # text columns with nunique / rows below this become categoricals
+VERIFY_RTOL = 1e-6         # float32 keeps ~7 significant digits
+
+try:
+    import pyarrow  # noqa: F401  (Parquet engine)
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+# ===================================================================
+# DTYPES
+# ===================================================================
+
+def optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Downcast numeric columns and turn repetitive text into categoricals."""
+    out = {}
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_bool_dtype(s):
+            out[col] = s
+        elif pd.api.types.is_numeric_dtype(s):
+            values = s.to_numpy()
+            if s.notna().all() and np.array_equal(values, np.round(values)):
+                out[col] = pd.to_numeric(s, downcast="integer")
+                if out[col].dtype == np.int64:
+                    out[col] = s
+            else:
+                out[col] = s.astype(np.float32)
+        elif pd.api.types.is_string_dtype(s) and len(s) and s.nunique(dropna=True) / len(s) < CATEGORY_MAX_RATIO:
+            out[col] = s.astype("category")
+        else:
+            out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+# ===================================================================
+# CACHE
+# ===================================================================
+
+def source_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cache_paths(path: Path, digest: str) -> Tuple[Path, Path]:
+    stem = f"{path.stem}-{digest[:12]}"
+    return CACHE_DIR / f"{stem}.parquet", CACHE_DIR / f"{stem}.json"
+
+
+def _owned_files(path: Path) -> List[Path]:
+    """
+    Cache files built from `path`: exactly <stem>-<12 hex>.parquet / .json
+    (or a leftover .tmp<pid>), minus any whose manifest names another source
+    with the same stem.
+    """
+    pattern = re.compile(rf"{re.escape(path.stem)}-([0-9a-f]{{12}})\.(parquet|json|tmp\d+)")
+    owned, foreign = [], set()
+    for f in CACHE_DIR.glob(f"{path.stem}-*"):
+        m = pattern.fullmatch(f.name)
+        if not m:
+            continue
+        owned.append((m.group(1), f))
+        if m.group(2) == "json":
+            try:
+                if json.loads(f.read_text()).get("source") != path.name:
+                    foreign.add(m.group(1))
+            except (OSError, ValueError):
+                pass
+    return [f for digest, f in owned if digest not in foreign]
+
+
+def _known_digest(path: Path) -> Optional[str]:
+    """Digest from a manifest whose recorded size/mtime still match the source."""
+    st = path.stat()
+    for manifest in _owned_files(path):
+        if manifest.suffix != ".json":
+            continue
+        try:
+            meta = json.loads(manifest.read_text())
+        except (OSError, ValueError):
+            continue
+        if (meta.get("source") == path.name and meta.get("size") == st.st_size
+                and meta.get("mtime_ns") == st.st_mtime_ns):
+            return meta["sha256"]
+    return None
+
+
+def build(path: Path, force: bool = False) -> Dict:
+    """Parse the CSV, downcast, write Parquet + manifest atomically; drop stale copies."""
+    path = Path(path)
+    st = path.stat()
+    digest = source_digest(path)
+    parquet_path, manifest_path = _cache_paths(path, digest)
+    if parquet_path.exists() and manifest_path.exists() and not force:
+        meta = json.loads(manifest_path.read_text())
+        if meta.get("size") != st.st_size or meta.get("mtime_ns") != st.st_mtime_ns:
+            meta.update(size=st.st_size, mtime_ns=st.st_mtime_ns)   # touched, same bytes
+            manifest_path.write_text(json.dumps(meta, indent=2))
+        log.info(f"  {path.name}: cache up to date ({parquet_path.name})")
+        return meta
+    if not HAS_PYARROW:
+        raise SystemExit("pyarrow is required to build the cache (pip install pyarrow)")
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    raw = pd.read_csv(path, low_memory=False)
+    csv_s = time.perf_counter() - t0
+    df = optimize_dtypes(raw)
+
+    tmp = parquet_path.with_suffix(f".tmp{os.getpid()}")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, parquet_path)
+    meta = {
+        "source": path.name,
+        "sha256": digest,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "rows": len(df),
+        "columns": len(df.columns),
+        "dtypes": {c: str(t) for c, t in df.dtypes.items()},
+        "memory_mb_csv": round(memory_mb(raw), 2),
+        "memory_mb_cache": round(memory_mb(df), 2),
+        "csv_parse_s": round(csv_s, 3),
+        "parquet_bytes": parquet_path.stat().st_size,
+        "built": datetime.now(timezone.utc).isoformat(),
+    }
+    manifest_path.write_text(json.dumps(meta, indent=2))
+
+    for stale in _owned_files(path):
+        if stale not in (parquet_path, manifest_path):
+            stale.unlink()
+    log.info(f"  {path.name}: {len(df):,} rows → {parquet_path.name}  "
+             f"({meta['memory_mb_csv']:.1f} MB → {meta['memory_mb_cache']:.1f} MB in memory)")
+    return meta
+
+
+def load_dataset(path, use_cache: bool = CACHE_ENABLED) -> pd.DataFrame:
+    """
+    Drop-in for pd.read_csv(path, low_memory=False) on training sources.
+
+    Returns the cached, dtype-optimized frame, building the cache on a miss.
+    """
+    path = Path(path)
+    if not use_cache:
+        return pd.read_csv(path, low_memory=False)
+    if not HAS_PYARROW:
+        log.warning(f"    pyarrow not installed — reading {path.name} from CSV (no cache)")
+        return optimize_dtypes(pd.read_csv(path, low_memory=False))
+
+    digest = _known_digest(path) if CACHE_DIR.exists() else None
+    if digest is None:
+        digest = build(path)["sha256"]
+    parquet_path, _ = _cache_paths(path, digest)
+    if not parquet_path.exists():
+        build(path, force=True)
+    t0 = time.perf_counter()
+    df = pd.read_parquet(parquet_path)
+    log.info(f"    {path.name}: loaded from cache {parquet_path.name} "
+             f"in {time.perf_counter() - t0:.2f}s ({memory_mb(df):.1f} MB)")
+    return df
+
+
+# ===================================================================
+# VERIFY
+# ===================================================================
+
+def verify(path: Path) -> List[str]:
+    """Compare the cached frame with a fresh CSV parse; returns a list of problems."""
+    path = Path(path)
+    digest = source_digest(path)
+    parquet_path, manifest_path = _cache_paths(path, digest)
+    if not parquet_path.exists() or not manifest_path.exists():
+        return [f"no cache for current contents (sha256 {digest[:12]}) — run build"]
+
+    t0 = time.perf_counter()
+    raw = pd.read_csv(path, low_memory=False)
+    csv_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    cached = pd.read_parquet(parquet_path)
+    cache_s = time.perf_counter() - t0
+
+    problems = []
+    if list(raw.columns) != list(cached.columns):
+        problems.append("column names/order differ")
+    if len(raw) != len(cached):
+        problems.append(f"row count {len(cached):,} != {len(raw):,}")
+    if problems:
+        return problems
+
+    for col in raw.columns:
+        a, b = raw[col], cached[col]
+        if pd.api.types.is_numeric_dtype(a) and not pd.api.types.is_bool_dtype(a):
+            av = a.to_numpy(dtype=np.float64)
+            bv = b.to_numpy(dtype=np.float64)
+            if not np.array_equal(np.isnan(av), np.isnan(bv)):
+                problems.append(f"{col}: NaN positions differ")
+            elif not np.allclose(av, bv, rtol=VERIFY_RTOL, atol=0, equal_nan=True):
+                err = np.nanmax(np.abs(av - bv) / np.maximum(np.abs(av), 1e-12))
+                problems.append(f"{col}: max relative error {err:.2e} > {VERIFY_RTOL:g}")
+        elif not a.astype(object).where(a.notna(), None).equals(b.astype(object).where(b.notna(), None)):
+            problems.append(f"{col}: values differ")
+
+    log.info(f"  {path.name}: load {csv_s:.2f}s (CSV) → {cache_s:.2f}s (cache), "
+             f"memory {memory_mb(raw):.1f} MB → {memory_mb(cached):.1f} MB")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or verify the columnar training-data cache.")
+    parser.add_argument("command", choices=["build", "verify"])
+    parser.add_argument("sources", nargs="*", help=f"CSV files (default: {' '.join(DEFAULT_SOURCES)})")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the cache is current")
+    args = parser.parse_args()
+
+    sources = [Path(s) for s in args.sources] or [BASE_DIR / s for s in DEFAULT_SOURCES]
+    failed = 0
+    for src in sources:
+        if not src.exists():
+            log.warning(f"  {src}: not found, skipped")
+            continue
+        if args.command == "build":
+            build(src, force=args.force)
+            continue
+        problems = verify(src)
+        for p in problems:
+            log.error(f"  {src.name}: {p}")
+        if problems:
+            failed += 1
+        else:
+            log.info(f"  {src.name}: ✓ cache matches source")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
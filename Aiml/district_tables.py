@@ -0,0 +1,434 @@
+"""
+District Recommendation Tables — offline batch scoring
+======================================================
+Precomputes /recommend results for every district × season so that
+"what should I grow in my district" is answered by GET
+/district-recommendations without model inference.
+
+Sources:
+  - ICRISAT-District_Level_Data.csv — district crop areas per year (wide:
+    "<CROP> AREA (1000 ha)"). The area mix of the last --years years
+    decides which crops a district actually grows in each season.
+  - temperature.csv / rainfall.csv (and, optionally, humidity.csv) —
+    monthly (JAN..DEC) or seasonal (JAN-FEB, MAR-MAY, JUN-SEP, OCT-DEC)
+    climate per year, national or per state/subdivision when the file has
+    a region column.
+  - real_world_merged_dataset.csv — field samples with state and district;
+    their N, P, K, ph and humidity medians describe a district's soil.
+
+Representative input per (district, season):
+  - temperature / rainfall — season mean / annual total (the models'
+    rainfall scale) of the climate normals for the district's state
+    (national if unmatched)
+  - humidity               — season mean of the humidity normals; the
+    district's field-sample median when there is no humidity source
+  - N, P, K, ph            — median of the district's field samples; the
+    state's, then the national median when the district has fewer than
+    MIN_SOIL_SAMPLES samples (recorded as soil_source)
+  - soil_type / irrigation — engine defaults (loam, rainfed)
+
+The soil is not derived from the crops a district grows (that would feed
+the answer back into the question); the crop mix is only reported as
+"grown" next to the model's advice.
+
+Every vector is scored once through app._recommend_pipeline (full path)
+and stored as compact JSON keyed by "<state>/<district>", with a
+district-name index for lookups without a state.
+
+The same normals are also written as the climate index behind GET
+/climate and district-based /recommend requests: aligned (districts × 12)
+arrays of temperature, rainfall and humidity, keyed by "<state>/<district>".
+Humidity is NaN without a humidity source: the engine then asks callers
+for it rather than filling it from anything but climate normals.
+
+Usage:
+    python district_tables.py --years 10
+    python district_tables.py --index-only      # climate index only, no scoring
+
+Writes:
+    district_recommendations.json
+    climate_index.npz
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from pydantic import ValidationError
+
+import app as engine
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s  %(levelname)-8s  %(message)s",
+    datefmt="%H:%M:%S",
+)
+log = logging.getLogger("district_tables")
+
+ICRISAT_CSV = "ICRISAT-District_Level_Data.csv"
+TEMPERATURE_CSV = "temperature.csv"
+RAINFALL_CSV = "rainfall.csv"
+HUMIDITY_CSV = "humidity.csv"
+SOIL_CSV = "real_world_merged_dataset.csv"
+TABLE_OUT = "district_recommendations.json"
+INDEX_OUT = "climate_index.npz"
+TABLE_VERSION = 2
+MIN_SOIL_SAMPLES = 5   # field samples needed before a district median is trusted
+
+MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN",
+          "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+SEASONAL_COLUMNS = {"JAN-FEB": (1, 2), "MAR-MAY": (3, 4, 5),
+                    "JUN-SEP": (6, 7, 8, 9), "OCT-DEC": (10, 11, 12)}
+REGION_COLUMNS = ("STATE", "STATE NAME", "SUBDIVISION", "REGION")
+
+SEASON_KEYS = dict(enumerate(engine.SEASON_KEYS))
+
+# ICRISAT crop column prefix → (engine crop, season code)
+ICRISAT_CROPS = {
+    "RICE": ("rice", 0),
+    "WHEAT": ("wheat", 1),
+    "KHARIF SORGHUM": ("jowar", 0),
+    "RABI SORGHUM": ("jowar", 1),
+    "PEARL MILLET": ("bajra", 0),
+    "MAIZE": ("maize", 0),
+    "FINGER MILLET": ("ragi", 0),
+    "BARLEY": ("barley", 1),
+    "CHICKPEA": ("chickpea", 1),
+    "PIGEONPEA": ("pigeonpeas", 0),
+    "GROUNDNUT": ("groundnut", 0),
+    "SESAMUM": ("sesame", 0),
+    "RAPESEED AND MUSTARD": ("mustard", 1),
+    "CASTOR": ("castor", 0),
+    "SOYABEAN": ("soybean", 0),
+    "SUGARCANE": ("sugarcane", 0),
+    "COTTON": ("cotton", 0),
+    "POTATOES": ("potato", 1),
+    "ONION": ("onion", 1),
+}
+SOIL_FEATURES = ("N", "P", "K", "ph", "humidity")
+AREA_RE = re.compile(r"^(.*?)\s+AREA\s*\(1000 HA\)$")
+
+
+def _find_column(df: pd.DataFrame, *candidates: str):
+    upper = {c.strip().upper(): c for c in df.columns}
+    for cand in candidates:
+        if cand in upper:
+            return upper[cand]
+    return None
+
+
+# ===================================================================
+# CLIMATE NORMALS — region × month
+# ===================================================================
+
+def monthly_normals(path: str, years: int, how: str) -> pd.DataFrame:
+    """
+    Mean of the last `years` years per region and month → DataFrame
+    indexed by normalised region ("" = national) with columns 1..12.
+
+    Seasonal-only files are spread over their months: temperatures are
+    repeated, rainfall totals are divided evenly (how="mean" / "sum").
+    """
+    df = pd.read_csv(path)
+    df.columns = [c.strip() for c in df.columns]
+    year_col = _find_column(df, "YEAR")
+    region_col = _find_column(df, *REGION_COLUMNS)
+    if year_col is None:
+        raise SystemExit(f"{path}: no YEAR column")
+
+    month_cols = [_find_column(df, m) for m in MONTHS]
+    monthly = pd.DataFrame(index=df.index)
+    if all(c is not None for c in month_cols):
+        for m, col in enumerate(month_cols, start=1):
+            monthly[m] = pd.to_numeric(df[col], errors="coerce")
+    else:
+        for season_col, months in SEASONAL_COLUMNS.items():
+            col = _find_column(df, season_col)
+            if col is None:
+                raise SystemExit(f"{path}: needs JAN..DEC or {list(SEASONAL_COLUMNS)} columns")
+            values = pd.to_numeric(df[col], errors="coerce")
+            for m in months:
+                monthly[m] = values / len(months) if how == "sum" else values
+
+    monthly["_region"] = df[region_col].map(engine.norm_name) if region_col else ""
+    monthly["_year"] = pd.to_numeric(df[year_col], errors="coerce")
+    latest = monthly["_year"].max()
+    recent = monthly[monthly["_year"] > latest - years]
+    normals = recent.groupby("_region")[list(range(1, 13))].mean()
+    if "" not in normals.index:
+        normals.loc[""] = normals.mean()
+    return normals
+
+
+def region_rows(normals: pd.DataFrame, state: str) -> np.ndarray:
+    """Month vector for a state: exact region, else regions naming the state, else national."""
+    key = engine.norm_name(state)
+    if key in normals.index:
+        return normals.loc[key].values
+    partial = [r for r in normals.index if r and key in r]
+    if partial:
+        return normals.loc[partial].mean().values
+    return normals.loc[""].values
+
+
+def season_climate(temp_months: np.ndarray, rain_months: np.ndarray, season: int,
+                   hum_months: np.ndarray = None) -> dict:
+    """Season mean temperature (and humidity); rainfall is the annual total, as in training."""
+    idx = [m - 1 for m in engine.SEASON_MONTHS[season]]
+    climate = {
+        "temperature": float(np.nanmean(temp_months[idx])),
+        "rainfall": float(np.nansum(rain_months)),
+    }
+    if hum_months is not None:
+        climate["humidity"] = float(np.nanmean(hum_months[idx]))
+    return climate
+
+
+# ===================================================================
+# DISTRICT CROP MIX — ICRISAT areas
+# ===================================================================
+
+def district_crop_areas(path: str, years: int) -> pd.DataFrame:
+    """Mean crop area (1000 ha) over the last `years` years: one row per district."""
+    df = pd.read_csv(path, low_memory=False)
+    df.columns = [c.strip() for c in df.columns]
+    state_col = _find_column(df, "STATE NAME", "STATE")
+    dist_col = _find_column(df, "DIST NAME", "DISTRICT NAME", "DISTRICT")
+    year_col = _find_column(df, "YEAR")
+    if not (state_col and dist_col and year_col):
+        raise SystemExit(f"{path}: needs State Name, Dist Name and Year columns")
+
+    area_cols = {}
+    for col in df.columns:
+        m = AREA_RE.match(col.upper())
+        if m and m.group(1).strip() in ICRISAT_CROPS:
+            area_cols[col] = m.group(1).strip()
+    log.info(f"    {len(area_cols)} mapped crop area columns in {path}")
+
+    latest = df[year_col].max()
+    recent = df[df[year_col] > latest - years]
+    areas = recent.groupby([state_col, dist_col])[list(area_cols)].mean().clip(lower=0).fillna(0.0)
+    areas.columns = [area_cols[c] for c in areas.columns]
+    areas.index.names = ["state", "district"]
+    return areas
+
+
+def grown_crops(areas: pd.Series, season: int) -> list:
+    """The district's five largest crops of `season` by area."""
+    weights = {}
+    for col, area in areas.items():
+        if area > 0 and ICRISAT_CROPS[col][1] == season:
+            crop = ICRISAT_CROPS[col][0]
+            weights[crop] = weights.get(crop, 0.0) + float(area)
+    return sorted(weights, key=weights.get, reverse=True)[:5]
+
+
+# ===================================================================
+# DISTRICT SOIL — field-sample medians
+# ===================================================================
+
+def soil_medians(path: str) -> dict:
+    """
+    Median N, P, K, ph and humidity of the field samples per district and
+    per state (groups under MIN_SOIL_SAMPLES dropped), plus the national
+    median. Districts are keyed "<state>/<district>" like the tables.
+    """
+    df = pd.read_csv(path, low_memory=False)
+    df.columns = [c.strip() for c in df.columns]
+    state_col = _find_column(df, "STATE NAME", "STATE")
+    dist_col = _find_column(df, "DIST NAME", "DISTRICT NAME", "DISTRICT")
+    cols = {f: _find_column(df, f.upper()) for f in SOIL_FEATURES}
+    if not (state_col and dist_col) or None in cols.values():
+        raise SystemExit(f"{path}: needs state, district and {', '.join(SOIL_FEATURES)} columns")
+
+    values = pd.DataFrame({f: pd.to_numeric(df[c], errors="coerce") for f, c in cols.items()})
+    values["_state"] = df[state_col].map(engine.norm_name)
+    values["_key"] = values["_state"] + "/" + df[dist_col].map(engine.norm_name)
+
+    def _grouped(by: str) -> pd.DataFrame:
+        groups = values.groupby(by)[list(SOIL_FEATURES)]
+        return groups.median()[groups.size() >= MIN_SOIL_SAMPLES]
+
+    medians = {"district": _grouped("_key"), "state": _grouped("_state"),
+               "national": values[list(SOIL_FEATURES)].median()}
+    log.info(f"    Soil medians from {path}: {len(medians['district']):,} districts, "
+             f"{len(medians['state']):,} states ({len(values):,} samples)")
+    return medians
+
+
+def representative_soil(medians: dict, state: str, district: str) -> tuple:
+    """(soil features, source level): district median, gaps filled from the state, then nationally."""
+    state_key = engine.norm_name(state)
+    key = f"{state_key}/{engine.norm_name(district)}"
+    soil, source = medians["national"], "national"
+    if state_key in medians["state"].index:
+        soil, source = medians["state"].loc[state_key].fillna(soil), "state"
+    if key in medians["district"].index:
+        soil, source = medians["district"].loc[key].fillna(soil), "district"
+    return {f: float(v) for f, v in soil.items()}, source
+
+
+# ===================================================================
+# BUILD + SCORE
+# ===================================================================
+
+def _clip(feature: str, value: float) -> float:
+    return round(min(max(value, engine._ACC[feature]["min"]), engine._ACC[feature]["max"]), 2)
+
+
+def _compact(resp: dict) -> dict:
+    return {
+        "top": [
+            {k: r.get(k) for k in ("crop", "confidence", "advisory_tier", "ncs", "ems")}
+            for r in resp["top_recommendations"]
+        ],
+        "fallback_mode": resp["fallback_mode"],
+        "global_unsuitable": resp["global_unsuitable"],
+        "limiting_factor": resp.get("limiting_factor"),
+    }
+
+
+def build_tables(areas: pd.DataFrame, soils: dict, temp: pd.DataFrame, rain: pd.DataFrame,
+                 hum, args) -> dict:
+    log.info(f"Scoring {len(areas):,} districts × {len(SEASON_KEYS)} seasons "
+             f"(climate regions: {len(temp)} temperature, {len(rain)} rainfall)")
+
+    models = engine.MODEL_MANAGER.current
+    districts, by_name = {}, {}
+    scored = skipped = 0
+    t0 = time.time()
+    for i, ((state, district), row) in enumerate(areas.iterrows(), start=1):
+        key = f"{engine.norm_name(state)}/{engine.norm_name(district)}"
+        t_months, r_months = region_rows(temp, state), region_rows(rain, state)
+        h_months = region_rows(hum, state) if hum is not None else None
+        soil, soil_source = representative_soil(soils, state, district)
+        seasons = {}
+        for season, season_key in SEASON_KEYS.items():
+            climate = season_climate(t_months, r_months, season, h_months)
+            inputs = {f: _clip(f, v) for f, v in {**soil, **climate}.items()}
+            try:
+                resp = engine._recommend_pipeline(
+                    engine.RecommendInput(**inputs, season=season), path="full", models=models)
+            except ValidationError:
+                skipped += 1
+                continue
+            seasons[season_key] = {"inputs": inputs, "soil_source": soil_source,
+                                   "grown": grown_crops(row, season), **_compact(resp)}
+            scored += 1
+        if seasons:
+            districts[key] = {"state": str(state).strip(), "district": str(district).strip(),
+                              "seasons": seasons}
+            by_name.setdefault(engine.norm_name(district), []).append(key)
+        if i % 50 == 0:
+            log.info(f"    {i:,}/{len(areas):,} districts "
+                     f"({scored / (time.time() - t0):.1f} rows/s)")
+
+    log.info(f"    Scored {scored:,} district-seasons ({skipped:,} skipped) "
+             f"in {time.time() - t0:.1f}s")
+    return {
+        "_meta": {
+            "table_version": TABLE_VERSION,
+            "model_version": models.version,
+            "engine_version": engine.RECOMMEND_VERSION,
+            "years": args.years,
+            "sources": _sources(args, args.soil),
+            "seasons": list(SEASON_KEYS.values()),
+            "humidity": "climate normals" if hum is not None else "field-sample median",
+            "districts": len(districts),
+            "entries": scored,
+            "generated": datetime.now(timezone.utc).isoformat(),
+        },
+        "districts": districts,
+        "by_district": by_name,
+    }
+
+
+def build_climate_index(areas: pd.DataFrame, temp: pd.DataFrame, rain: pd.DataFrame,
+                        hum, args) -> dict:
+    """Aligned arrays for app.ClimateIndex: one row per district, one column per month."""
+    keys, states, districts = [], [], []
+    temperature, rainfall, humidity = [], [], []
+    for state, district in areas.index:
+        keys.append(f"{engine.norm_name(state)}/{engine.norm_name(district)}")
+        states.append(str(state).strip())
+        districts.append(str(district).strip())
+        temperature.append(region_rows(temp, state))
+        rainfall.append(region_rows(rain, state))
+        humidity.append(region_rows(hum, state) if hum is not None else np.full(12, np.nan))
+
+    meta = {
+        "years": args.years,
+        "sources": _sources(args),
+        "humidity": "climate normals" if hum is not None else None,
+        "districts": len(keys),
+        "generated": datetime.now(timezone.utc).isoformat(),
+    }
+    return {
+        "keys": np.array(keys),
+        "states": np.array(states),
+        "districts": np.array(districts),
+        "temperature": np.asarray(temperature, dtype=np.float32),
+        "rainfall": np.asarray(rainfall, dtype=np.float32),
+        "humidity": np.asarray(humidity, dtype=np.float32),
+        "meta": np.array(json.dumps(meta)),
+    }
+
+
+def _sources(args, *extra: str) -> list:
+    """Input file names for _meta: ICRISAT and climate files plus `extra`."""
+    paths = [args.icrisat, *extra, args.temperature, args.rainfall]
+    if os.path.exists(args.humidity):
+        paths.append(args.humidity)
+    return [os.path.basename(p) for p in paths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute /recommend results per district and season.")
+    parser.add_argument("--icrisat", default=ICRISAT_CSV)
+    parser.add_argument("--soil", default=SOIL_CSV, help="field samples with state and district")
+    parser.add_argument("--temperature", default=TEMPERATURE_CSV)
+    parser.add_argument("--rainfall", default=RAINFALL_CSV)
+    parser.add_argument("--humidity", default=HUMIDITY_CSV,
+                        help="monthly humidity normals; without it the index leaves humidity unfilled")
+    parser.add_argument("--years", type=int, default=10, help="recent years averaged for areas and climate")
+    parser.add_argument("--out", default=TABLE_OUT)
+    parser.add_argument("--index-out", default=INDEX_OUT)
+    parser.add_argument("--index-only", action="store_true", help="write the climate index, skip scoring")
+    args = parser.parse_args()
+
+    required = [args.icrisat, args.temperature, args.rainfall]
+    for path in required if args.index_only else [*required, args.soil]:
+        if not os.path.exists(path):
+            raise SystemExit(f"Dataset not found: {path}")
+
+    areas = district_crop_areas(args.icrisat, args.years)
+    temp = monthly_normals(args.temperature, args.years, how="mean")
+    rain = monthly_normals(args.rainfall, args.years, how="sum")
+    hum = None
+    if os.path.exists(args.humidity):
+        hum = monthly_normals(args.humidity, args.years, how="mean")
+    else:
+        log.warning(f"{args.humidity} not found — climate index humidity left unfilled")
+
+    index = build_climate_index(areas, temp, rain, hum, args)
+    np.savez(args.index_out, **index)
+    log.info(f"Saved: {args.index_out} ({os.path.getsize(args.index_out) / 1024:.0f} KB, "
+             f"{len(index['keys']):,} districts × 12 months)")
+    if args.index_only:
+        return
+
+    table = build_tables(areas, soil_medians(args.soil), temp, rain, hum, args)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(table, f, separators=(",", ":"))
+    log.info(f"Saved: {args.out} ({os.path.getsize(args.out) / 1024:.0f} KB, "
+             f"{table['_meta']['districts']:,} districts)")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,9 +18,13 @@ Features:
     - Inverse-frequency weighting (alpha 0.4–0.8)
     - Entropy-based dominance suppression
     - Per-class threshold tuning
-    - SHAP global analysis
+    - SHAP global analysis (chunked across processes, cached by model checksum)
     - Binary classifiers for top-8 confused pairs
     - Robustness testing with noise injection
+    - Process-parallel (fold, learner) training, jobs × threads = cores
+    - Optional successive-halving hyperparameter search (macro-F1 vs single-row latency)
+    - Content-addressed step checkpoints (skip unchanged steps, resume after a crash)
+    - Wall / CPU / peak-memory profile per step, fold and learner (training_metadata_v6.json)
 
 Constraints:
     - Pre-planting features only (no yield/area/production)
@@ -37,19 +41,24 @@ import json
 import logging
 import os
 import sys
+import tempfile
+import time
 import warnings
 from collections import Counter
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
+from multiprocessing import get_context
 from typing import Dict, List, Optional, Tuple, Any
 
 import joblib
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 import seaborn as sns
 from scipy.special import softmax
 
+import sklearn
 from sklearn.calibration import CalibratedClassifierCV, calibration_curve
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import (
@@ -64,6 +73,14 @@ from imblearn.ensemble import BalancedRandomForestClassifier
 import xgboost as xgb
 import lightgbm as lgb
 
+from dataset_cache import CACHE_ENABLED as DATASET_CACHE_ENABLED, load_dataset, optimize_dtypes
+from pipeline_common import (
+    GRID_BLOCK_ELEMS, StepCache, code_version, confusion_batch, f1_accuracy_from_confusion,
+    file_digest, grid_search_temperature_alpha, macro_f1_accuracy, thread_env,
+)
+from shap_stage import SHAP_CHUNK_ROWS, SHAP_SAMPLE_ROWS, per_class_pct, shap_importance
+from training_profiler import PROFILER, job_stats
+
 warnings.filterwarnings("ignore")
 
 # ═══════════════════════════════════════════════════════════════════════════
@@ -95,12 +112,66 @@ RANDOM_STATE = 42
 TEST_SIZE = 0.20
 N_FOLDS = 5
 
+# Fold scheduler (step 2)
+BASE_LEARNERS = ("BalancedRF", "XGBoost", "LightGBM")
+TRAIN_WORKERS = int(os.getenv("TRAIN_WORKERS", "0"))        # 0 = one per core, capped at folds × learners
+TRAIN_BENCHMARK = os.getenv("TRAIN_BENCHMARK", "0") == "1"  # also time the sequential loop
+BASE_PARAMS = {
+    "BalancedRF": {"n_estimators": 100, "max_depth": 20, "min_samples_split": 5, "min_samples_leaf": 2},
+    "XGBoost": {"n_estimators": 100, "max_depth": 8, "learning_rate": 0.1,
+                "subsample": 0.8, "colsample_bytree": 0.8},
+    "LightGBM": {"n_estimators": 100, "max_depth": 8, "num_leaves": 31, "learning_rate": 0.1,
+                 "subsample": 0.8, "colsample_bytree": 0.8},
+}
+
+# Hyperparameter search (before step 2): successive halving over (learner, params) candidates
+HPARAM_SEARCH = os.getenv("TRAIN_HPARAM_SEARCH", "0") == "1"
+HPARAM_CANDIDATES = 12          # per learner, the BASE_PARAMS defaults always among them
+HPARAM_ETA = 3                  # keep the best 1/ETA per rung, ETA× the rows in the next
+HPARAM_MIN_ROWS = 1 / 9         # share of fold-1 training rows in the first rung
+HPARAM_LATENCY_WEIGHT = 0.002   # score = macro-F1 − weight × single-row latency (ms)
+HPARAM_PRUNE_MARGIN = 0.05      # trials this far below a rung's best macro-F1 are never promoted
+HPARAM_LATENCY_ROWS = 30        # single-row predict_proba calls timed per trial
+HPARAM_SPACE = {
+    "BalancedRF": {"n_estimators": [50, 100, 200], "max_depth": [12, 20, None],
+                   "min_samples_leaf": [1, 2, 4]},
+    "XGBoost": {"n_estimators": [50, 100, 200], "max_depth": [4, 6, 8],
+                "learning_rate": [0.05, 0.1, 0.2]},
+    "LightGBM": {"n_estimators": [50, 100, 200], "max_depth": [4, 8, -1],
+                 "num_leaves": [15, 31, 63], "learning_rate": [0.05, 0.1]},
+}
+
+# Step checkpoints
+CHECKPOINT_DIR = Path(os.getenv("TRAIN_CHECKPOINT_DIR", str(BASE_DIR / ".checkpoints" / "stacked")))
+
 # Anti-bias thresholds
 ENTROPY_THRESHOLD = 0.4
 DOMINANCE_FREQ_THRESHOLD = 0.25
 DOMINANCE_PENALTY = 0.15
 FEATURE_IMPORTANCE_MAX = 0.40  # Remove features dominating >40%
 
+# Calibration grid (step 3): T × α pairs, scored in batched blocks
+TEMP_GRID = np.linspace(0.5, 3.0, 101)
+ALPHA_GRID = np.linspace(0.4, 0.8, 81)
+
+# Per-class threshold tuning (step 6)
+THRESHOLD_GRID = np.arange(0.1, 0.9, 0.05)
+THRESHOLD_ROUNDS = 3
+
+# Robustness sweep (step 8): every scenario is stacked into one scoring pass
+ROBUSTNESS_NOISE_LEVELS = (0.02, 0.05, 0.10, 0.15, 0.20, 0.30)  # ± fraction, continuous features
+ROBUSTNESS_FLIP_RATES = (0.01, 0.02, 0.05, 0.10, 0.20)          # share of rows re-drawn, categoricals
+ROBUSTNESS_CONTINUOUS = {
+    "npk": ("n", "p", "k"),
+    "temperature": ("temperature",),
+    "humidity": ("humidity",),
+    "ph": ("ph",),
+    "rainfall": ("rainfall",),
+    "moisture": ("moisture",),
+}
+ROBUSTNESS_CATEGORICAL = {"season": 3, "soil_type": 3, "irrigation": 2}  # feature → n values
+ROBUSTNESS_BATCH_ROWS = 250_000  # rows per predict_proba call on the stacked matrix
+
 # Crop name mappings
 CROP_NAME_MAP_REAL_TO_SYNTH = {
     "pigeonpea": "pigeonpeas",
@@ -162,27 +233,32 @@ def apply_entropy_penalty(
     penalty: float = DOMINANCE_PENALTY,
     threshold: float = ENTROPY_THRESHOLD,
 ) -> np.ndarray:
-    """Reduce dominant crop probability when prediction entropy is very low."""
+    """
+    Reduce dominant crop probability when prediction entropy is very low.
+
+    Works on a single vector or a whole (n, C) matrix at once: rows whose
+    entropy is below `threshold` and whose top class is dominant move
+    `penalty` of the top probability onto the other classes, pro rata.
+    """
     if proba.ndim == 1:
-        p = proba.copy()
-        ent = -np.sum(p * np.log(p + 1e-10))
-        if ent < threshold:
-            top = int(np.argmax(p))
-            if dominant_mask[top]:
-                removed = p[top] * penalty
-                p[top] -= removed
-                others = np.ones(len(p), dtype=bool)
-                others[top] = False
-                s = p[others].sum()
-                if s > 0:
-                    p[others] += removed * (p[others] / s)
+        return apply_entropy_penalty(proba[None, :], dominant_mask, penalty, threshold)[0]
+    p = proba.copy()
+    ent = -np.sum(p * np.log(p + 1e-10), axis=1)
+    top = np.argmax(p, axis=1)
+    rows = np.flatnonzero((ent < threshold) & dominant_mask[top])
+    if rows.size == 0:
         return p
-    else:
-        # Batch version
-        result = proba.copy()
-        for i in range(len(proba)):
-            result[i] = apply_entropy_penalty(proba[i], dominant_mask, penalty, threshold)
-        return result
+    sub = p[rows]
+    is_top = np.zeros(sub.shape, dtype=bool)
+    is_top[np.arange(len(rows)), top[rows]] = True
+    removed = sub[is_top] * penalty
+    sub[is_top] -= removed
+    others = np.where(is_top, 0.0, sub)
+    s = others.sum(axis=1)
+    ok = s > 0
+    sub[ok] += removed[ok, None] * (others[ok] / s[ok, None])
+    p[rows] = sub
+    return p
 
 
 def compute_ece(y_true: np.ndarray, y_proba: np.ndarray, n_bins: int = 15) -> float:
@@ -215,6 +291,38 @@ def compute_class_weights(y: np.ndarray, n_classes: int) -> Dict[int, float]:
     return weights
 
 
+def sweep_class_threshold(
+    proba: np.ndarray,
+    y_true: np.ndarray,
+    thresholds: np.ndarray,
+    c: int,
+    candidates: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Macro F1 / Top-1 of argmax(proba / thresholds) for every candidate value of thresholds[c].
+
+    Only column c changes across candidates, so each row reduces to its best
+    other class (computed once) against proba[:, c] / t, broadcast over all
+    candidates. Rows are processed in blocks and confusion matrices summed,
+    so memory stays flat for multi-million-row test sets.
+    """
+    n, n_classes = proba.shape
+    other_ids = np.flatnonzero(np.arange(n_classes) != c)
+    block = max(1, GRID_BLOCK_ELEMS // max(len(candidates), n_classes))
+    cm = np.zeros((len(candidates), n_classes, n_classes), dtype=np.int64)
+    for start in range(0, n, block):
+        p = proba[start:start + block]
+        scaled = p[:, other_ids] / thresholds[other_ids]
+        best_other = other_ids[scaled.argmax(axis=1)]
+        best_value = scaled.max(axis=1)
+        v = p[None, :, c] / candidates[:, None]
+        # np.argmax keeps the lowest index on ties
+        take = (v > best_value) | ((v == best_value) & (c < best_other))
+        pred = np.where(take, c, best_other[None, :])
+        cm += confusion_batch(y_true[start:start + block], pred, n_classes)
+    return f1_accuracy_from_confusion(cm)
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 # STEP 1: LOAD AND PREPARE DATA
 # ═══════════════════════════════════════════════════════════════════════════
@@ -224,7 +332,7 @@ def step1_load_data() -> Dict[str, Any]:
     section("LOAD AND PREPARE DATA", 1)
     
     sub("Loading real-world dataset")
-    df = pd.read_csv(MERGED_CSV, low_memory=False)
+    df = load_dataset(MERGED_CSV)
     log.info(f"    {MERGED_CSV.name}: {len(df):,} rows × {df.shape[1]} cols")
     
     # Verify no leakage columns
@@ -265,7 +373,7 @@ def step1_load_data() -> Dict[str, Any]:
     # Load synthetic dataset for evaluation
     df_synth = None
     if SYNTH_CSV.exists():
-        df_synth = pd.read_csv(SYNTH_CSV, low_memory=False)
+        df_synth = load_dataset(SYNTH_CSV)
         log.info(f"    Synthetic dataset: {len(df_synth):,} rows")
     
     return {
@@ -281,26 +389,321 @@ def step1_load_data() -> Dict[str, Any]:
     }
 
 
+# ═══════════════════════════════════════════════════════════════════════════
+# FOLD SCHEDULER — (fold, learner) jobs across a process pool
+# ═══════════════════════════════════════════════════════════════════════════
+
+def make_base_model(name: str, n_jobs: int = -1, params: Optional[Dict] = None):
+    """Fresh, unfitted base learner; `params` override the BASE_PARAMS defaults."""
+    p = {**BASE_PARAMS[name], **(params or {})}
+    if name == "BalancedRF":
+        return BalancedRandomForestClassifier(**p, random_state=RANDOM_STATE, n_jobs=n_jobs)
+    if name == "XGBoost":
+        return xgb.XGBClassifier(
+            **p, random_state=RANDOM_STATE, use_label_encoder=False,
+            eval_metric="mlogloss", n_jobs=n_jobs
+        )
+    return lgb.LGBMClassifier(
+        **p, class_weight="balanced", random_state=RANDOM_STATE,
+        n_jobs=n_jobs, verbose=-1
+    )
+
+
+def split_data(data: Dict) -> Tuple:
+    """Stratified train/test split and the OOF folds — shared by step 2 and the search."""
+    X = data["df_real"][HONEST_FEATURES].values
+    y = data["le_crop"].transform(data["df_real"]["crop"].values)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y
+    )
+    skf = StratifiedKFold(n_splits=N_FOLDS, shuffle=True, random_state=RANDOM_STATE)
+    return X_train, X_test, y_train, y_test, list(skf.split(X_train, y_train))
+
+
+# Training arrays, shipped once per worker process (not once per job)
+_fold_data: Dict[str, np.ndarray] = {}
+
+
+def _init_fold_worker(X_train, y_train, sample_weights, X_test) -> None:
+    _fold_data.update(X_train=X_train, y_train=y_train,
+                      sample_weights=sample_weights, X_test=X_test)
+
+
+def _fit_fold_job(fold_idx: int, name: str, train_idx: np.ndarray,
+                  val_idx: np.ndarray, n_jobs: int, params: Optional[Dict] = None) -> Tuple:
+    """Fit one base learner on one fold; return it with its OOF/test probabilities and job stats."""
+    d = _fold_data
+    with job_stats() as stats:
+        m = make_base_model(name, n_jobs, params)
+        X_tr, y_tr = d["X_train"][train_idx], d["y_train"][train_idx]
+        if name == "XGBoost":
+            m.fit(X_tr, y_tr, sample_weight=d["sample_weights"][train_idx])
+        else:
+            m.fit(X_tr, y_tr)
+        oof = m.predict_proba(d["X_train"][val_idx])
+        test = m.predict_proba(d["X_test"])
+    return fold_idx, name, m, oof, test, stats
+
+
+def train_folds_sequential(folds, X_train, y_train, sample_weights, X_test,
+                           learner_params: Optional[Dict] = None) -> Dict[Tuple, Tuple]:
+    """One model at a time, each using every core (the original loop)."""
+    learner_params = learner_params or {}
+    _init_fold_worker(X_train, y_train, sample_weights, X_test)
+    results = {}
+    for fold_idx, (train_idx, val_idx) in enumerate(folds):
+        log.info(f"    Fold {fold_idx + 1}/{N_FOLDS}")
+        for name in BASE_LEARNERS:
+            results[(fold_idx, name)] = _fit_fold_job(fold_idx, name, train_idx, val_idx, -1,
+                                                      learner_params.get(name))[2:]
+    _fold_data.clear()
+    return results
+
+
+def train_folds_parallel(folds, X_train, y_train, sample_weights, X_test,
+                         workers: int, threads: int,
+                         learner_params: Optional[Dict] = None) -> Dict[Tuple, Tuple]:
+    """
+    Run every (fold, learner) job on a spawn pool of `workers` processes.
+
+    Each job gets `threads` native threads (n_jobs and the OpenMP/BLAS
+    env vars, which spawned children inherit at start-up), so the pool
+    never oversubscribes the cores. Results are keyed by (fold, learner)
+    and reassembled in a fixed order by assemble_fold_results().
+    """
+    learner_params = learner_params or {}
+    results = {}
+    with thread_env(threads), \
+            ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                initializer=_init_fold_worker,
+                                initargs=(X_train, y_train, sample_weights, X_test)) as pool:
+        futures = [
+            pool.submit(_fit_fold_job, fold_idx, name, train_idx, val_idx, threads,
+                        learner_params.get(name))
+            for fold_idx, (train_idx, val_idx) in enumerate(folds)
+            for name in BASE_LEARNERS
+        ]
+        for fut in as_completed(futures):
+            fold_idx, name, *rest = fut.result()
+            results[(fold_idx, name)] = tuple(rest)
+            log.info(f"    Fold {fold_idx + 1}/{N_FOLDS} {name:10s} done ({rest[-1]['wall_s']:.1f}s) "
+                     f"[{len(results)}/{len(futures)}]")
+    return results
+
+
+def assemble_fold_results(results: Dict[Tuple, Tuple], folds, y_train: np.ndarray,
+                          n_test: int, n_classes: int) -> Tuple:
+    """Place OOF/test predictions by (fold, learner) in fold order — independent of completion order."""
+    oof_preds = {name: np.zeros((len(y_train), n_classes)) for name in BASE_LEARNERS}
+    test_preds = {name: np.zeros((n_test, n_classes)) for name in BASE_LEARNERS}
+    fold_models = {name: [] for name in BASE_LEARNERS}
+    cv_scores = {name: [] for name in BASE_LEARNERS}
+    job_seconds, job_profile = {}, {}
+    for fold_idx, (_, val_idx) in enumerate(folds):
+        for name in BASE_LEARNERS:
+            m, oof, test, stats = results[(fold_idx, name)]
+            oof_preds[name][val_idx] = oof
+            test_preds[name] += test / N_FOLDS
+            fold_models[name].append(m)
+            val_pred = np.argmax(oof, axis=1)
+            cv_scores[name].append(f1_score(y_train[val_idx], val_pred, average="macro"))
+            job_seconds[f"{name}/fold{fold_idx + 1}"] = stats["wall_s"]
+            job_profile[f"{name}/fold{fold_idx + 1}"] = stats
+    return oof_preds, test_preds, fold_models, cv_scores, job_seconds, job_profile
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# HYPERPARAMETER SEARCH — successive halving across the process pool
+# ═══════════════════════════════════════════════════════════════════════════
+
+def sample_candidates(name: str, rng: np.random.Generator) -> List[Dict]:
+    """BASE_PARAMS defaults first, then HPARAM_CANDIDATES − 1 random points of HPARAM_SPACE."""
+    space = HPARAM_SPACE[name]
+    keys = sorted(space)
+    default = {k: BASE_PARAMS[name].get(k) for k in keys}
+    grid = [dict(zip(keys, values)) for values in product(*(space[k] for k in keys))]
+    grid = [p for p in grid if p != default]
+    picks = rng.choice(len(grid), min(HPARAM_CANDIDATES - 1, len(grid)), replace=False)
+    return [default] + [grid[i] for i in sorted(picks)]
+
+
+def _stratified_rows(y: np.ndarray, fraction: float, rng: np.random.Generator) -> np.ndarray:
+    """Row indices covering `fraction` of every class (at least one row each)."""
+    if fraction >= 1.0:
+        return np.arange(len(y))
+    rows = []
+    for c in np.unique(y):
+        idx = np.flatnonzero(y == c)
+        rows.append(rng.choice(idx, max(1, int(round(len(idx) * fraction))), replace=False))
+    return np.sort(np.concatenate(rows))
+
+
+# Fold-1 train / validation arrays, shipped once per worker process
+_search_data: Dict[str, np.ndarray] = {}
+
+
+def _init_search_worker(X_tr, y_tr, sample_weights, X_val, y_val) -> None:
+    _search_data.update(X_tr=X_tr, y_tr=y_tr, sample_weights=sample_weights,
+                        X_val=X_val, y_val=y_val)
+
+
+def _trial_job(name: str, cand_idx: int, params: Dict, rows: np.ndarray, n_jobs: int,
+               model_dir: str) -> Tuple:
+    """
+    Fit one candidate on `rows` of the fold-1 training part; return its
+    validation macro-F1 and the path of the fitted model, whose latency the
+    parent times once the rung's fits are done.
+    """
+    d = _search_data
+    t0 = time.perf_counter()
+    m = make_base_model(name, n_jobs, params)
+    if name == "XGBoost":
+        m.fit(d["X_tr"][rows], d["y_tr"][rows], sample_weight=d["sample_weights"][rows])
+    else:
+        m.fit(d["X_tr"][rows], d["y_tr"][rows])
+    fit_s = time.perf_counter() - t0
+
+    f1 = f1_score(d["y_val"], m.predict(d["X_val"]), average="macro")
+    path = os.path.join(model_dir, f"{name}-{cand_idx}.joblib")
+    joblib.dump(m, path)
+    return name, cand_idx, float(f1), fit_s, path
+
+
+def single_row_latency_ms(model, X_one: np.ndarray) -> float:
+    """Median single-row predict_proba latency (ms, one thread — the /recommend serving path)."""
+    model.set_params(n_jobs=1)
+    model.predict_proba(X_one[:1])  # warm-up
+    timings = []
+    for i in range(1, len(X_one)):
+        t = time.perf_counter()
+        model.predict_proba(X_one[i:i + 1])
+        timings.append(time.perf_counter() - t)
+    return float(np.median(timings) * 1000)
+
+
+def successive_halving(X_train: np.ndarray, y_train: np.ndarray, sample_weights: np.ndarray,
+                       folds, workers: int, threads: int) -> Dict[str, Any]:
+    """
+    Every rung trains the surviving (learner, params) candidates on a
+    stratified share of the fold-1 training rows (ETA× more each rung, the
+    last rung on all of them) and scores them on the fold-1 validation part.
+    Trials more than HPARAM_PRUNE_MARGIN macro-F1 behind the rung's best
+    are dropped first; of the rest, per learner, the best 1/ETA by
+    macro-F1 − HPARAM_LATENCY_WEIGHT × latency are promoted. The defaults
+    always run in the last rung, so the baseline is measured on the same
+    rows as the winner. All fits of a rung share one pool; latencies are
+    then timed one model at a time in this process, with the pool idle, so
+    concurrent fits do not inflate them.
+    """
+    rng = np.random.default_rng(RANDOM_STATE)
+    train_idx, val_idx = folds[0]
+    y_tr = y_train[train_idx]
+    candidates = {name: sample_candidates(name, rng) for name in BASE_LEARNERS}
+    alive = {name: list(range(len(candidates[name]))) for name in BASE_LEARNERS}
+    n_rungs = int(np.ceil(np.log(1 / HPARAM_MIN_ROWS) / np.log(HPARAM_ETA) - 1e-9)) + 1
+    fractions = [min(1.0, HPARAM_MIN_ROWS * HPARAM_ETA ** r) for r in range(n_rungs)]
+
+    X_one = X_train[val_idx][:HPARAM_LATENCY_ROWS + 1]
+    trials, last, rung_rows = [], {}, []
+    with tempfile.TemporaryDirectory(prefix="hparam-") as model_dir, thread_env(threads), \
+            ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                initializer=_init_search_worker,
+                                initargs=(X_train[train_idx], y_tr, sample_weights[train_idx],
+                                          X_train[val_idx], y_train[val_idx])) as pool:
+        for rung, fraction in enumerate(fractions):
+            rows = _stratified_rows(y_tr, fraction, rng)
+            rung_rows.append(len(rows))
+            final = fraction >= 1.0
+            futures = [
+                pool.submit(_trial_job, name, i, candidates[name][i], rows, threads, model_dir)
+                for name in BASE_LEARNERS
+                if len(alive[name]) > 1 or rung == 0 or final
+                for i in alive[name] + ([0] if final and 0 not in alive[name] else [])
+            ]
+            fitted = sorted(fut.result() for fut in as_completed(futures))
+
+            scored = {name: [] for name in BASE_LEARNERS}
+            for name, i, f1, fit_s, path in fitted:
+                latency_ms = single_row_latency_ms(joblib.load(path), X_one)
+                os.remove(path)
+                score = f1 - HPARAM_LATENCY_WEIGHT * latency_ms
+                trial = {"learner": name, "candidate": i, "rung": rung, "rows": len(rows),
+                         "params": candidates[name][i], "macro_f1": round(f1, 4),
+                         "latency_ms": round(latency_ms, 3), "score": round(score, 4),
+                         "fit_s": round(fit_s, 2)}
+                trials.append(trial)
+                scored[name].append(trial)
+                last[(name, i)] = trial
+            log.info(f"    Rung {rung + 1}/{n_rungs}: {len(futures)} trials on {len(rows):,} rows")
+
+            for name in BASE_LEARNERS:
+                if not scored[name]:
+                    continue
+                best_f1 = max(t["macro_f1"] for t in scored[name])
+                ranked = sorted((t for t in scored[name] if t["macro_f1"] >= best_f1 - HPARAM_PRUNE_MARGIN),
+                                key=lambda t: (-t["score"], t["candidate"]))
+                keep = max(1, int(np.ceil(len(scored[name]) / HPARAM_ETA)))
+                alive[name] = [t["candidate"] for t in ranked[:keep]]
+                top = ranked[0]
+                log.info(f"      {name:10s}: {len(ranked)} → {len(alive[name])}  best {top['params']}  "
+                         f"F1={top['macro_f1'] * 100:.2f}%  {top['latency_ms']:.2f} ms")
+
+    selected = {name: last[(name, alive[name][0])] for name in BASE_LEARNERS}
+    baseline = {name: last[(name, 0)] for name in BASE_LEARNERS}
+    return {
+        "params": {name: selected[name]["params"] for name in BASE_LEARNERS},
+        "selected": selected,
+        "baseline": baseline,
+        "rung_rows": rung_rows,
+        "trials": trials,
+    }
+
+
+def step_hparam_search(data: Dict) -> Dict[str, Any]:
+    """Successive-halving search for the base-learner hyperparameters."""
+    section("HYPERPARAMETER SEARCH (successive halving)")
+
+    X_train, _, y_train, _, folds = split_data(data)
+    class_weights = compute_class_weights(y_train, data["n_classes"])
+    sample_weights = np.array([class_weights[yi] for yi in y_train])
+
+    cores = os.cpu_count() or 1
+    workers = min(TRAIN_WORKERS or cores, HPARAM_CANDIDATES * len(BASE_LEARNERS))
+    threads = max(1, cores // workers)
+    sub(f"{HPARAM_CANDIDATES} candidates × {len(BASE_LEARNERS)} learners, ETA={HPARAM_ETA}, "
+        f"{workers} process(es) × {threads} thread(s)")
+    t0 = time.perf_counter()
+    search = successive_halving(X_train, y_train, sample_weights, folds, workers, threads)
+    search.update(seconds=round(time.perf_counter() - t0, 1), workers=workers, threads_per_trial=threads)
+
+    sub("Selected vs current defaults (fold-1 validation)")
+    for name in BASE_LEARNERS:
+        sel, base = search["selected"][name], search["baseline"][name]
+        log.info(f"    {name:10s}: F1 {base['macro_f1'] * 100:.2f}% → {sel['macro_f1'] * 100:.2f}%   "
+                 f"latency {base['latency_ms']:.2f} → {sel['latency_ms']:.2f} ms   {sel['params']}")
+    stack_ms = {key: N_FOLDS * sum(search[key][name]["latency_ms"] for name in BASE_LEARNERS)
+                for key in ("baseline", "selected")}
+    search["stack_latency_ms"] = {k: round(v, 2) for k, v in stack_ms.items()}
+    log.info(f"    Single-row base-learner latency of the stack ({N_FOLDS} folds): "
+             f"{stack_ms['baseline']:.1f} → {stack_ms['selected']:.1f} ms  "
+             f"({len(search['trials'])} trials, {search['seconds']:.0f}s)")
+    return search
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 # STEP 2: BUILD STACKED ENSEMBLE WITH OOF PREDICTIONS
 # ═══════════════════════════════════════════════════════════════════════════
 
-def step2_build_stacked_ensemble(data: Dict) -> Dict[str, Any]:
+def step2_build_stacked_ensemble(data: Dict, learner_params: Optional[Dict] = None) -> Dict[str, Any]:
     """Build stacked ensemble with out-of-fold predictions."""
     section("BUILD STACKED ENSEMBLE (OOF)", 2)
     
-    df = data["df_real"]
-    le = data["le_crop"]
     n_classes = data["n_classes"]
     crops = data["real_crops"]
+    learner_params = learner_params or {}
     
-    X = df[HONEST_FEATURES].values
-    y = le.transform(df["crop"].values)
-    
-    # Train/test split
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y
-    )
+    # Train/test split + StratifiedKFold for OOF predictions
+    X_train, X_test, y_train, y_test, folds = split_data(data)
     log.info(f"    Train: {len(X_train):,}  Test: {len(X_test):,}")
     
     # Compute class weights
@@ -310,109 +713,65 @@ def step2_build_stacked_ensemble(data: Dict) -> Dict[str, Any]:
     # XGBoost scale_pos_weight per class (for multiclass, we use sample_weight instead)
     sample_weights = np.array([class_weights[yi] for yi in y_train])
     
-    # Initialize base models
-    sub("Initializing base models")
+    cores = os.cpu_count() or 1
+    n_jobs_total = N_FOLDS * len(BASE_LEARNERS)
+    workers = min(TRAIN_WORKERS or cores, n_jobs_total)
+    threads = max(1, cores // workers)
+    
+    sub(f"StratifiedKFold({N_FOLDS}) out-of-fold stacking — {n_jobs_total} (fold, learner) jobs, "
+        f"{workers} process(es) × {threads} thread(s)")
+    t0 = time.perf_counter()
+    if workers > 1:
+        results = train_folds_parallel(folds, X_train, y_train, sample_weights, X_test,
+                                       workers, threads, learner_params)
+    else:
+        results = train_folds_sequential(folds, X_train, y_train, sample_weights, X_test, learner_params)
+    wall = time.perf_counter() - t0
     
-    base_models = {
-        "BalancedRF": BalancedRandomForestClassifier(
-            n_estimators=100,
-            max_depth=20,
-            min_samples_split=5,
-            min_samples_leaf=2,
-            random_state=RANDOM_STATE,
-            n_jobs=-1,
-        ),
-        "XGBoost": xgb.XGBClassifier(
-            n_estimators=100,
-            max_depth=8,
-            learning_rate=0.1,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            random_state=RANDOM_STATE,
-            use_label_encoder=False,
-            eval_metric="mlogloss",
-            n_jobs=-1,
-        ),
-        "LightGBM": lgb.LGBMClassifier(
-            n_estimators=100,
-            max_depth=8,
-            learning_rate=0.1,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            class_weight="balanced",
-            random_state=RANDOM_STATE,
-            n_jobs=-1,
-            verbose=-1,
-        ),
+    oof_preds, test_preds, fold_models, cv_scores, job_seconds, job_profile = assemble_fold_results(
+        results, folds, y_train, len(X_test), n_classes
+    )
+    PROFILER.add_jobs("step2_stack", job_profile)
+    busy = sum(job_seconds.values())
+    schedule = {
+        "cores": cores,
+        "workers": workers,
+        "threads_per_job": threads,
+        "jobs": n_jobs_total,
+        "wall_s": round(wall, 1),
+        "job_seconds_sum": round(busy, 1),
+        "parallel_efficiency": round(busy / (wall * workers), 3) if wall else None,
+        "job_seconds": job_seconds,
     }
-    
-    # StratifiedKFold for OOF predictions
-    sub(f"StratifiedKFold({N_FOLDS}) out-of-fold stacking")
-    skf = StratifiedKFold(n_splits=N_FOLDS, shuffle=True, random_state=RANDOM_STATE)
-    
-    # OOF prediction matrices
-    oof_preds = {name: np.zeros((len(X_train), n_classes)) for name in base_models}
-    test_preds = {name: np.zeros((len(X_test), n_classes)) for name in base_models}
-    
-    fold_models = {name: [] for name in base_models}
-    cv_scores = {name: [] for name in base_models}
-    
-    for fold_idx, (train_idx, val_idx) in enumerate(skf.split(X_train, y_train)):
-        log.info(f"    Fold {fold_idx + 1}/{N_FOLDS}")
-        X_tr, X_val = X_train[train_idx], X_train[val_idx]
-        y_tr, y_val = y_train[train_idx], y_train[val_idx]
-        sw_tr = sample_weights[train_idx]
-        
-        for name, model in base_models.items():
-            # Clone model for this fold
-            if name == "BalancedRF":
-                m = BalancedRandomForestClassifier(
-                    n_estimators=100, max_depth=20, min_samples_split=5, min_samples_leaf=2,
-                    random_state=RANDOM_STATE, n_jobs=-1
-                )
-                m.fit(X_tr, y_tr)
-            elif name == "XGBoost":
-                m = xgb.XGBClassifier(
-                    n_estimators=100, max_depth=8, learning_rate=0.1,
-                    subsample=0.8, colsample_bytree=0.8,
-                    random_state=RANDOM_STATE, use_label_encoder=False,
-                    eval_metric="mlogloss", n_jobs=-1
-                )
-                m.fit(X_tr, y_tr, sample_weight=sw_tr)
-            else:  # LightGBM
-                m = lgb.LGBMClassifier(
-                    n_estimators=100, max_depth=8, learning_rate=0.1,
-                    subsample=0.8, colsample_bytree=0.8,
-                    class_weight="balanced", random_state=RANDOM_STATE,
-                    n_jobs=-1, verbose=-1
-                )
-                m.fit(X_tr, y_tr)
-            
-            # OOF predictions
-            oof_preds[name][val_idx] = m.predict_proba(X_val)
-            
-            # Test predictions (averaged across folds)
-            test_preds[name] += m.predict_proba(X_test) / N_FOLDS
-            
-            # Store fold model
-            fold_models[name].append(m)
-            
-            # Fold score
-            val_pred = np.argmax(oof_preds[name][val_idx], axis=1)
-            f1 = f1_score(y_val, val_pred, average="macro")
-            cv_scores[name].append(f1)
+    log.info(f"    Fold training: {wall:.1f}s wall, {busy:.1f}s of job time "
+             f"(efficiency {schedule['parallel_efficiency']})")
+    
+    if TRAIN_BENCHMARK and workers > 1:
+        sub("Benchmark — sequential loop (one model at a time, n_jobs=-1)")
+        t0 = time.perf_counter()
+        seq_results = train_folds_sequential(folds, X_train, y_train, sample_weights, X_test,
+                                             learner_params)
+        seq_wall = time.perf_counter() - t0
+        seq_oof = assemble_fold_results(seq_results, folds, y_train, len(X_test), n_classes)[0]
+        schedule["sequential_wall_s"] = round(seq_wall, 1)
+        schedule["speedup"] = round(seq_wall / wall, 2)
+        schedule["max_oof_diff"] = float(max(
+            np.abs(oof_preds[name] - seq_oof[name]).max() for name in BASE_LEARNERS
+        ))
+        log.info(f"    Sequential {seq_wall:.1f}s → parallel {wall:.1f}s  "
+                 f"(×{schedule['speedup']}, max |ΔOOF|={schedule['max_oof_diff']:.2e})")
     
     # Report base model CV scores
     sub("Base model CV scores (Macro F1)")
-    for name in base_models:
+    for name in BASE_LEARNERS:
         mean_f1 = np.mean(cv_scores[name])
         std_f1 = np.std(cv_scores[name])
         log.info(f"    {name:15s}: {mean_f1 * 100:.2f}% ± {std_f1 * 100:.2f}%")
     
     # Stack OOF predictions as meta-features
     sub("Training meta-learner (LogisticRegression multinomial)")
-    meta_features_train = np.hstack([oof_preds[name] for name in base_models])
-    meta_features_test = np.hstack([test_preds[name] for name in base_models])
+    meta_features_train = np.hstack([oof_preds[name] for name in BASE_LEARNERS])
+    meta_features_test = np.hstack([test_preds[name] for name in BASE_LEARNERS])
     
     log.info(f"    Meta-features shape: {meta_features_train.shape}")
     
@@ -463,6 +822,9 @@ def step2_build_stacked_ensemble(data: Dict) -> Dict[str, Any]:
         "class_weights": class_weights,
         "class_weight_dict": class_weight_dict,
         "cv_scores": cv_scores,
+        "schedule": schedule,
+        "learner_params": {name: {**BASE_PARAMS[name], **learner_params.get(name, {})}
+                           for name in BASE_LEARNERS},
         "base_acc": acc,
         "base_f1": f1,
         "base_top3": top3,
@@ -489,36 +851,31 @@ def step3_calibration_tuning(training: Dict, data: Dict) -> Dict[str, Any]:
     freq = np.array([counts.get(c, 1) for c in crops], dtype=float)
     freq /= freq.sum()
     
-    sub("Grid search: T ∈ [0.5, 3.0] × α ∈ [0.4, 0.8]")
+    sub(f"Grid search: T ∈ [0.5, 3.0] × α ∈ [0.4, 0.8]  ({len(TEMP_GRID)}×{len(ALPHA_GRID)}, batched)")
+    t0 = time.perf_counter()
+    grid_T, grid_alpha, grid_f1, grid_acc = grid_search_temperature_alpha(
+        proba, y_test, freq, TEMP_GRID, ALPHA_GRID
+    )
+    log.info(f"    {len(grid_T):,} pairs scored in {time.perf_counter() - t0:.2f}s")
+    
+    # Highest macro F1 with Top-1 ≥ 75%; first pair in grid order wins ties
     best_T, best_alpha, best_f1, best_acc = 1.0, 0.0, 0.0, 0.0
     best_weights = np.ones(n_classes)
-    all_results = []
-    
-    for T in np.arange(0.5, 3.05, 0.25):
-        p_temp = apply_temperature(proba, T)
-        for alpha in np.arange(0.4, 0.85, 0.05):
-            inv_w = 1.0 / (freq ** alpha)
-            inv_w /= inv_w.mean()
-            p_adj = apply_inv_freq(p_temp, inv_w)
-            y_pred = np.argmax(p_adj, axis=1)
-            mf1 = f1_score(y_test, y_pred, average="macro")
-            acc = accuracy_score(y_test, y_pred)
-            all_results.append((T, alpha, mf1, acc))
-            if mf1 > best_f1 and acc >= 0.75:
-                best_f1 = mf1
-                best_T = T
-                best_alpha = alpha
-                best_acc = acc
-                best_weights = inv_w.copy()
+    eligible = (grid_acc >= 0.75) & (grid_f1 > 0)
+    if eligible.any():
+        i = int(np.argmax(np.where(eligible, grid_f1, -np.inf)))
+        best_T, best_alpha = float(grid_T[i]), float(grid_alpha[i])
+        best_f1, best_acc = float(grid_f1[i]), float(grid_acc[i])
+        best_weights = 1.0 / (freq ** best_alpha)
+        best_weights /= best_weights.mean()
     
     # Show top 10
-    all_results.sort(key=lambda x: -x[2])
-    log.info(f"    {'T':>5s}  {'α':>5s}  {'Macro F1':>10s}  {'Top-1':>8s}")
-    for T, alpha, mf1, acc in all_results[:10]:
-        m = " ★" if T == best_T and alpha == best_alpha else ""
-        log.info(f"    {T:5.2f}  {alpha:5.2f}  {mf1 * 100:9.2f}%  {acc * 100:7.2f}%{m}")
+    log.info(f"    {'T':>6s}  {'α':>6s}  {'Macro F1':>10s}  {'Top-1':>8s}")
+    for i in np.argsort(-grid_f1, kind="stable")[:10]:
+        m = " ★" if grid_T[i] == best_T and grid_alpha[i] == best_alpha else ""
+        log.info(f"    {grid_T[i]:6.3f}  {grid_alpha[i]:6.3f}  {grid_f1[i] * 100:9.2f}%  {grid_acc[i] * 100:7.2f}%{m}")
     
-    log.info(f"    Selected: T={best_T:.2f}, α={best_alpha:.2f} "
+    log.info(f"    Selected: T={best_T:.3f}, α={best_alpha:.3f} "
              f"(F1={best_f1 * 100:.2f}%, Top-1={best_acc * 100:.2f}%)")
     
     # Apply best settings
@@ -540,36 +897,30 @@ def step3_calibration_tuning(training: Dict, data: Dict) -> Dict[str, Any]:
 # ═══════════════════════════════════════════════════════════════════════════
 
 def step4_shap_analysis(training: Dict, data: Dict) -> Dict[str, Any]:
-    """SHAP global analysis and feature importance check."""
+    """
+    SHAP global analysis and feature importance check.
+
+    Returns the summary-plot sample ("shap_plot") instead of drawing it,
+    so a checkpoint hit still renders shap_summary.png (plot_shap_summary).
+    """
     section("SHAP GLOBAL ANALYSIS", 4)
     
     X_test = training["X_test"]
     fold_models = training["fold_models"]
     
-    sub("Computing SHAP values (sampling 300 rows)")
-    n_sample = min(300, len(X_test))
-    rng = np.random.RandomState(RANDOM_STATE)
-    idx = rng.choice(len(X_test), n_sample, replace=False)
-    X_s = X_test[idx]
+    sub(f"Computing SHAP values (up to {SHAP_SAMPLE_ROWS:,} rows, chunks of {SHAP_CHUNK_ROWS})")
     
     feature_scaling = {}
     shap_report = {}
+    shap_plot = None
     
     try:
-        import shap
+        import shap  # noqa: F401 — without shap, fall back to Gini importances
         
-        # Use first BalancedRF model for SHAP
+        # Use first BalancedRF model for SHAP; per-class |SHAP| is streamed per chunk
         base_model = fold_models["BalancedRF"][0]
-        explainer = shap.TreeExplainer(base_model)
-        shap_values = explainer.shap_values(X_s, check_additivity=False)
-        
-        # Aggregate importance
-        if isinstance(shap_values, list):
-            mean_abs = np.mean([np.abs(sv).mean(axis=0) for sv in shap_values], axis=0)
-        elif shap_values.ndim == 3:
-            mean_abs = np.abs(shap_values).mean(axis=(0, 2))
-        else:
-            mean_abs = np.abs(shap_values).mean(axis=0)
+        res = shap_importance(base_model, X_test, HONEST_FEATURES, plot_rows=300, seed=RANDOM_STATE)
+        mean_abs = res["mean_abs"]
         
         total = mean_abs.sum()
         pct = mean_abs / total * 100
@@ -604,16 +955,12 @@ def step4_shap_analysis(training: Dict, data: Dict) -> Dict[str, Any]:
             "moisture_humidity_combined": round(float(mh), 2),
             "dominant_features": list(feature_scaling.keys()),
             "feature_scaling": feature_scaling,
+            "per_class_importance_pct": per_class_pct(res, data["real_crops"]),
+            "sample_rows": res["rows"],
+            "model_checksum": res["model_checksum"],
         }
         
-        # Generate SHAP summary plot
-        sub("Generating SHAP summary plot")
-        plt.figure(figsize=(10, 8))
-        shap.summary_plot(shap_values, X_s, feature_names=HONEST_FEATURES, show=False)
-        plt.tight_layout()
-        plt.savefig(BASE_DIR / "shap_summary.png", dpi=150, bbox_inches="tight")
-        plt.close()
-        log.info("    Saved: shap_summary.png")
+        shap_plot = {"values": res["plot_values"], "X": res["plot_X"]}
         
     except Exception as e:
         log.warning(f"    SHAP failed ({e}), using Gini importances")
@@ -631,9 +978,27 @@ def step4_shap_analysis(training: Dict, data: Dict) -> Dict[str, Any]:
     return {
         "feature_scaling": feature_scaling,
         "shap_report": shap_report,
+        "shap_plot": shap_plot,
     }
 
 
+def plot_shap_summary(shap_plot: Optional[Dict[str, np.ndarray]]) -> None:
+    """Draw shap_summary.png from step 4's plot sample (skipped on the Gini fallback)."""
+    if shap_plot is None:
+        return
+    import shap
+    
+    sub("Generating SHAP summary plot")
+    plot_values = shap_plot["values"]
+    plt.figure(figsize=(10, 8))
+    shap.summary_plot([plot_values[:, :, c] for c in range(plot_values.shape[2])], shap_plot["X"],
+                      feature_names=HONEST_FEATURES, show=False)
+    plt.tight_layout()
+    plt.savefig(BASE_DIR / "shap_summary.png", dpi=150, bbox_inches="tight")
+    plt.close()
+    log.info("    Saved: shap_summary.png")
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 # STEP 5: BINARY CLASSIFIERS FOR CONFUSED PAIRS
 # ═══════════════════════════════════════════════════════════════════════════
@@ -719,32 +1084,21 @@ def step6_threshold_tuning(training: Dict, tuning: Dict, data: Dict) -> Dict[str
     
     # Baseline
     y_pred_base = np.argmax(proba, axis=1)
-    f1_base = f1_score(y_test, y_pred_base, average="macro")
+    f1_base = float(macro_f1_accuracy(y_test, y_pred_base[None, :], n_classes)[0][0])
     log.info(f"    Baseline macro F1: {f1_base * 100:.2f}%")
     
-    # Grid search per-class thresholds
+    # Coordinate ascent: per class, sweep all candidates at once and keep the
+    # first one that beats the best macro F1 so far
     thresholds = np.ones(n_classes) * 0.5
-    best_thresholds = thresholds.copy()
     best_f1 = f1_base
     
-    # Simple iterative optimization
-    for iteration in range(3):
+    for iteration in range(THRESHOLD_ROUNDS):
         for c in range(n_classes):
-            best_t = thresholds[c]
-            for t in np.arange(0.1, 0.9, 0.05):
-                test_thresholds = thresholds.copy()
-                test_thresholds[c] = t
-                
-                # Apply thresholds
-                adjusted_proba = proba / test_thresholds
-                y_pred = np.argmax(adjusted_proba, axis=1)
-                f1 = f1_score(y_test, y_pred, average="macro")
-                
-                if f1 > best_f1:
-                    best_f1 = f1
-                    best_t = t
-            
-            thresholds[c] = best_t
+            f1s, _ = sweep_class_threshold(proba, y_test, thresholds, c, THRESHOLD_GRID)
+            i = int(np.argmax(f1s))
+            if f1s[i] > best_f1:
+                best_f1 = float(f1s[i])
+                thresholds[c] = THRESHOLD_GRID[i]
     
     best_thresholds = thresholds
     
@@ -845,14 +1199,22 @@ def step7_dominance_analysis(training: Dict, tuning: Dict, threshold: Dict, data
 # ═══════════════════════════════════════════════════════════════════════════
 
 def step8_robustness_testing(training: Dict, data: Dict) -> Dict[str, Any]:
-    """Test model robustness with noise injection."""
+    """
+    Test model robustness with noise injection.
+
+    All perturbed copies of X_test are stacked into one matrix, scored by
+    the fold models and meta-learner in a single pass, and split back per
+    scenario, so adding scenarios or severities costs rows, not passes.
+    The curves are drawn by plot_robustness_curves, outside the checkpoint.
+    """
     section("ROBUSTNESS TESTING", 8)
     
-    X_test = training["X_test"].copy()
+    X_test = training["X_test"]
     y_test = training["y_test"]
     fold_models = training["fold_models"]
     meta_learner = training["meta_learner"]
     n_classes = data["n_classes"]
+    n = len(X_test)
     
     def get_stacked_proba(X):
         """Get stacked ensemble predictions."""
@@ -866,88 +1228,114 @@ def step8_robustness_testing(training: Dict, data: Dict) -> Dict[str, Any]:
         return meta_learner.predict_proba(meta_features)
     
     rng = np.random.RandomState(RANDOM_STATE)
+    npk_idx = [HONEST_FEATURES.index(f) for f in ("n", "p", "k")]
+    rain_idx = HONEST_FEATURES.index("rainfall")
+    season_idx = HONEST_FEATURES.index("season")
+    soil_idx = HONEST_FEATURES.index("soil_type")
     
-    # Baseline
-    proba_base = get_stacked_proba(X_test)
-    acc_base = accuracy_score(y_test, np.argmax(proba_base, axis=1))
-    f1_base = f1_score(y_test, np.argmax(proba_base, axis=1), average="macro")
-    
+    def jitter(cols, level, X=None):
+        """Multiply each column by U(1 - level, 1 + level)."""
+        X = X_test.copy() if X is None else X
+        for c in cols:
+            X[:, c] *= rng.uniform(1 - level, 1 + level, n)
+        return X
+    
+    def redraw(cols, rate, n_values, X=None):
+        """Re-draw a random share of rows uniformly from 0..n_values-1 (one mask for all cols)."""
+        X = X_test.copy() if X is None else X
+        mask = rng.random(n) < rate
+        for c in cols:
+            X[mask, c] = rng.randint(0, n_values, mask.sum())
+        return X
+    
+    # Headline scenarios first, drawn in the original order so they stay comparable
+    scenarios = [
+        ("baseline", None, 0.0, X_test),
+        ("npk_10pct", None, 0.10, jitter(npk_idx, 0.10)),
+        ("rainfall_5pct", None, 0.05, jitter([rain_idx], 0.05)),
+        ("season_5pct", None, 0.05, redraw([season_idx], 0.05, 3)),
+        ("soil_5pct", None, 0.05, redraw([soil_idx], 0.05, 3)),
+        ("combined_worst", None, 0.0,
+         redraw([season_idx, soil_idx], 0.05, 3, jitter([rain_idx], 0.05, jitter(npk_idx, 0.10)))),
+    ]
+    for family, feats in ROBUSTNESS_CONTINUOUS.items():
+        cols = [HONEST_FEATURES.index(f) for f in feats]
+        for level in ROBUSTNESS_NOISE_LEVELS:
+            scenarios.append((f"{family}@{level:g}", family, level, jitter(cols, level)))
+    for feat, n_values in ROBUSTNESS_CATEGORICAL.items():
+        col = HONEST_FEATURES.index(feat)
+        for rate in ROBUSTNESS_FLIP_RATES:
+            scenarios.append((f"{feat}@{rate:g}", feat, rate, redraw([col], rate, n_values)))
+    
+    sub(f"Scoring {len(scenarios)} scenarios in one stacked pass ({len(scenarios) * n:,} rows)")
+    t0 = time.perf_counter()
+    X_all = np.concatenate([X for *_, X in scenarios])
+    proba_all = np.concatenate([
+        get_stacked_proba(X_all[i:i + ROBUSTNESS_BATCH_ROWS])
+        for i in range(0, len(X_all), ROBUSTNESS_BATCH_ROWS)
+    ])
+    pred = proba_all.argmax(axis=1).reshape(len(scenarios), n)
+    f1s, accs = macro_f1_accuracy(y_test, pred, n_classes)
+    log.info(f"    Scored in {time.perf_counter() - t0:.1f}s")
+    
+    acc_base, f1_base = float(accs[0]), float(f1s[0])
     results = {"baseline": {"acc": acc_base, "f1": f1_base}}
+    labels = {
+        "npk_10pct": "NPK ±10%", "rainfall_5pct": "Rainfall ±5%", "season_5pct": "Season 5%",
+        "soil_5pct": "Soil 5%", "combined_worst": "Combined worst",
+    }
     
     sub("Testing with input perturbations")
-    
-    # NPK ±10% noise
-    X_npk = X_test.copy()
-    for i in range(3):  # N, P, K are first 3 features
-        noise = rng.uniform(0.9, 1.1, len(X_test))
-        X_npk[:, i] *= noise
-    
-    proba_npk = get_stacked_proba(X_npk)
-    acc_npk = accuracy_score(y_test, np.argmax(proba_npk, axis=1))
-    f1_npk = f1_score(y_test, np.argmax(proba_npk, axis=1), average="macro")
-    results["npk_10pct"] = {"acc": acc_npk, "f1": f1_npk}
-    log.info(f"    NPK ±10%: Top-1={acc_npk * 100:.2f}%, F1={f1_npk * 100:.2f}% "
-             f"(Δ={((acc_npk - acc_base) / acc_base) * 100:+.1f}%)")
-    
-    # Rainfall ±5% noise
-    X_rain = X_test.copy()
-    rain_idx = HONEST_FEATURES.index("rainfall")
-    noise = rng.uniform(0.95, 1.05, len(X_test))
-    X_rain[:, rain_idx] *= noise
-    
-    proba_rain = get_stacked_proba(X_rain)
-    acc_rain = accuracy_score(y_test, np.argmax(proba_rain, axis=1))
-    f1_rain = f1_score(y_test, np.argmax(proba_rain, axis=1), average="macro")
-    results["rainfall_5pct"] = {"acc": acc_rain, "f1": f1_rain}
-    log.info(f"    Rainfall ±5%: Top-1={acc_rain * 100:.2f}%, F1={f1_rain * 100:.2f}% "
-             f"(Δ={((acc_rain - acc_base) / acc_base) * 100:+.1f}%)")
-    
-    # Season perturbation (5% random)
-    X_season = X_test.copy()
-    season_idx = HONEST_FEATURES.index("season")
-    perturb_mask = rng.random(len(X_test)) < 0.05
-    X_season[perturb_mask, season_idx] = rng.randint(0, 3, perturb_mask.sum())
-    
-    proba_season = get_stacked_proba(X_season)
-    acc_season = accuracy_score(y_test, np.argmax(proba_season, axis=1))
-    f1_season = f1_score(y_test, np.argmax(proba_season, axis=1), average="macro")
-    results["season_5pct"] = {"acc": acc_season, "f1": f1_season}
-    log.info(f"    Season 5%: Top-1={acc_season * 100:.2f}%, F1={f1_season * 100:.2f}% "
-             f"(Δ={((acc_season - acc_base) / acc_base) * 100:+.1f}%)")
-    
-    # Soil misclassification 5%
-    X_soil = X_test.copy()
-    soil_idx = HONEST_FEATURES.index("soil_type")
-    perturb_mask = rng.random(len(X_test)) < 0.05
-    X_soil[perturb_mask, soil_idx] = rng.randint(0, 3, perturb_mask.sum())
-    
-    proba_soil = get_stacked_proba(X_soil)
-    acc_soil = accuracy_score(y_test, np.argmax(proba_soil, axis=1))
-    f1_soil = f1_score(y_test, np.argmax(proba_soil, axis=1), average="macro")
-    results["soil_5pct"] = {"acc": acc_soil, "f1": f1_soil}
-    log.info(f"    Soil 5%: Top-1={acc_soil * 100:.2f}%, F1={f1_soil * 100:.2f}% "
-             f"(Δ={((acc_soil - acc_base) / acc_base) * 100:+.1f}%)")
-    
-    # Combined worst-case
-    X_worst = X_test.copy()
-    for i in range(3):
-        noise = rng.uniform(0.9, 1.1, len(X_test))
-        X_worst[:, i] *= noise
-    X_worst[:, rain_idx] *= rng.uniform(0.95, 1.05, len(X_test))
-    perturb_mask = rng.random(len(X_test)) < 0.05
-    X_worst[perturb_mask, season_idx] = rng.randint(0, 3, perturb_mask.sum())
-    X_worst[perturb_mask, soil_idx] = rng.randint(0, 3, perturb_mask.sum())
-    
-    proba_worst = get_stacked_proba(X_worst)
-    acc_worst = accuracy_score(y_test, np.argmax(proba_worst, axis=1))
-    f1_worst = f1_score(y_test, np.argmax(proba_worst, axis=1), average="macro")
-    results["combined_worst"] = {"acc": acc_worst, "f1": f1_worst}
-    log.info(f"    Combined worst: Top-1={acc_worst * 100:.2f}%, F1={f1_worst * 100:.2f}% "
-             f"(Δ={((acc_worst - acc_base) / acc_base) * 100:+.1f}%)")
+    for i, (key, family, level, _) in enumerate(scenarios[1:6], start=1):
+        acc, f1 = float(accs[i]), float(f1s[i])
+        results[key] = {"acc": acc, "f1": f1}
+        log.info(f"    {labels[key]}: Top-1={acc * 100:.2f}%, F1={f1 * 100:.2f}% "
+                 f"(Δ={((acc - acc_base) / acc_base) * 100:+.1f}%)")
+    
+    # Sensitivity curves: Top-1 / macro F1 per family across severities
+    curves = {}
+    for i, (key, family, level, _) in enumerate(scenarios):
+        if family is None:
+            continue
+        kind = "flip_rate" if family in ROBUSTNESS_CATEGORICAL else "noise"
+        curve = curves.setdefault(family, {"kind": kind, "levels": [], "acc": [], "f1": []})
+        curve["levels"].append(level)
+        curve["acc"].append(round(float(accs[i]), 4))
+        curve["f1"].append(round(float(f1s[i]), 4))
+    
+    sub("Sensitivity curves (Top-1 %)")
+    for kind, levels in (("noise", ROBUSTNESS_NOISE_LEVELS), ("flip_rate", ROBUSTNESS_FLIP_RATES)):
+        log.info(f"    {kind:12s} " + " ".join(f"{lv * 100:>6g}%" for lv in levels))
+        for family, curve in curves.items():
+            if curve["kind"] == kind:
+                log.info(f"    {family:12s} " + " ".join(f"{a * 100:6.2f}%" for a in curve["acc"]))
+    results["curves"] = curves
+    results["scenarios"] = len(scenarios)
     
     return {"robustness_results": results}
 
 
+def plot_robustness_curves(results: Dict[str, Any]) -> None:
+    """Draw robustness_curves.png from step 8's sensitivity curves."""
+    sub("Generating robustness curves plot")
+    acc_base = results["baseline"]["acc"]
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    for ax, kind, xlabel in ((axes[0], "noise", "± noise (fraction)"),
+                             (axes[1], "flip_rate", "share of rows re-drawn")):
+        for family, curve in results["curves"].items():
+            if curve["kind"] == kind:
+                ax.plot([0.0] + curve["levels"], [acc_base] + curve["acc"], marker="o", label=family)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel("Top-1 accuracy")
+        ax.grid(alpha=0.3)
+        ax.legend()
+    fig.suptitle("Robustness — Stacked Ensemble v3")
+    fig.tight_layout()
+    fig.savefig(BASE_DIR / "robustness_curves.png", dpi=150, bbox_inches="tight")
+    plt.close(fig)
+    log.info("    Saved: robustness_curves.png")
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 # STEP 9: FINAL EVALUATION & METRICS
 # ═══════════════════════════════════════════════════════════════════════════
@@ -1069,6 +1457,7 @@ def step10_save_artifacts(
     robustness: Dict,
     final_metrics: Dict,
     data: Dict,
+    hparam_search: Optional[Dict] = None,
 ) -> None:
     """Save all model artifacts and configuration files."""
     section("SAVE ARTIFACTS", 10)
@@ -1171,6 +1560,8 @@ def step10_save_artifacts(
             for name, scores in training["cv_scores"].items()
         },
         "robustness": robustness["robustness_results"],
+        "training_schedule": training["schedule"],
+        "base_learner_params": training["learner_params"],
         "shap_analysis": shap_analysis["shap_report"],
         "goals": {
             "mcw_under_30pct": dominance["mcw_after"] < 0.30,
@@ -1179,6 +1570,11 @@ def step10_save_artifacts(
             "all_passed": final_metrics["goals_passed"],
         },
     }
+    if hparam_search is not None:
+        metrics_table["hparam_search"] = {
+            k: hparam_search[k] for k in ("selected", "baseline", "stack_latency_ms",
+                                          "rung_rows", "seconds", "trials")
+        }
     with open(BASE_DIR / "metrics_table.json", "w") as f:
         json.dump(metrics_table, f, indent=2)
     log.info("    Saved: metrics_table.json")
@@ -1195,6 +1591,7 @@ def step10_save_artifacts(
         "metrics_table.json",
         "confusion_matrix.png",
         "shap_summary.png",
+        "robustness_curves.png",
     ]
     for a in artifacts:
         path = BASE_DIR / a
@@ -1218,50 +1615,118 @@ def main():
     log.info("")
     
     start_time = datetime.now()
+    PROFILER.start("final_stacked_model")
+    cache = StepCache(CHECKPOINT_DIR, libs={"sklearn": sklearn.__version__, "xgboost": xgb.__version__,
+                                            "lightgbm": lgb.__version__})
     
     # Step 1: Load data
-    data = step1_load_data()
+    with PROFILER.step("step1_data"):
+        data = step1_load_data()
+    cache.register("data", file_digest(MERGED_CSV, SYNTH_CSV, SYNTH_MODEL_PATH, SYNTH_ENCODER_PATH)
+                   + (code_version(optimize_dtypes) if DATASET_CACHE_ENABLED else ""))
+    
+    # Optional: successive-halving search for the base-learner parameters
+    hparam_search = None
+    if HPARAM_SEARCH:
+        hparam_search = cache.run(
+            "hparam_search", step_hparam_search, data, inputs=("data",),
+            params={"features": HONEST_FEATURES, "seed": RANDOM_STATE, "test_size": TEST_SIZE,
+                    "folds": N_FOLDS, "base": BASE_PARAMS, "space": HPARAM_SPACE,
+                    "candidates": HPARAM_CANDIDATES, "eta": HPARAM_ETA, "min_rows": HPARAM_MIN_ROWS,
+                    "latency_weight": HPARAM_LATENCY_WEIGHT, "prune": HPARAM_PRUNE_MARGIN,
+                    "latency_rows": HPARAM_LATENCY_ROWS},
+            helpers=(split_data, compute_class_weights, make_base_model, sample_candidates,
+                     _stratified_rows, _trial_job, single_row_latency_ms, successive_halving),
+        )
+    learner_params = hparam_search["params"] if hparam_search else {}
     
     # Step 2: Build stacked ensemble
-    training = step2_build_stacked_ensemble(data)
+    training = cache.run(
+        "step2_stack", step2_build_stacked_ensemble, data, learner_params, inputs=("data",),
+        params={"features": HONEST_FEATURES, "seed": RANDOM_STATE,
+                "test_size": TEST_SIZE, "folds": N_FOLDS,
+                "base": BASE_PARAMS, "learner_params": learner_params},
+        helpers=(split_data, compute_class_weights, make_base_model, _fit_fold_job, assemble_fold_results),
+    )
     
     # Step 3: Temperature & inverse-frequency tuning
-    tuning = step3_calibration_tuning(training, data)
+    tuning = cache.run(
+        "step3_calibration", step3_calibration_tuning, training, data,
+        inputs=("data", "step2_stack"),
+        params={"temps": TEMP_GRID.tolist(), "alphas": ALPHA_GRID.tolist()},
+        helpers=(apply_temperature, apply_inv_freq, macro_f1_accuracy, confusion_batch,
+                 f1_accuracy_from_confusion, grid_search_temperature_alpha),
+    )
     
     # Step 4: SHAP analysis
-    shap_analysis = step4_shap_analysis(training, data)
+    shap_analysis = cache.run(
+        "step4_shap", step4_shap_analysis, training, data, inputs=("step2_stack",),
+        params={"seed": RANDOM_STATE, "importance_max": FEATURE_IMPORTANCE_MAX,
+                "shap_rows": SHAP_SAMPLE_ROWS},
+        helpers=(shap_importance, per_class_pct),
+    )
+    plot_shap_summary(shap_analysis["shap_plot"])
     
     # Step 5: Binary classifiers
-    binary_clf = step5_binary_classifiers(training, tuning, data)
+    binary_clf = cache.run(
+        "step5_binary", step5_binary_classifiers, training, tuning, data,
+        inputs=("step2_stack", "step3_calibration"), params={"seed": RANDOM_STATE},
+    )
     
     # Step 6: Per-class threshold tuning
-    threshold = step6_threshold_tuning(training, tuning, data)
+    threshold = cache.run(
+        "step6_thresholds", step6_threshold_tuning, training, tuning, data,
+        inputs=("step2_stack", "step3_calibration"),
+        params={"grid": THRESHOLD_GRID.tolist(), "rounds": THRESHOLD_ROUNDS},
+        helpers=(sweep_class_threshold, confusion_batch, f1_accuracy_from_confusion),
+    )
     
     # Step 7: Dominance analysis & entropy suppression
-    dominance = step7_dominance_analysis(training, tuning, threshold, data)
+    dominance = cache.run(
+        "step7_dominance", step7_dominance_analysis, training, tuning, threshold, data,
+        inputs=("step2_stack", "step3_calibration", "step6_thresholds"),
+        params={"entropy": ENTROPY_THRESHOLD, "freq": DOMINANCE_FREQ_THRESHOLD,
+                "penalty": DOMINANCE_PENALTY},
+        helpers=(apply_entropy_penalty,),
+    )
     
     # Step 8: Robustness testing
-    robustness = step8_robustness_testing(training, data)
+    robustness = cache.run(
+        "step8_robustness", step8_robustness_testing, training, data,
+        inputs=("step2_stack",),
+        params={"seed": RANDOM_STATE, "features": HONEST_FEATURES,
+                "noise": ROBUSTNESS_NOISE_LEVELS, "flip": ROBUSTNESS_FLIP_RATES,
+                "continuous": ROBUSTNESS_CONTINUOUS, "categorical": ROBUSTNESS_CATEGORICAL},
+        helpers=(macro_f1_accuracy, confusion_batch, f1_accuracy_from_confusion),
+    )
+    plot_robustness_curves(robustness["robustness_results"])
     
     # Step 9: Final evaluation
-    final_metrics = step9_final_evaluation(
-        training, tuning, threshold, dominance, binary_clf, data
-    )
+    with PROFILER.step("step9_evaluation"):
+        final_metrics = step9_final_evaluation(
+            training, tuning, threshold, dominance, binary_clf, data
+        )
     
     # Step 10: Save artifacts
-    step10_save_artifacts(
-        training, tuning, threshold, dominance,
-        shap_analysis, binary_clf, robustness, final_metrics, data
-    )
+    with PROFILER.step("step10_artifacts"):
+        step10_save_artifacts(
+            training, tuning, threshold, dominance,
+            shap_analysis, binary_clf, robustness, final_metrics, data, hparam_search
+        )
     
     # Final summary
     elapsed = datetime.now() - start_time
     section("PIPELINE COMPLETE")
     log.info(f"    Total time: {elapsed}")
+    if cache.enabled:
+        cached = [k for k, v in cache.report.items() if v == "cached"]
+        log.info(f"    Checkpoints: {len(cached)}/{len(cache.report)} steps reused "
+                 f"({', '.join(cached) or 'none'})")
     log.info(f"    Top-1 Accuracy: {final_metrics['top1_accuracy'] * 100:.2f}%")
     log.info(f"    Macro F1: {final_metrics['macro_f1'] * 100:.2f}%")
     log.info(f"    MCW Dominance: {dominance['mcw_after'] * 100:.1f}%")
     log.info(f"    Goals: {'✓ ALL PASSED' if final_metrics['goals_passed'] else '✗ SOME FAILED'}")
+    PROFILER.finish()
     log.info("")
     
     return {
@@ -28,19 +28,22 @@ Reads:
 Writes:
   model_real_world_honest_v2.joblib, label_encoder_real_honest.joblib,
   hybrid_v2_config.joblib, hybrid_metadata.json, confusion_matrix_v2.png
+  .checkpoints/hybrid/  — per-step outputs; unchanged steps are reloaded
+                          (TRAIN_CHECKPOINTS=0 disables)
+  .shap_cache/            — SHAP explainers / aggregates keyed by model checksum
+  training_metadata_v6.json  — training_profile.hybrid_model (wall / CPU / memory per step)
 """
 
-import hashlib
 import json
 import logging
 import os
+import time
 import warnings
 from collections import Counter
 from datetime import datetime, timezone
 
 import joblib
 import numpy as np
-import pandas as pd
 import sklearn
 from sklearn.calibration import CalibratedClassifierCV
 from sklearn.ensemble import RandomForestClassifier
@@ -55,6 +58,14 @@ from sklearn.metrics import (
 from sklearn.model_selection import StratifiedKFold, cross_val_score, train_test_split
 from sklearn.preprocessing import LabelEncoder
 
+from dataset_cache import CACHE_ENABLED as DATASET_CACHE_ENABLED, load_dataset, optimize_dtypes
+from pipeline_common import (
+    StepCache, code_version, confusion_batch, f1_accuracy_from_confusion, file_digest,
+    grid_search_temperature_alpha, macro_f1_accuracy,
+)
+from shap_stage import SHAP_CHUNK_ROWS, SHAP_SAMPLE_ROWS, per_class_pct, shap_importance
+from training_profiler import PROFILER, job_stats
+
 warnings.filterwarnings("ignore")
 os.environ["PYTHONWARNINGS"] = "ignore"
 
@@ -81,6 +92,8 @@ HYBRID_CONFIG_OUT  = "hybrid_v2_config.joblib"
 METADATA_OUT       = "hybrid_metadata.json"
 CONFMAT_OUT        = "confusion_matrix_v2.png"
 
+CHECKPOINT_DIR      = os.getenv("TRAIN_CHECKPOINT_DIR", os.path.join(".checkpoints", "hybrid"))
+
 RANDOM_STATE = 42
 TEST_SIZE    = 0.20
 
@@ -110,6 +123,9 @@ ENTROPY_THRESHOLD          = 0.4
 DOMINANCE_FREQ_THRESHOLD   = 0.25
 DOMINANCE_PENALTY          = 0.12
 
+TEMP_GRID        = np.linspace(0.5, 3.0, 101)
+ALPHA_GRID       = np.linspace(0.0, 0.7, 141)
+
 
 def section(title, step=None):
     sep = "═" * 70
@@ -154,21 +170,29 @@ def apply_inv_freq(proba, weights):
 
 
 def apply_entropy_penalty(proba, dominant_mask, penalty=DOMINANCE_PENALTY):
-    """Reduce dominant crop probability when prediction entropy is very low."""
-    p = proba.copy()
-    ent = -np.sum(p * np.log(p + 1e-10))
-    if ent < ENTROPY_THRESHOLD:
-        top = np.argmax(p)
-        if dominant_mask[top]:
-            removed = p[top] * penalty
-            p[top] -= removed
-            others = np.ones(len(p), dtype=bool)
-            others[top] = False
-            s = p[others].sum()
-            if s > 0:
-                p[others] += removed * (p[others] / s)
-            else:
-                p[others] += removed / max(1, others.sum())
+    """
+    Reduce dominant crop probability when prediction entropy is very low.
+    Accepts one vector or an (n, C) matrix; rows are handled in array form.
+    """
+    if proba.ndim == 1:
+        return apply_entropy_penalty(proba[None, :], dominant_mask, penalty)[0]
+    p    = proba.copy()
+    ent  = -np.sum(p * np.log(p + 1e-10), axis=1)
+    top  = np.argmax(p, axis=1)
+    rows = np.flatnonzero((ent < ENTROPY_THRESHOLD) & dominant_mask[top])
+    if rows.size == 0:
+        return p
+    sub    = p[rows]
+    is_top = np.zeros(sub.shape, dtype=bool)
+    is_top[np.arange(len(rows)), top[rows]] = True
+    removed = sub[is_top] * penalty
+    sub[is_top] -= removed
+    others = np.where(is_top, 0.0, sub)
+    s  = others.sum(axis=1)
+    ok = s > 0
+    sub[ok]  += removed[ok, None] * (others[ok] / s[ok, None])
+    sub[~ok] += np.where(is_top[~ok], 0.0, (removed[~ok] / max(1, p.shape[1] - 1))[:, None])
+    p[rows] = sub
     return p
 
 
@@ -180,7 +204,7 @@ def step1_load():
     section("LOAD DATA & SYNTHETIC MODEL", 1)
 
     sub("Loading real-world dataset")
-    df = pd.read_csv(MERGED_CSV, low_memory=False)
+    df = load_dataset(MERGED_CSV)
     log.info(f"    {MERGED_CSV}: {len(df):,} rows × {df.shape[1]} cols")
 
     le = LabelEncoder()
@@ -206,7 +230,7 @@ def step1_load():
     synth_crops   = list(synth_encoder.classes_)
     log.info(f"    Synthetic model: {len(synth_crops)} crops")
 
-    df_synth = pd.read_csv(SYNTH_CSV, low_memory=False) if os.path.exists(SYNTH_CSV) else None
+    df_synth = load_dataset(SYNTH_CSV) if os.path.exists(SYNTH_CSV) else None
 
     return {
         "df_real": df, "le_crop": le, "real_crops": crops, "class_counts": counts,
@@ -231,6 +255,7 @@ def step2_retrain(data):
         X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE, stratify=y,
     )
     log.info(f"    Train: {len(X_train):,}  Test: {len(X_test):,}")
+    jobs = {}
 
     # ── A) Baseline: standard RF (no balancing) ───────────────────────
     sub("A) Standard RF (baseline)")
@@ -238,7 +263,8 @@ def step2_retrain(data):
         n_estimators=150, max_depth=25, min_samples_split=5, min_samples_leaf=2,
         random_state=RANDOM_STATE, n_jobs=-1,
     )
-    rf_a.fit(X_train, y_train)
+    with PROFILER.step("standard_rf"), job_stats() as jobs["standard_rf/train"]:
+        rf_a.fit(X_train, y_train)
     pred_a = rf_a.predict(X_test)
     f1_a   = f1_score(y_test, pred_a, average="macro")
     acc_a  = accuracy_score(y_test, pred_a)
@@ -251,7 +277,8 @@ def step2_retrain(data):
         class_weight="balanced_subsample",
         random_state=RANDOM_STATE, n_jobs=-1,
     )
-    rf_b.fit(X_train, y_train)
+    with PROFILER.step("balanced_subsample_rf"), job_stats() as jobs["balanced_subsample_rf/train"]:
+        rf_b.fit(X_train, y_train)
     pred_b = rf_b.predict(X_test)
     f1_b   = f1_score(y_test, pred_b, average="macro")
     acc_b  = accuracy_score(y_test, pred_b)
@@ -266,13 +293,15 @@ def step2_retrain(data):
             n_estimators=150, max_depth=25, min_samples_split=5, min_samples_leaf=2,
             random_state=RANDOM_STATE, n_jobs=-1,
         )
-        rf_c.fit(X_train, y_train)
+        with PROFILER.step("balanced_rf"), job_stats() as jobs["balanced_rf/train"]:
+            rf_c.fit(X_train, y_train)
         pred_c = rf_c.predict(X_test)
         f1_c   = f1_score(y_test, pred_c, average="macro")
         acc_c  = accuracy_score(y_test, pred_c)
         log.info(f"    Top-1: {acc_c * 100:.2f}%  Macro F1: {f1_c * 100:.2f}%")
     except ImportError:
         log.warning("    imblearn not available — skipping")
+    PROFILER.add_jobs("step2_retrain", jobs)
 
     # ── Pick winner (best macro F1 that keeps Top-1 ≥ 73%) ───────────
     sub("Comparison")
@@ -335,36 +364,31 @@ def step3_joint_tune(training, data):
     freq = np.array([counts.get(c, 1) for c in le.classes_], dtype=float)
     freq /= freq.sum()
 
-    sub("Grid search: T ∈ [0.5, 3.0] × α ∈ [0.0, 0.7]")
+    sub(f"Grid search: T ∈ [0.5, 3.0] × α ∈ [0.0, 0.7]  ({len(TEMP_GRID)}×{len(ALPHA_GRID)}, batched)")
+    t0 = time.perf_counter()
+    grid_T, grid_alpha, grid_f1, grid_acc = grid_search_temperature_alpha(
+        proba, y_test, freq, TEMP_GRID, ALPHA_GRID,
+    )
+    log.info(f"    {len(grid_T):,} pairs scored in {time.perf_counter() - t0:.2f}s")
+
+    # Highest macro F1 with Top-1 ≥ 73%; first pair in grid order wins ties
     best_T, best_alpha, best_f1, best_acc = 1.0, 0.0, 0.0, 0.0
     best_weights = np.ones(len(le.classes_))
-    all_results = []
-
-    for T in np.arange(0.5, 3.05, 0.25):
-        p_temp = apply_temperature(proba, T)
-        for alpha in np.arange(0.0, 0.75, 0.05):
-            inv_w = 1.0 / (freq ** alpha) if alpha > 0 else np.ones(len(freq))
-            inv_w /= inv_w.mean()                   # normalize so mean = 1
-            p_adj   = apply_inv_freq(p_temp, inv_w)
-            y_pred  = np.argmax(p_adj, axis=1)
-            mf1     = f1_score(y_test, y_pred, average="macro")
-            acc     = accuracy_score(y_test, y_pred)
-            all_results.append((T, alpha, mf1, acc))
-            if mf1 > best_f1 and acc >= 0.73:
-                best_f1      = mf1
-                best_T       = T
-                best_alpha   = alpha
-                best_acc     = acc
-                best_weights = inv_w.copy()
+    eligible = (grid_acc >= 0.73) & (grid_f1 > 0)
+    if eligible.any():
+        i = int(np.argmax(np.where(eligible, grid_f1, -np.inf)))
+        best_T, best_alpha = float(grid_T[i]), float(grid_alpha[i])
+        best_f1, best_acc  = float(grid_f1[i]), float(grid_acc[i])
+        best_weights  = 1.0 / (freq ** best_alpha)
+        best_weights /= best_weights.mean()             # normalize so mean = 1
 
     # Show top 10
-    all_results.sort(key=lambda x: -x[2])
-    log.info(f"    {'T':>5s}  {'α':>5s}  {'Macro F1':>10s}  {'Top-1':>8s}")
-    for T, alpha, mf1, acc in all_results[:10]:
-        m = " ★" if T == best_T and alpha == best_alpha else ""
-        log.info(f"    {T:5.2f}  {alpha:5.2f}  {mf1 * 100:9.2f}%  {acc * 100:7.2f}%{m}")
+    log.info(f"    {'T':>6s}  {'α':>6s}  {'Macro F1':>10s}  {'Top-1':>8s}")
+    for i in np.argsort(-grid_f1, kind="stable")[:10]:
+        m = " ★" if grid_T[i] == best_T and grid_alpha[i] == best_alpha else ""
+        log.info(f"    {grid_T[i]:6.3f}  {grid_alpha[i]:6.3f}  {grid_f1[i] * 100:9.2f}%  {grid_acc[i] * 100:7.2f}%{m}")
 
-    log.info(f"    Selected: T={best_T:.2f}, α={best_alpha:.2f}  "
+    log.info(f"    Selected: T={best_T:.3f}, α={best_alpha:.3f}  "
              f"(F1={best_f1 * 100:.2f}%, Top-1={best_acc * 100:.2f}%)")
     log.info(f"    Weights range: [{best_weights.min():.3f}, {best_weights.max():.3f}]")
 
@@ -375,32 +399,20 @@ def step3_joint_tune(training, data):
 # STEP 4 — SHAP BIAS AUDIT
 # ═══════════════════════════════════════════════════════════════════════════
 
-def step4_shap(training):
+def step4_shap(training, data):
     section("SHAP BIAS AUDIT", 4)
 
     base_rf = training["base_rf"]
     X_test  = training["X_test"]
 
-    sub("Computing SHAP values (sampling 200 rows for speed)")
-    n_sample = min(200, len(X_test))
-    rng = np.random.RandomState(RANDOM_STATE)
-    idx = rng.choice(len(X_test), n_sample, replace=False)
-    X_s = X_test[idx]
+    sub(f"Computing SHAP values (up to {SHAP_SAMPLE_ROWS:,} rows, chunks of {SHAP_CHUNK_ROWS})")
 
     feature_scaling = {}
     shap_report = {}
 
     try:
-        import shap
-        explainer   = shap.TreeExplainer(base_rf)
-        shap_values = explainer.shap_values(X_s, check_additivity=False)
-
-        if isinstance(shap_values, list):
-            mean_abs = np.mean([np.abs(sv).mean(axis=0) for sv in shap_values], axis=0)
-        elif shap_values.ndim == 3:
-            mean_abs = np.abs(shap_values).mean(axis=(0, 1))
-        else:
-            mean_abs = np.abs(shap_values).mean(axis=0)
+        res      = shap_importance(base_rf, X_test, HONEST_FEATURES, seed=RANDOM_STATE)
+        mean_abs = res["mean_abs"]
 
         total = mean_abs.sum()
         pct   = mean_abs / total * 100
@@ -437,6 +449,8 @@ def step4_shap(training):
             "moisture_humidity_combined": round(float(mh), 2),
             "dominance_detected": bool(mh > 35),
             "feature_scaling": feature_scaling,
+            "per_class_importance_pct": per_class_pct(res, list(data["le_crop"].classes_)),
+            "sample_rows": res["rows"],
         }
 
     except Exception as e:
@@ -782,44 +796,40 @@ class HybridPredictorV2:
         so_ui = {self.unified_crops.index(sc) for sc in self.synth_only
                  if sc in self.unified_crops}
 
+        # Confidence-adaptive weights, blending and entropy penalty for all rows at once
+        real_top  = np.argmax(pr_all, axis=1)
+        real_conf = pr_all[np.arange(n), real_top] * 100
+        synth_top = np.argmax(ps_all, axis=1)
+        high, low = real_conf > 85, real_conf < 50
+        w_r  = np.select([high, low], [W_REAL_HIGH_CONF, W_REAL_LOW_CONF], W_REAL_DEFAULT)
+        w_s  = np.select([high, low], [W_SYNTH_HIGH_CONF, W_SYNTH_LOW_CONF], W_SYNTH_DEFAULT)
+        rule = np.select([high, low], ["HIGH_CONF_REAL", "LOW_CONF_REAL"], "DEFAULT")
+        damp = 1.0 - pr_all[np.arange(n), real_top]
+
+        # 0/1 maps from model columns to unified columns (at most one 1 per column)
+        R  = np.zeros((len(self.real_crops), n_u))
+        Sc = np.zeros((len(self.synth_crops), n_u))
+        So = np.zeros((len(self.synth_crops), n_u))
+        for ri, ui in r2u.items():
+            if ui not in so_ui:
+                R[ri, ui] = 1.0
+        for si, ui in s2u.items():
+            (So if ui in so_ui else Sc)[si, ui] = 1.0
+
+        bl_all = (w_r[:, None] * (pr_all @ R) + w_s[:, None] * (ps_all @ Sc)
+                  + w_s[:, None] * (ps_all @ So) * damp[:, None])
+        t = bl_all.sum(axis=1, keepdims=True)
+        bl_all = np.divide(bl_all, t, out=bl_all, where=t > 0)
+        bl_all = apply_entropy_penalty(bl_all, self.dom_mask)
+        t = bl_all.sum(axis=1, keepdims=True)
+        bl_all = np.divide(bl_all, t, out=bl_all, where=t > 0)
+
         results = []
         for i in range(n):
-            pr, ps = pr_all[i], ps_all[i]
-
-            real_top  = int(np.argmax(pr))
-            real_crop = self.real_crops[real_top]
-            real_conf = float(pr[real_top]) * 100
-
-            synth_top  = int(np.argmax(ps))
-            synth_crop = self.synth_crops[synth_top]
-            synth_conf = float(ps[synth_top]) * 100
-
-            if real_conf > 85:
-                w_r, w_s, rule = W_REAL_HIGH_CONF, W_SYNTH_HIGH_CONF, "HIGH_CONF_REAL"
-            elif real_conf < 50:
-                w_r, w_s, rule = W_REAL_LOW_CONF, W_SYNTH_LOW_CONF, "LOW_CONF_REAL"
-            else:
-                w_r, w_s, rule = W_REAL_DEFAULT, W_SYNTH_DEFAULT, "DEFAULT"
-
-            damp = 1.0 - float(pr[real_top])
-            bl = np.zeros(n_u)
-            for ri in range(len(self.real_crops)):
-                ui = r2u.get(ri, -1)
-                if ui >= 0 and ui not in so_ui:
-                    bl[ui] += w_r * pr[ri]
-            for si in range(len(self.synth_crops)):
-                ui = s2u.get(si, -1)
-                if ui >= 0:
-                    bl[ui] += (w_s * ps[si] * damp) if ui in so_ui else (w_s * ps[si])
-
-            t = bl.sum()
-            if t > 0:
-                bl /= t
-
-            bl = apply_entropy_penalty(bl, self.dom_mask)
-            t = bl.sum()
-            if t > 0:
-                bl /= t
+            pr, ps, bl = pr_all[i], ps_all[i], bl_all[i]
+            real_crop  = self.real_crops[real_top[i]]
+            synth_crop = self.synth_crops[synth_top[i]]
+            synth_conf = float(ps[synth_top[i]]) * 100
 
             # Binary override
             top_ui   = int(np.argmax(bl))
@@ -851,12 +861,12 @@ class HybridPredictorV2:
                 sn  = CROP_NAME_MAP_REAL_TO_SYNTH.get(t1, t1)
                 s_p = (float(ps[self._si[sn]]) if sn in self._si
                        else float(ps[self._si.get(t1, 0)]) if t1 in self._si else 0.0)
-                src = "real" if w_r * r_p >= w_s * s_p else "synthetic"
+                src = "real" if w_r[i] * r_p >= w_s[i] * s_p else "synthetic"
 
             results.append({
                 "top1": t1, "top3": t3, "confidence": round(t1_c, 2),
-                "source_dominance": src, "rule_triggered": rule,
-                "real_top1": real_crop, "real_confidence": round(real_conf, 2),
+                "source_dominance": src, "rule_triggered": str(rule[i]),
+                "real_top1": real_crop, "real_confidence": round(float(real_conf[i]), 2),
                 "synth_top1": synth_crop, "synth_confidence": round(synth_conf, 2),
             })
 
@@ -911,7 +921,7 @@ def step7_evaluate(predictor, data, training, temperature, inv_freq_weights):
             dt["moisture"] = 43.5
 
         log.info(f"    Running hybrid on {len(dt):,} samples...")
-        y_true  = dt["crop"].values
+        y_true  = dt["crop"].astype(str).values
         results = predictor.predict_batch(dt)
         yt_s    = np.array([CROP_NAME_MAP_REAL_TO_SYNTH.get(c, c) for c in y_true])
         yp_h    = np.array([r["top1"] for r in results])
@@ -951,7 +961,7 @@ def step7_evaluate(predictor, data, training, temperature, inv_freq_weights):
         ds = ds.rename(columns={"N": "n", "P": "p", "K": "k"})
 
         log.info(f"    Running hybrid on {len(ds):,} synthetic samples...")
-        yts     = dfs.iloc[tis]["label"].values
+        yts     = dfs.iloc[tis]["label"].astype(str).values
         res_s   = predictor.predict_batch(ds)
         yps     = np.array([r["top1"] for r in res_s])
         acc_s   = np.mean(yts == yps)
@@ -1118,39 +1128,78 @@ def main():
     log.info("║  6 improvements · No dataset change · No leakage · 54 crops       ║")
     log.info("╚══════════════════════════════════════════════════════════════════════╝")
 
-    data     = step1_load()
-    training = step2_retrain(data)
+    PROFILER.start("hybrid_model")
+    cache    = StepCache(CHECKPOINT_DIR, libs={"sklearn": sklearn.__version__})
+    with PROFILER.step("step1_load"):
+        data = step1_load()
+    cache.register("data", file_digest(MERGED_CSV, SYNTH_CSV, SYNTH_MODEL_PATH, SYNTH_ENCODER_PATH)
+                   + (code_version(optimize_dtypes) if DATASET_CACHE_ENABLED else ""))
 
-    temperature, alpha, inv_freq_weights = step3_joint_tune(training, data)
+    training = cache.run(
+        "step2_retrain", step2_retrain, data, inputs=("data",),
+        params={"features": HONEST_FEATURES, "seed": RANDOM_STATE, "test_size": TEST_SIZE},
+    )
 
-    feature_scaling, shap_report = step4_shap(training)
+    temperature, alpha, inv_freq_weights = cache.run(
+        "step3_joint_tune", step3_joint_tune, training, data,
+        inputs=("data", "step2_retrain"),
+        params={"temps": TEMP_GRID.tolist(), "alphas": ALPHA_GRID.tolist()},
+        helpers=(macro_f1_accuracy, confusion_batch, f1_accuracy_from_confusion,
+                 grid_search_temperature_alpha),
+    )
 
-    binary_classifiers, _ = step5_binary_classifiers(training, data, temperature, inv_freq_weights)
+    feature_scaling, shap_report = cache.run(
+        "step4_shap", step4_shap, training, data, inputs=("step2_retrain",),
+        params={"seed": RANDOM_STATE, "shap_rows": SHAP_SAMPLE_ROWS},
+        helpers=(shap_importance, per_class_pct),
+    )
 
-    dominance_rates = step6_dominance(training, data, temperature, inv_freq_weights)
+    binary_classifiers, _ = cache.run(
+        "step5_binary", step5_binary_classifiers, training, data, temperature, inv_freq_weights,
+        inputs=("step2_retrain", "step3_joint_tune"), params={"seed": RANDOM_STATE},
+    )
+
+    dominance_rates = cache.run(
+        "step6_dominance", step6_dominance, training, data, temperature, inv_freq_weights,
+        inputs=("step2_retrain", "step3_joint_tune"),
+        params={"freq": DOMINANCE_FREQ_THRESHOLD},
+    )
 
     # Build predictor
     section("BUILD HYBRID PREDICTOR v2", "6.5")
-    predictor = HybridPredictorV2(
-        real_model=training["model"], real_encoder=data["le_crop"],
-        synth_model=data["synth_model"], synth_encoder=data["synth_encoder"],
-        temperature=temperature, inv_freq_weights=inv_freq_weights,
-        binary_classifiers=binary_classifiers, feature_scaling=feature_scaling,
-        dominance_rates=dominance_rates,
+    with PROFILER.step("step6.5_predictor"):
+        predictor = HybridPredictorV2(
+            real_model=training["model"], real_encoder=data["le_crop"],
+            synth_model=data["synth_model"], synth_encoder=data["synth_encoder"],
+            temperature=temperature, inv_freq_weights=inv_freq_weights,
+            binary_classifiers=binary_classifiers, feature_scaling=feature_scaling,
+            dominance_rates=dominance_rates,
+        )
+        log.info(f"  ✓ HybridPredictorV2 ready — {len(predictor.unified_crops)} unified crops")
+
+        sub("Sanity check")
+        test = {"n": 80, "p": 40, "k": 40, "temperature": 28, "humidity": 82,
+                "ph": 6.5, "rainfall": 2200, "season": 0, "soil_type": 2,
+                "irrigation": 1, "moisture": 70}
+        predictor.predict(test, verbose=True)
+
+    metrics, cm = cache.run(
+        "step7_evaluate", step7_evaluate, predictor, data, training, temperature, inv_freq_weights,
+        inputs=("data", "step2_retrain", "step3_joint_tune", "step4_shap",
+                "step5_binary", "step6_dominance"),
+        params={
+            "entropy": ENTROPY_THRESHOLD, "penalty": DOMINANCE_PENALTY,
+            "freq": DOMINANCE_FREQ_THRESHOLD,
+            "weights": [W_REAL_DEFAULT, W_SYNTH_DEFAULT, W_REAL_HIGH_CONF,
+                        W_SYNTH_HIGH_CONF, W_REAL_LOW_CONF, W_SYNTH_LOW_CONF],
+        },
+        helpers=(HybridPredictorV2, apply_entropy_penalty),
     )
-    log.info(f"  ✓ HybridPredictorV2 ready — {len(predictor.unified_crops)} unified crops")
 
-    sub("Sanity check")
-    test = {"n": 80, "p": 40, "k": 40, "temperature": 28, "humidity": 82,
-            "ph": 6.5, "rainfall": 2200, "season": 0, "soil_type": 2,
-            "irrigation": 1, "moisture": 70}
-    predictor.predict(test, verbose=True)
-
-    metrics, cm = step7_evaluate(predictor, data, training, temperature, inv_freq_weights)
-
-    step8_save(data, training, predictor, metrics, shap_report,
-               temperature, inv_freq_weights, alpha, binary_classifiers,
-               feature_scaling, dominance_rates, cm)
+    with PROFILER.step("step8_save"):
+        step8_save(data, training, predictor, metrics, shap_report,
+                   temperature, inv_freq_weights, alpha, binary_classifiers,
+                   feature_scaling, dominance_rates, cm)
 
     log.info("")
     log.info("═" * 70)
@@ -1171,6 +1220,10 @@ def main():
     log.info(f"  Feature Scaling:    {feature_scaling}")
     log.info(f"  Binary Classifiers: {len(binary_classifiers)}")
     log.info(f"  Goals:              {'ALL ✓' if g.get('all_passed') else 'SOME ✗ — see above'}")
+    if cache.enabled:
+        cached = [k for k, v in cache.report.items() if v == "cached"]
+        log.info(f"  Checkpoints:        {len(cached)}/{len(cache.report)} steps reused")
+    PROFILER.finish()
     log.info("═" * 70)
 
 
@@ -0,0 +1,508 @@
+"""
+Incremental Update — V6 stacked ensemble from newly labelled field data
+=======================================================================
+Updates the production soil model in minutes instead of re-running the
+full 5-fold training, and reports how far the result is from a full retrain.
+
+New labelled rows are split (by arrival order, or --time-col) into:
+  - update rows    — continue training every fold model
+  - holdout rows   — newest slice, appended to the rolling holdout store
+  - test rows      — random slice, only used for the comparison report
+                     (afterwards they join the rolling holdout too)
+
+Per base learner (each fold model keeps out its own K-fold slice of the
+update rows, so fold disagreement stays meaningful for /recommend):
+  - XGBoost    — continued boosting: --rounds extra trees on the old booster
+  - LightGBM   — continued boosting via init_model
+  - BalancedRF — warm start: --trees extra trees per fold model
+
+The update rows are mixed with a class-stratified replay sample of the
+original training data (--base-data), which keeps every crop represented
+(continued boosting and warm starts need the full class set) and limits
+forgetting. The meta-learner and its isotonic calibration are refit on
+the rolling holdout — rows no base learner has trained on — once every
+crop has --min-holdout-per-class rows there; until then the current
+meta-learner is kept. Rows labelled with crops the encoder does not know
+are dropped and counted: adding a crop needs a full retrain.
+
+The model grows by (--rounds × 2 + --trees) trees per fold per update; a
+periodic full retrain (final_stacked_model.py) resets it.
+
+Usage:
+    python incremental_update.py --new field_labels.csv --base-data Crop_recommendation_v2.csv
+    python incremental_update.py --new field_labels.csv --base-data Crop_recommendation_v2.csv \\
+        --compare-full --time-col labelled_at
+
+Writes:
+    stacked_ensemble_v6_inc_<YYYYMMDD>.joblib   (same format as stacked_ensemble_v6.joblib)
+    model_registry_incremental.json            (POST /admin/models/swap with this registry_file)
+    incremental_holdout.csv                    (rolling holdout store)
+    incremental_report.json
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import f1_score, log_loss, top_k_accuracy_score
+from sklearn.model_selection import KFold, StratifiedKFold
+from sklearn.utils.class_weight import compute_sample_weight
+
+from dataset_cache import load_dataset
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s  %(levelname)-8s  %(message)s",
+    datefmt="%H:%M:%S",
+)
+log = logging.getLogger("incremental_update")
+
+BASE_DIR = Path(__file__).parent
+BASE_LEARNERS = ("BalancedRF", "XGBoost", "LightGBM")
+LABEL_COLUMNS = ("label", "crop")
+RANDOM_STATE = 42
+
+REPLAY_RATIO = 1.0            # replay rows per update row
+REPLAY_MIN_PER_CLASS = 20     # every crop appears at least this often in each update batch
+FULL_RETRAIN_FOLDS = 5
+
+
+# ===================================================================
+# ARTIFACTS
+# ===================================================================
+
+def file_checksum(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(8192), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def load_artifacts(model_file: Path, encoder_file: Path, config_file: Path) -> Tuple[Dict, object, Dict]:
+    stacked = joblib.load(model_file)
+    encoder = joblib.load(encoder_file)
+    config = joblib.load(config_file)
+    log.info(f"  {model_file.name}: {len(encoder.classes_)} crops, "
+             f"{len(config['feature_names'])} features, checksum {file_checksum(model_file)}")
+    return stacked, encoder, config
+
+
+def meta_features(fold_models: Dict, X: np.ndarray) -> np.ndarray:
+    """Fold-averaged base-learner probabilities, one block per learner in BASE_LEARNERS."""
+    return np.hstack([
+        np.mean([m.predict_proba(X) for m in fold_models[name]], axis=0)
+        for name in BASE_LEARNERS
+    ])
+
+
+def stack_proba(fold_models: Dict, meta_learner, X: np.ndarray, temperature: float) -> np.ndarray:
+    """Same computation as app.SoilPredictor.predict_with_folds."""
+    proba = meta_learner.predict_proba(meta_features(fold_models, X))
+    if temperature != 1.0:
+        scaled = np.log(np.clip(proba, 1e-10, 1.0)) / temperature
+        scaled -= scaled.max(axis=1, keepdims=True)
+        e = np.exp(scaled)
+        proba = e / e.sum(axis=1, keepdims=True)
+    return proba
+
+
+def tree_counts(fold_models: Dict) -> Dict[str, int]:
+    counts = {}
+    for name in BASE_LEARNERS:
+        m = fold_models[name][0]
+        if name == "BalancedRF":
+            counts[name] = len(m.estimators_)
+        elif name == "XGBoost":
+            counts[name] = m.get_booster().num_boosted_rounds()
+        else:
+            counts[name] = m.booster_.current_iteration()
+    return counts
+
+
+# ===================================================================
+# DATA
+# ===================================================================
+
+def read_labelled(path: Path, features: List[str], encoder, time_col: Optional[str] = None,
+                  cached: bool = False) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Feature columns + encoded "y", in arrival order; unknown crops and
+    incomplete rows dropped. cached=True reads through the columnar
+    dataset cache (the original training CSV).
+    """
+    if cached:
+        df = load_dataset(path)
+    elif path.suffix.lower() in (".parquet", ".pq"):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path, low_memory=False)
+    label_col = next((c for c in LABEL_COLUMNS if c in df.columns), None)
+    missing = [f for f in features if f not in df.columns]
+    if label_col is None or missing:
+        raise SystemExit(f"{path.name}: needs a label column ({'/'.join(LABEL_COLUMNS)}) "
+                         f"and features {features} (missing: {missing})")
+    if time_col:
+        if time_col not in df.columns:
+            raise SystemExit(f"{path.name}: --time-col {time_col!r} not found")
+        df = df.sort_values(time_col, kind="stable")
+
+    labels = df[label_col].astype(str).str.strip()
+    known = labels.isin(set(encoder.classes_))
+    complete = df[features].notna().all(axis=1)
+    unseen = sorted(labels[~known].unique())
+    stats = {
+        "rows_read": int(len(df)),
+        "rows_unseen_crop": int((~known).sum()),
+        "unseen_crops": unseen,
+        "rows_incomplete": int((known & ~complete).sum()),
+    }
+    if unseen:
+        log.warning(f"    {stats['rows_unseen_crop']:,} rows with crops the model does not know "
+                    f"({', '.join(unseen[:8])}{' …' if len(unseen) > 8 else ''}) — full retrain needed")
+    keep = known & complete
+    out = df.loc[keep, features].astype(np.float64).reset_index(drop=True)
+    out["y"] = encoder.transform(labels[keep])
+    return out, stats
+
+
+def split_new(df: pd.DataFrame, test_frac: float, holdout_frac: float,
+              rng: np.random.Generator) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Random test slice; of the rest, the newest holdout_frac is holdout, the older part updates."""
+    is_test = np.zeros(len(df), dtype=bool)
+    is_test[rng.choice(len(df), int(round(len(df) * test_frac)), replace=False)] = True
+    rest = df[~is_test]
+    n_holdout = int(round(len(rest) * holdout_frac))
+    cut = len(rest) - n_holdout
+    return rest.iloc[:cut], rest.iloc[cut:], df[is_test]
+
+
+def replay_sample(base: pd.DataFrame, n_rows: int, n_classes: int,
+                  rng: np.random.Generator) -> pd.DataFrame:
+    """Class-stratified sample of the original training rows, at least REPLAY_MIN_PER_CLASS per crop."""
+    per_class = max(REPLAY_MIN_PER_CLASS, int(np.ceil(n_rows / n_classes)))
+    parts = []
+    for _, group in base.groupby("y", sort=True):
+        take = min(len(group), per_class)
+        parts.append(group.iloc[rng.choice(len(group), take, replace=False)])
+    return pd.concat(parts, ignore_index=True)
+
+
+def update_holdout_store(store: Path, rows: pd.DataFrame, features: List[str], encoder,
+                         window: int) -> pd.DataFrame:
+    """Append rows (labels as crop names), keep the newest `window`; returns the store with "y"."""
+    added = rows[features].copy()
+    added["label"] = encoder.inverse_transform(rows["y"].to_numpy())
+    added["added"] = datetime.now(timezone.utc).date().isoformat()
+    if store.exists():
+        added = pd.concat([pd.read_csv(store), added], ignore_index=True)
+    added = added.iloc[-window:].reset_index(drop=True)
+    added = added[added["label"].isin(set(encoder.classes_))].reset_index(drop=True)
+    tmp = store.with_suffix(f".tmp{os.getpid()}")
+    added.to_csv(tmp, index=False)
+    os.replace(tmp, store)
+    added["y"] = encoder.transform(added["label"])
+    return added
+
+
+# ===================================================================
+# INCREMENTAL UPDATE
+# ===================================================================
+
+def continue_model(name: str, model, X: np.ndarray, y: np.ndarray, rounds: int, trees: int):
+    """Copy of `model` trained further on (X, y); the original is left untouched."""
+    if name == "XGBoost":
+        m = clone(model).set_params(n_estimators=rounds)
+        m.fit(X, y, sample_weight=compute_sample_weight("balanced", y), xgb_model=model.get_booster())
+    elif name == "LightGBM":
+        m = clone(model).set_params(n_estimators=rounds)
+        m.fit(X, y, init_model=model.booster_)
+    else:
+        m = copy.deepcopy(model)
+        m.set_params(warm_start=True, n_estimators=len(model.estimators_) + trees)
+        m.fit(X, y)
+        m.set_params(warm_start=False)
+    if not np.array_equal(m.classes_, model.classes_):
+        raise ValueError(f"{name}: class set changed during the update")
+    return m
+
+
+def update_fold_models(fold_models: Dict, update: pd.DataFrame, replay: pd.DataFrame,
+                       features: List[str], rounds: int, trees: int) -> Tuple[Dict, Dict[str, float]]:
+    """
+    Every fold model continues on the update rows outside its own K-fold
+    slice plus the replay sample. Returns the new fold models and the
+    seconds spent per learner.
+    """
+    n_folds = len(fold_models[BASE_LEARNERS[0]])
+    if len(update) >= n_folds:
+        slices = [train for train, _ in KFold(n_folds, shuffle=True, random_state=RANDOM_STATE).split(update)]
+    else:
+        slices = [np.arange(len(update))] * n_folds
+    X_replay = replay[features].to_numpy()
+    y_replay = replay["y"].to_numpy()
+
+    updated, seconds = {}, {}
+    for name in BASE_LEARNERS:
+        t0 = time.perf_counter()
+        updated[name] = []
+        for fold_idx, model in enumerate(fold_models[name]):
+            rows = update.iloc[slices[fold_idx]]
+            X = np.vstack([rows[features].to_numpy(), X_replay])
+            y = np.concatenate([rows["y"].to_numpy(), y_replay])
+            updated[name].append(continue_model(name, model, X, y, rounds, trees))
+        seconds[name] = round(time.perf_counter() - t0, 2)
+        log.info(f"    {name:12s}: {n_folds} fold models updated in {seconds[name]:.1f}s")
+    return updated, seconds
+
+
+def refit_meta(meta_learner, fold_models: Dict, holdout: pd.DataFrame, features: List[str],
+               n_classes: int, min_per_class: int) -> Tuple[object, Dict]:
+    """Refit the calibrated meta-learner on the rolling holdout, or keep it if coverage is short."""
+    counts = np.bincount(holdout["y"].to_numpy(), minlength=n_classes)
+    short = int((counts < min_per_class).sum())
+    info = {"holdout_rows": int(len(holdout)), "classes_below_min": short,
+            "min_per_class": min_per_class}
+    if short:
+        log.info(f"    Meta-learner kept: {short}/{n_classes} crops have < {min_per_class} "
+                 f"rolling-holdout rows")
+        return meta_learner, {**info, "refit": False}
+    t0 = time.perf_counter()
+    meta = clone(meta_learner)
+    meta.fit(meta_features(fold_models, holdout[features].to_numpy()), holdout["y"].to_numpy())
+    info.update(refit=True, seconds=round(time.perf_counter() - t0, 2))
+    log.info(f"    Meta-learner + isotonic calibration refit on {len(holdout):,} holdout rows "
+             f"in {info['seconds']:.1f}s")
+    return meta, info
+
+
+# ===================================================================
+# FULL RETRAIN (comparison only)
+# ===================================================================
+
+def full_retrain(fold_models: Dict, meta_learner, X: np.ndarray, y: np.ndarray) -> Tuple[Dict, object]:
+    """Same hyperparameters as the current model, trained from scratch with 5-fold OOF stacking."""
+    folds = list(StratifiedKFold(FULL_RETRAIN_FOLDS, shuffle=True, random_state=RANDOM_STATE).split(X, y))
+    n_classes = len(meta_learner.classes_)
+    weights = compute_sample_weight("balanced", y)
+    new_folds = {name: [] for name in BASE_LEARNERS}
+    oof = {name: np.zeros((len(y), n_classes)) for name in BASE_LEARNERS}
+    for fold_idx, (train_idx, val_idx) in enumerate(folds):
+        log.info(f"    Fold {fold_idx + 1}/{FULL_RETRAIN_FOLDS}")
+        for name in BASE_LEARNERS:
+            m = clone(fold_models[name][0])
+            if name == "XGBoost":
+                m.fit(X[train_idx], y[train_idx], sample_weight=weights[train_idx])
+            else:
+                m.fit(X[train_idx], y[train_idx])
+            oof[name][val_idx] = m.predict_proba(X[val_idx])
+            new_folds[name].append(m)
+    meta = clone(meta_learner)
+    meta.fit(np.hstack([oof[name] for name in BASE_LEARNERS]), y)
+    return new_folds, meta
+
+
+# ===================================================================
+# EVALUATION
+# ===================================================================
+
+def compute_ece(y_true: np.ndarray, y_proba: np.ndarray, n_bins: int = 15) -> float:
+    confidences = y_proba.max(axis=1)
+    correct = (y_proba.argmax(axis=1) == y_true).astype(float)
+    bins = np.clip(np.digitize(confidences, np.linspace(0, 1, n_bins + 1), right=True) - 1, 0, n_bins - 1)
+    ece = 0.0
+    for b in np.unique(bins):
+        in_bin = bins == b
+        ece += in_bin.mean() * abs(confidences[in_bin].mean() - correct[in_bin].mean())
+    return float(ece)
+
+
+def evaluate(proba: np.ndarray, y: np.ndarray) -> Dict[str, float]:
+    labels = np.arange(proba.shape[1])
+    return {
+        "top1_accuracy": round(float((proba.argmax(axis=1) == y).mean()), 4),
+        "top3_accuracy": round(float(top_k_accuracy_score(y, proba, k=3, labels=labels)), 4),
+        "macro_f1": round(float(f1_score(y, proba.argmax(axis=1), average="macro")), 4),
+        "ece": round(compute_ece(y, proba), 4),
+        "log_loss": round(float(log_loss(y, np.clip(proba, 1e-10, 1.0), labels=labels)), 4),
+    }
+
+
+def _log_metrics(label: str, m: Dict[str, float]) -> None:
+    log.info(f"    {label:14s}: Top-1={m['top1_accuracy'] * 100:.2f}%  Top-3={m['top3_accuracy'] * 100:.2f}%  "
+             f"Macro F1={m['macro_f1'] * 100:.2f}%  ECE={m['ece']:.4f}")
+
+
+# ===================================================================
+# DRIVER
+# ===================================================================
+
+def write_registry(registry_in: Path, registry_out: Path, model_name: str, stamp: str) -> str:
+    registry = json.loads(registry_in.read_text(encoding="utf-8"))
+    soil = registry["models"]["soil"]
+    soil["model_file"] = model_name
+    soil["type"] = "stacked-ensemble-v6-incremental"
+    version = f"{str(registry.get('version', '6.0')).split('+')[0]}+inc{stamp}"
+    registry["version"] = version
+    registry["last_updated"] = datetime.now(timezone.utc).date().isoformat()
+    registry_out.write_text(json.dumps(registry, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    return version
+
+
+def run(args) -> Dict:
+    rng = np.random.default_rng(RANDOM_STATE)
+    t_start = time.perf_counter()
+
+    log.info("Loading current model")
+    model_path = BASE_DIR / args.model
+    stacked, encoder, config = load_artifacts(model_path, BASE_DIR / args.encoder, BASE_DIR / args.config)
+    features = list(config["feature_names"])
+    temperature = config.get("temperature", 0.9)
+    n_classes = len(encoder.classes_)
+
+    log.info(f"Reading new labelled rows from {args.new}")
+    new, read_stats = read_labelled(Path(args.new), features, encoder, args.time_col)
+    if len(new) == 0:
+        raise SystemExit("No usable labelled rows")
+    update, holdout, test = split_new(new, args.test_frac, args.holdout_frac, rng)
+    log.info(f"    {len(new):,} rows → update {len(update):,} · holdout {len(holdout):,} · test {len(test):,}")
+
+    base = None
+    if args.base_data:
+        base, _ = read_labelled(Path(args.base_data), features, encoder, cached=True)
+        log.info(f"    {Path(args.base_data).name}: {len(base):,} training rows")
+        replay = replay_sample(base, int(len(update) * REPLAY_RATIO), n_classes, rng)
+    else:
+        replay = update.iloc[:0]
+        if np.unique(update["y"]).size < n_classes:
+            raise SystemExit("The update rows do not cover every crop; pass --base-data for the replay sample")
+    log.info(f"    Replay sample: {len(replay):,} rows from the original training data")
+
+    log.info("Updating base learners")
+    t0 = time.perf_counter()
+    fold_models, learner_seconds = update_fold_models(
+        stacked["fold_models"], update, replay, features, args.rounds, args.trees)
+
+    log.info("Refitting meta-learner on the rolling holdout")
+    store = update_holdout_store(BASE_DIR / args.holdout_store, holdout, features, encoder, args.holdout_window)
+    meta, meta_info = refit_meta(stacked["meta_learner"], fold_models, store, features,
+                                 n_classes, args.min_holdout_per_class)
+    incremental_s = time.perf_counter() - t0
+    log.info(f"    Incremental update: {incremental_s:.1f}s")
+
+    evaluation, timing = {}, {"incremental_s": round(incremental_s, 1), "learners_s": learner_seconds}
+    if len(test):
+        log.info(f"Evaluating on {len(test):,} held-out new rows")
+        X_test, y_test = test[features].to_numpy(), test["y"].to_numpy()
+        evaluation["previous"] = evaluate(
+            stack_proba(stacked["fold_models"], stacked["meta_learner"], X_test, temperature), y_test)
+        evaluation["incremental"] = evaluate(stack_proba(fold_models, meta, X_test, temperature), y_test)
+
+        if args.compare_full:
+            if base is None:
+                log.warning("    --compare-full needs --base-data; skipped")
+            else:
+                log.info("Full retrain for comparison")
+                train = pd.concat([base, update, holdout], ignore_index=True)
+                t0 = time.perf_counter()
+                full_folds, full_meta = full_retrain(
+                    stacked["fold_models"], stacked["meta_learner"],
+                    train[features].to_numpy(), train["y"].to_numpy())
+                timing["full_retrain_s"] = round(time.perf_counter() - t0, 1)
+                timing["speedup"] = round(timing["full_retrain_s"] / max(incremental_s, 1e-9), 1)
+                evaluation["full_retrain"] = evaluate(stack_proba(full_folds, full_meta, X_test, temperature), y_test)
+                log.info(f"    Full retrain: {timing['full_retrain_s']:.1f}s "
+                         f"(incremental ×{timing['speedup']} faster)")
+
+        for label, metrics in evaluation.items():
+            _log_metrics(label, metrics)
+        update_holdout_store(BASE_DIR / args.holdout_store, test, features, encoder, args.holdout_window)
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d")
+    out_name = args.output or f"stacked_ensemble_v6_inc_{stamp}.joblib"
+    out_path = BASE_DIR / out_name
+    lineage = {
+        "base_model": args.model,
+        "base_checksum": file_checksum(model_path),
+        "updated": datetime.now(timezone.utc).isoformat(),
+        "update_rows": int(len(update)),
+        "replay_rows": int(len(replay)),
+        "rounds": args.rounds,
+        "trees": args.trees,
+        "meta_refit": meta_info["refit"],
+    }
+    history = list(stacked.get("incremental_history", [])) + [lineage]
+    joblib.dump({**stacked, "fold_models": fold_models, "meta_learner": meta,
+                 "incremental_history": history}, out_path, compress=3)
+    log.info(f"Saved {out_name} (checksum {file_checksum(out_path)})")
+
+    version = write_registry(BASE_DIR / args.registry, BASE_DIR / args.registry_out, out_name, stamp)
+    log.info(f"Saved {args.registry_out} (version {version}) — "
+             f"POST /admin/models/swap {{\"registry_file\": \"{args.registry_out}\"}}")
+
+    report = {
+        "generated": datetime.now(timezone.utc).isoformat(),
+        "model": {"input": args.model, "output": out_name, "checksum": file_checksum(out_path),
+                  "registry": args.registry_out, "version": version,
+                  "updates_since_full_retrain": len(history)},
+        "data": {**read_stats, "update": int(len(update)), "holdout": int(len(holdout)),
+                 "test": int(len(test)), "replay": int(len(replay))},
+        "trees_per_fold": {"before": tree_counts(stacked["fold_models"]), "after": tree_counts(fold_models)},
+        "meta_learner": meta_info,
+        "timing": {**timing, "total_s": round(time.perf_counter() - t_start, 1)},
+        "evaluation": evaluation,
+    }
+    if "incremental" in evaluation and "full_retrain" in evaluation:
+        report["incremental_minus_full"] = {
+            k: round(evaluation["incremental"][k] - evaluation["full_retrain"][k], 4)
+            for k in evaluation["incremental"]
+        }
+    with open(BASE_DIR / args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    log.info(f"Saved {args.report}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally update the V6 soil model from new labelled rows.")
+    parser.add_argument("--new", required=True, help="CSV or Parquet with the feature columns and label/crop")
+    parser.add_argument("--base-data", help="original training CSV (replay sample, full-retrain comparison)")
+    parser.add_argument("--model", default="stacked_ensemble_v6.joblib")
+    parser.add_argument("--encoder", default="label_encoder_v6.joblib")
+    parser.add_argument("--config", default="stacked_v6_config.joblib")
+    parser.add_argument("--registry", default="model_registry.json")
+    parser.add_argument("--output", help="model file name (default stacked_ensemble_v6_inc_<YYYYMMDD>.joblib)")
+    parser.add_argument("--registry-out", default="model_registry_incremental.json")
+    parser.add_argument("--report", default="incremental_report.json")
+    parser.add_argument("--time-col", help="column giving the labelling order (default: file order)")
+    parser.add_argument("--rounds", type=int, default=20, help="extra boosting rounds per XGBoost/LightGBM fold model")
+    parser.add_argument("--trees", type=int, default=10, help="extra trees per BalancedRF fold model")
+    parser.add_argument("--test-frac", type=float, default=0.2, help="share of new rows kept for the report")
+    parser.add_argument("--holdout-frac", type=float, default=0.25,
+                        help="newest share of the remaining rows added to the rolling holdout")
+    parser.add_argument("--holdout-store", default="incremental_holdout.csv")
+    parser.add_argument("--holdout-window", type=int, default=20000, help="rows kept in the rolling holdout")
+    parser.add_argument("--min-holdout-per-class", type=int, default=5,
+                        help="refit the meta-learner only when every crop has this many holdout rows")
+    parser.add_argument("--compare-full", action="store_true",
+                        help="also run a full retrain on base + new rows and compare (slow)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.new):
+        raise SystemExit(f"Input not found: {args.new}")
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,194 @@
 """
 Structured JSON logging configuration.
+
+setup_queue_logging() moves formatting and I/O for a logger onto a
+background QueueListener, with per-category sampling / rate limits
+applied before a record is ever queued.
 """
 
+import atexit
 import json
 import logging
+import queue
+import random
+import threading
 import time
 from datetime import datetime
-from typing import Any, Dict, Optional
-from pythonjsonlogger import jsonlogger
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from pythonjsonlogger import jsonlogger
+except ImportError:
+    jsonlogger = None
+
+
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class _JsonFormatter(logging.Formatter):
+    """Minimal JSON formatter used when python-json-logger is not installed."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "asctime": self.formatTime(record, self.datefmt),
+            "name": record.name,
+            "levelname": record.levelname,
+            "message": record.getMessage(),
+        }
+        payload.update({k: v for k, v in vars(record).items() if k not in _RESERVED_ATTRS})
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+def _json_formatter() -> logging.Formatter:
+    if jsonlogger is not None:
+        return jsonlogger.JsonFormatter(
+            '%(asctime)s %(name)s %(levelname)s %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+    return _JsonFormatter(datefmt='%Y-%m-%d %H:%M:%S')
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Per-category sampling and token-bucket rate limiting.
+
+    The category is the record's ``category`` extra ("general" if unset).
+    WARNING and above always pass. Dropped records are counted per category.
+    """
+
+    def __init__(self,
+                 sample_rates: Optional[Dict[str, float]] = None,
+                 rate_limits: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+        self.rate_limits = rate_limits or {}
+        self.dropped: Dict[str, int] = {}
+        self._buckets: Dict[str, list] = {}   # category -> [tokens, last_refill]
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+
+    def _drop(self, category: str) -> bool:
+        self.dropped[category] = self.dropped.get(category, 0) + 1
+        return False
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        category = getattr(record, "category", "general")
+
+        rate = self.sample_rates.get(category, 1.0)
+        if rate < 1.0 and self._rng.random() >= rate:
+            with self._lock:
+                return self._drop(category)
+
+        limit = self.rate_limits.get(category)
+        if limit:
+            now = time.monotonic()
+            with self._lock:
+                bucket = self._buckets.setdefault(category, [limit, now])
+                bucket[0] = min(limit, bucket[0] + (now - bucket[1]) * limit)
+                bucket[1] = now
+                if bucket[0] < 1.0:
+                    return self._drop(category)
+                bucket[0] -= 1.0
+        return True
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves message %-formatting to the listener thread.
+
+    Log arguments must not be mutated after the call (the engine only
+    logs scalars, strings and finished dicts).
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # Render tracebacks now, while the frames are still alive
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_category_map(spec: str) -> Dict[str, float]:
+    """Parse "feasibility=0.05,pipeline=0.2" into {"feasibility": 0.05, ...}."""
+    out: Dict[str, float] = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            key, value = part.split("=", 1)
+            out[key.strip()] = float(value)
+    return out
+
+
+def setup_queue_logging(name: str,
+                        level: str = "INFO",
+                        sample_rates: Optional[Dict[str, float]] = None,
+                        rate_limits: Optional[Dict[str, float]] = None,
+                        attach_root: bool = True,
+                        ) -> Tuple[QueueListener, SamplingFilter]:
+    """
+    Route logger *name* through an in-process queue.
+
+    The request thread only runs the sampling filter and an enqueue; a
+    QueueListener thread formats JSON and writes to stderr. With
+    *attach_root* the same queue also becomes the root handler at *level*
+    (when the root has none yet, as logging.basicConfig would), so other
+    module loggers in the process are not dropped.
+    """
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    sampling = SamplingFilter(sample_rates, rate_limits)
+
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(sampling)
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(_json_formatter())
+
+    logger = logging.getLogger(name)
+    logger.setLevel(getattr(logging, level.upper()))
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    root = logging.getLogger()
+    if attach_root and not root.handlers:
+        root.setLevel(getattr(logging, level.upper()))
+        root.addHandler(queue_handler)
+
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener, sampling
+
+
+def _stop_listener(listener: QueueListener) -> None:
+    """Flush queued records at exit (no-op if already stopped)."""
+    if getattr(listener, "_thread", None) is not None:
+        listener.stop()
 
 
 class StructuredLogger:
     """Structured JSON logger with prediction metrics."""
     
-    def __init__(self, name: str, level: str = "INFO"):
+    def __init__(self, name: str, level: str = "INFO", configure_handlers: bool = True):
         self.logger = logging.getLogger(name)
         self.logger.setLevel(getattr(logging, level.upper()))
+        if not configure_handlers:
+            # Handlers already set up (e.g. by setup_queue_logging)
+            return
         
         # Remove existing handlers
         for handler in self.logger.handlers[:]:
             self.logger.removeHandler(handler)
         
         # Create JSON formatter
-        formatter = jsonlogger.JsonFormatter(
-            '%(asctime)s %(name)s %(levelname)s %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
+        formatter = _json_formatter()
         
         # Console handler
         console_handler = logging.StreamHandler()
@@ -55,6 +218,23 @@ class StructuredLogger:
                 log_data.update(additional_data)
             self.logger.info(json.dumps(log_data))
     
+    def log_decision(self, endpoint: str, latency_ms: float, **fields: Any):
+        """
+        One summarized decision record per request. Fields travel as
+        record extras, so JSON encoding happens in the formatter (on the
+        listener thread when queue logging is set up).
+        """
+        self.logger.info(
+            "decision",
+            extra={
+                "category": "decision",
+                "event": "decision",
+                "endpoint": endpoint,
+                "latency_ms": round(latency_ms, 2),
+                **fields,
+            },
+        )
+    
     def log_model_load(self, mode: str, load_time_ms: float, model_file: str):
         """Log model loading event."""
         log_data = {
@@ -0,0 +1,200 @@
+"""
+Pipeline Common — helpers shared by the offline pipelines
+=========================================================
+Used by final_stacked_model.py, hybrid_model.py, shap_stage.py and
+predict.py, so the scripts cannot drift apart on:
+
+  - thread_env(): native-thread caps for spawned process pools
+  - StepCache: content-addressed step checkpoints (file_digest and
+    code_version build the keys)
+  - macro_f1_accuracy() and grid_search_temperature_alpha(): batched
+    metrics for the calibration grid searches
+"""
+
+import hashlib
+import inspect
+import json
+import logging
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import joblib
+import numpy as np
+
+from training_profiler import PROFILER
+
+log = logging.getLogger("pipeline_common")
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+CHECKPOINTS_ENABLED = os.getenv("TRAIN_CHECKPOINTS", "1") == "1"
+GRID_BLOCK_ELEMS = 1 << 24     # candidates × rows × classes held in memory at once
+
+
+# ===================================================================
+# PROCESS POOLS
+# ===================================================================
+
+@contextmanager
+def thread_env(threads: int):
+    """
+    Cap native threads for spawned children.
+
+    Children read the env at start-up, before anything in a pool
+    initializer runs (numpy is already imported to unpickle the job), so
+    the pool must be created — and its workers spawned — inside this block.
+    """
+    saved = {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+    os.environ.update({var: str(threads) for var in THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+# ===================================================================
+# BATCHED METRICS
+# ===================================================================
+
+def confusion_batch(y_true: np.ndarray, y_pred: np.ndarray, n_classes: int) -> np.ndarray:
+    """(G, C, C) confusion matrices for a batch of prediction vectors y_pred (G, n), via one np.bincount."""
+    G = y_pred.shape[0]
+    flat = (np.arange(G)[:, None] * n_classes + y_true[None, :]) * n_classes + y_pred
+    return np.bincount(flat.ravel(), minlength=G * n_classes * n_classes).reshape(G, n_classes, n_classes)
+
+
+def f1_accuracy_from_confusion(cm: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Macro F1 and accuracy per (C, C) confusion matrix in a (G, C, C) stack.
+
+    Matches sklearn's f1_score(average="macro"): classes absent from both
+    y_true and y_pred are left out of the mean.
+    """
+    tp = cm.diagonal(axis1=1, axis2=2)
+    denom = cm.sum(axis=2) + cm.sum(axis=1)          # support + predicted = 2tp + fn + fp
+    present = denom > 0
+    f1 = np.where(present, 2 * tp / np.maximum(denom, 1), 0.0)
+    return f1.sum(axis=1) / np.maximum(present.sum(axis=1), 1), tp.sum(axis=1) / cm.sum(axis=(1, 2))
+
+
+def macro_f1_accuracy(y_true: np.ndarray, y_pred: np.ndarray, n_classes: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Macro F1 and accuracy for a batch of prediction vectors y_pred (G, n)."""
+    return f1_accuracy_from_confusion(confusion_batch(y_true, y_pred, n_classes))
+
+
+def grid_search_temperature_alpha(
+    proba: np.ndarray,
+    y_true: np.ndarray,
+    freq: np.ndarray,
+    temps: np.ndarray,
+    alphas: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Score every (T, α) pair at once; returns flat T, α, macro F1, Top-1 in T-major order.
+
+    argmax(apply_inv_freq(apply_temperature(p, T), w_α)) equals
+    argmax(log p + T · log w_α): the softmax and renormalisation
+    denominators and the mean-normalisation of w_α are per-row constants,
+    and scaling by T > 0 keeps the order. Candidates are stacked into
+    (block, n, C) score tensors.
+    """
+    n, n_classes = proba.shape
+    log_p = np.log(np.clip(proba, 1e-10, 1.0))
+    log_w = -np.outer(alphas, np.log(freq))                   # (A, C)
+    grid_T = np.repeat(temps, len(alphas))
+    grid_a = np.tile(np.arange(len(alphas)), len(temps))
+    shift = grid_T[:, None] * log_w[grid_a]                   # (G, C)
+    f1 = np.empty(len(grid_T))
+    acc = np.empty(len(grid_T))
+    block = max(1, GRID_BLOCK_ELEMS // (n * n_classes))
+    for start in range(0, len(grid_T), block):
+        sl = slice(start, start + block)
+        scores = log_p[None] + shift[sl, None, :]
+        f1[sl], acc[sl] = macro_f1_accuracy(y_true, scores.argmax(axis=2), n_classes)
+    return grid_T, alphas[grid_a], f1, acc
+
+
+# ===================================================================
+# STEP CHECKPOINTS — content-addressed, one joblib file per step output
+# ===================================================================
+
+def file_digest(*paths) -> str:
+    """sha256 over the bytes of every existing input file (streamed)."""
+    h = hashlib.sha256()
+    for path in paths:
+        if not Path(path).exists():
+            continue
+        h.update(Path(path).name.encode())
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def code_version(*fns) -> str:
+    """Hash of the source of a step and the helpers it calls."""
+    h = hashlib.sha256()
+    for fn in fns:
+        h.update(inspect.getsource(fn).encode())
+    return h.hexdigest()[:16]
+
+
+class StepCache:
+    """
+    Skip pipeline steps whose inputs have not changed.
+
+    A step's key hashes its code version, its parameters, the library
+    versions and the keys of the steps it consumes (the first of which is
+    the dataset digest), so editing step 6 re-runs steps 6+ only while
+    the fold models from step 2 are loaded from disk. Outputs are written
+    atomically, so a crashed run resumes from the last finished step.
+    `libs` adds the versions of the learners a pipeline trains with.
+    """
+
+    LIBS = {"numpy": np.__version__}
+
+    def __init__(self, directory, enabled: bool = CHECKPOINTS_ENABLED,
+                 libs: Optional[Dict[str, str]] = None):
+        self.directory = Path(directory)
+        self.enabled = enabled
+        self.libs = {**self.LIBS, **(libs or {})}
+        self.keys: Dict[str, str] = {}
+        self.report: Dict[str, str] = {}
+        if enabled:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def register(self, name: str, key: str) -> None:
+        """Record an externally computed key (e.g. the dataset digest)."""
+        self.keys[name] = key
+
+    def run(self, name: str, fn, *args, inputs: Tuple[str, ...] = (),
+            params: Optional[Dict] = None, helpers: Tuple = ()):
+        spec = {
+            "step": name,
+            "code": code_version(fn, *helpers),
+            "params": params or {},
+            "inputs": [self.keys[i] for i in inputs],
+            "libs": self.libs,
+        }
+        key = hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+        self.keys[name] = key
+        path = self.directory / f"{name}-{key[:16]}.joblib"
+
+        with PROFILER.step(name) as prof:
+            if self.enabled and path.exists():
+                log.info(f"  ↺ {name}: unchanged — loaded {path.name}")
+                self.report[name] = prof["status"] = "cached"
+                return joblib.load(path)
+
+            out = fn(*args)
+            if self.enabled:
+                tmp = path.with_suffix(f".tmp{os.getpid()}")
+                joblib.dump(out, tmp, compress=3)
+                os.replace(tmp, path)
+            self.report[name] = prof["status"] = "ran"
+        return out
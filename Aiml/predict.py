@@ -1,83 +1,405 @@
 """
-Crop Recommendation v2.2 — Prediction Script
-=============================================
-Loads the v2.2 calibrated model and makes predictions.
-Includes season + soil_type + irrigation features.
+Crop Recommendation — Bulk Scorer
+=================================
+Scores soil-health-card style files through the same advisory pipeline as
+POST /recommend (app._recommend_pipeline): feasibility gate, NCS/EMS
+decision matrix, tiers.
+
+  - Streams CSV or Parquet input in chunks (never loads the whole file)
+  - Scores chunks across a process pool; every worker imports the engine
+    (and so loads the models) exactly once, with its BLAS/OpenMP threads
+    capped so workers × threads ≈ cores
+  - Writes results incrementally, in input order: top-3 crops with
+    confidence, tier, NCS and EMS per row
+  - Logs rows/sec; --resume continues after an interruption from the
+    last completed chunk (progress kept in <output>.progress.json)
+
+Input columns: N, P, K, temperature, humidity, ph, rainfall
+               (optional: season, soil_type, irrigation, moisture;
+               district [+ state] in place of temperature/humidity/rainfall).
+Rows outside the acceptance limits are kept with status="invalid". Each
+chunk is validated in one vectorised pass and its valid rows are scored
+with one predict_proba call per model (app.score_batch); every output chunk
+has the same columns (output_columns), whatever its mix of statuses.
+
+Usage:
+    python predict.py --input cards.csv --output scored.csv --workers 8
+    python predict.py --input cards.parquet --output scored.parquet --resume
+    python predict.py --demo
 """
 
-import joblib
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Iterator, List, Optional, Tuple
+
 import numpy as np
 import pandas as pd
 
-MODEL_PATH = "model_rf.joblib"
-ENCODER_PATH = "label_encoder.joblib"
+from pipeline_common import thread_env
 
-FEATURES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall",
-            "season", "soil_type", "irrigation"]
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s  %(levelname)-8s  %(message)s",
+    datefmt="%H:%M:%S",
+)
+log = logging.getLogger("predict")
 
-SEASON_REVERSE = {0: "Kharif", 1: "Rabi", 2: "Zaid"}
-SOIL_REVERSE = {0: "sandy", 1: "loamy", 2: "clay"}
-IRRIG_REVERSE = {0: "rainfed", 1: "irrigated"}
+INPUT_FIELDS = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall",
+                "season", "soil_type", "irrigation", "moisture", "district", "state"]
+INT_FIELDS = ("season", "soil_type", "irrigation")
+TOP_FIELDS = ["crop", "confidence", "advisory_tier", "ncs", "ncs_level",
+              "ems", "environmental_match"]
+# Output schema (after row_id, --keep-columns, status and error); every chunk
+# is cast to it so CSV appends line up and Parquet parts share one schema.
+RESULT_DTYPES = {
+    "fallback_mode": "boolean",
+    "global_unsuitable": "boolean",
+    "viable_count": "Int64",
+    "season_used": "string",
+    "latency_ms": "Float64",
+    **{f"top{rank}_{field}": dtype
+       for rank in range(1, 4)
+       for field, dtype in zip(TOP_FIELDS, ["string", "Float64", "string", "Float64",
+                                            "string", "Float64", "string"])},
+}
 
-print("Loading v2.2 calibrated model …")
-model = joblib.load(MODEL_PATH)
-label_encoder = joblib.load(ENCODER_PATH)
+DEMO_INPUT = {
+    "N": 100, "P": 50, "K": 50,
+    "temperature": 28, "humidity": 85,
+    "ph": 6.5, "rainfall": 2000,
+    "soil_type": 2,   # clay
+    "irrigation": 1,  # irrigated
+}
 
 
-def infer_season(temperature: float) -> int:
-    if temperature >= 28: return 0
-    elif temperature <= 22: return 1
-    else: return 2
+# ===================================================================
+# WORKER — one engine per process
+# ===================================================================
 
+_engine = None
 
-def predict_top_crops(input_dict: dict, top_n: int = 3):
-    if "season" not in input_dict:
-        input_dict["season"] = infer_season(input_dict["temperature"])
-    if "soil_type" not in input_dict:
-        input_dict["soil_type"] = 1  # default loamy
-    if "irrigation" not in input_dict:
-        input_dict["irrigation"] = 0  # default rainfed
 
-    X = pd.DataFrame([input_dict])[FEATURES]
-    proba = model.predict_proba(X)[0]
-    top_idx = np.argsort(proba)[-top_n:][::-1]
+def _cap_estimator_threads(est, threads: int) -> None:
+    """Set n_jobs on a fitted estimator (and the calibrated copies it wraps)."""
+    if hasattr(est, "get_params") and "n_jobs" in est.get_params(deep=False):
+        est.set_params(n_jobs=threads)
+    for calibrated in getattr(est, "calibrated_classifiers_", ()):
+        _cap_estimator_threads(getattr(calibrated, "estimator", None), threads)
 
-    results = []
-    for rank, idx in enumerate(top_idx, start=1):
-        crop_name = label_encoder.inverse_transform([idx])[0]
-        results.append({
-            "rank": rank,
-            "crop": crop_name,
-            "confidence": round(float(proba[idx]) * 100, 2),
-        })
-    return results
 
+def _init_worker(threads: int) -> None:
+    """
+    Pool initializer: load the engine once and cap the n_jobs the models
+    were saved with. BLAS/OpenMP caps come from the env set by the parent
+    (thread_env) — too late to set here, numpy is already imported.
+    """
+    global _engine
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import app as engine
+    _engine = engine
+    models = engine.MODEL_MANAGER.current
+    estimators = []
+    if models.soil is not None:
+        estimators += [m for fold in models.soil.fold_models.values() for m in fold]
+        estimators.append(models.soil.meta_learner)
+    if models.extended is not None:
+        estimators.append(models.extended.model)
+    for est in estimators:
+        _cap_estimator_threads(est, threads)
 
-if __name__ == "__main__":
-    test_input = {
-        "N": 100, "P": 50, "K": 50,
-        "temperature": 28, "humidity": 85,
-        "ph": 6.5, "rainfall": 2000,
-        "soil_type": 2,  # clay
-        "irrigation": 1,  # irrigated
+
+def output_columns(keep_columns: List[str]) -> List[str]:
+    return ["row_id", *keep_columns, "status", "error", *RESULT_DTYPES]
+
+
+def _row_to_input(row: dict):
+    payload = {f: row[f] for f in INPUT_FIELDS if f in row and not pd.isna(row[f])}
+    for f in INT_FIELDS:
+        if f in payload:
+            payload[f] = int(payload[f])
+    return _engine.RecommendInput(**payload)
+
+
+def validate_chunk(df: pd.DataFrame) -> pd.Series:
+    """
+    First error per row (None when the row passes), checked column-wise
+    against the acceptance limits RecommendInput enforces. Rows that pass
+    still go through RecommendInput for defaults and the district fill.
+    """
+    errors = np.full(len(df), None, dtype=object)
+
+    def _flag(mask: pd.Series, message) -> None:
+        mask = mask.to_numpy() & (errors == None)  # noqa: E711 — elementwise
+        if mask.any():
+            errors[mask] = message if isinstance(message, str) else message.to_numpy()[mask]
+
+    has_district = (df["district"].notna() if "district" in df
+                    else pd.Series(False, index=df.index))
+    for field, limits in _engine._ACC.items():
+        if field not in INPUT_FIELDS:
+            continue
+        raw = df[field] if field in df else pd.Series(float("nan"), index=df.index)
+        values = pd.to_numeric(raw, errors="coerce")
+        present = raw.notna()
+        _flag(present & values.isna(), f"{field}: not a number")
+        if field in ("N", "P", "K", "ph"):
+            _flag(~present, f"{field}: required")
+        elif field in _engine.CLIMATE_FIELDS:
+            _flag(~present & ~has_district, f"{field}: required unless district is given")
+        out_of_range = values.notna() & ((values < limits["min"]) | (values > limits["max"]))
+        _flag(out_of_range, values.map(
+            lambda v: f"{field}: {v:g} outside [{limits['min']}, {limits['max']}]"))
+        if field in INT_FIELDS:
+            _flag(values.notna() & (values % 1 != 0), f"{field}: not an integer")
+    return pd.Series(errors, index=df.index, dtype=object)
+
+
+def _flatten(resp: dict) -> dict:
+    out = {
+        "status": "ok",
+        "fallback_mode": resp["fallback_mode"],
+        "global_unsuitable": resp["global_unsuitable"],
+        "viable_count": resp["viable_count"],
+        "season_used": resp["environment_info"]["season_used"],
+        "latency_ms": resp["latency_ms"],
     }
+    top = resp["top_recommendations"]
+    for rank in range(1, 4):
+        entry = top[rank - 1] if len(top) >= rank else {}
+        for field in TOP_FIELDS:
+            out[f"top{rank}_{field}"] = entry.get(field)
+    return out
+
+
+def _score_chunk(chunk_idx: int, df: pd.DataFrame, path: str,
+                 keep_columns: List[str]) -> Tuple[int, pd.DataFrame]:
+    errors = validate_chunk(df)
+    rows, inputs = [], []
+    for row_id, row, error in zip(df.index, df.to_dict("records"), errors):
+        base = {"row_id": row_id, **{c: row.get(c) for c in keep_columns}}
+        if error is None:
+            try:
+                inputs.append((len(rows), _row_to_input(row)))
+            except Exception as e:
+                error = str(e).splitlines()[0]
+        rows.append({**base, "status": "invalid", "error": error} if error else base)
+
+    batch = _engine.score_batch([inp for _, inp in inputs], path=path)
+    for (pos, inp), scores in zip(inputs, batch):
+        try:
+            rows[pos].update(_flatten(_engine._recommend_pipeline(inp, path=path, scores=scores)))
+        except Exception as e:
+            rows[pos].update(status="error", error=str(e))
+
+    out = pd.DataFrame(rows).reindex(columns=output_columns(keep_columns))
+    return chunk_idx, out.astype({"status": "string", "error": "string", **RESULT_DTYPES})
+
+
+# ===================================================================
+# INPUT / OUTPUT
+# ===================================================================
+
+def _is_parquet(path: str) -> bool:
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+def read_chunks(path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """Yield DataFrame chunks with a global row index (input row number)."""
+    offset = 0
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            df = batch.to_pandas()
+            df.index = pd.RangeIndex(offset, offset + len(df))
+            offset += len(df)
+            yield df
+    else:
+        for df in pd.read_csv(path, chunksize=chunksize, low_memory=False):
+            df.index = pd.RangeIndex(offset, offset + len(df))
+            offset += len(df)
+            yield df
+
+
+def count_rows(path: str) -> Optional[int]:
+    """Total rows when cheap to know (Parquet footer); None for CSV."""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    return None
+
 
+class ResultWriter:
+    """
+    Incremental, resumable output.
+
+    CSV:     one file; progress records its byte size after every chunk,
+             so a resume first truncates any half-written tail.
+    Parquet: a directory of part-NNNNN.parquet files (read back with
+             pd.read_parquet(dir)); a resume skips finished parts.
+    """
+
+    def __init__(self, path: str, resume: bool, meta: dict):
+        self.path = path
+        self.progress_path = path.rstrip("/") + ".progress.json"
+        self.parquet = _is_parquet(path)
+        self.state = {"chunks_done": 0, "rows_done": 0, "output_bytes": 0, **meta}
+
+        if resume and os.path.exists(self.progress_path):
+            with open(self.progress_path) as f:
+                saved = json.load(f)
+            for key, value in meta.items():
+                if saved.get(key) != value:
+                    raise SystemExit(f"Cannot resume: {key} changed "
+                                     f"({saved.get(key)!r} → {value!r})")
+            self.state = saved
+            if not self.parquet and os.path.exists(path):
+                with open(path, "r+b") as f:
+                    f.truncate(saved["output_bytes"])
+        else:
+            if self.parquet:
+                os.makedirs(path, exist_ok=True)
+                for name in os.listdir(path):
+                    if name.startswith("part-") and name.endswith(".parquet"):
+                        os.remove(os.path.join(path, name))
+            elif os.path.exists(path):
+                os.remove(path)
+
+    @property
+    def chunks_done(self) -> int:
+        return self.state["chunks_done"]
+
+    def write(self, chunk_idx: int, df: pd.DataFrame) -> None:
+        if self.parquet:
+            df.to_parquet(os.path.join(self.path, f"part-{chunk_idx:05d}.parquet"), index=False)
+        else:
+            df.to_csv(self.path, mode="a", header=self.state["output_bytes"] == 0, index=False)
+            self.state["output_bytes"] = os.path.getsize(self.path)
+        self.state["chunks_done"] = chunk_idx + 1
+        self.state["rows_done"] += len(df)
+        tmp = self.progress_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.progress_path)
+
+
+# ===================================================================
+# DRIVER
+# ===================================================================
+
+def run(args) -> dict:
+    cores = os.cpu_count() or 1
+    workers = args.workers or cores
+    threads = args.threads or max(1, cores // workers)
+    total = count_rows(args.input)
+    meta = {"input": os.path.abspath(args.input), "chunksize": args.chunksize,
+            "path": args.path, "keep_columns": args.keep_columns}
+    writer = ResultWriter(args.output, args.resume, meta)
+    skip = writer.chunks_done
+    if skip:
+        log.info(f"Resuming after {skip} chunk(s) / {writer.state['rows_done']:,} rows")
+
+    log.info(f"Scoring {args.input} → {args.output}  "
+             f"(workers={workers}, threads/worker={threads}, chunk={args.chunksize:,}, "
+             f"path={args.path})")
+
+    t0 = time.time()
+    rows_this_run = 0
+    invalid = 0
+    window = workers * 2
+    ctx = get_context("spawn")
+    with thread_env(threads), \
+            ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                initializer=_init_worker, initargs=(threads,)) as pool:
+        pending = {}
+        next_to_write = skip
+        chunks = enumerate(read_chunks(args.input, args.chunksize))
+
+        def _drain(block_until: int) -> None:
+            # Write finished chunks in input order; keep at most `block_until` in flight
+            nonlocal next_to_write, rows_this_run, invalid
+            while pending and (len(pending) > block_until or pending[next_to_write].done()):
+                _, out = pending.pop(next_to_write).result()
+                writer.write(next_to_write, out)
+                next_to_write += 1
+                rows_this_run += len(out)
+                invalid += int((out["status"] != "ok").sum())
+                elapsed = time.time() - t0
+                done = writer.state["rows_done"]
+                rate = rows_this_run / elapsed if elapsed else 0.0
+                eta = f", ETA {(total - done) / rate / 60:.1f} min" if total and rate else ""
+                log.info(f"    {done:,}{f'/{total:,}' if total else ''} rows  "
+                         f"{rate:,.1f} rows/s{eta}")
+
+        for idx, df in chunks:
+            if idx < skip:
+                continue
+            pending[idx] = pool.submit(_score_chunk, idx, df, args.path, args.keep_columns)
+            _drain(window)
+        _drain(0)
+
+    elapsed = time.time() - t0
+    summary = {
+        "rows": rows_this_run,
+        "rows_total": writer.state["rows_done"],
+        "not_scored": invalid,
+        "seconds": round(elapsed, 1),
+        "rows_per_sec": round(rows_this_run / elapsed, 1) if elapsed else 0.0,
+        "workers": workers,
+        "threads_per_worker": threads,
+    }
+    log.info(f"Done: {summary['rows']:,} rows in {summary['seconds']}s "
+             f"({summary['rows_per_sec']:,} rows/s, {invalid:,} invalid/error)")
+    return summary
+
+
+def demo() -> None:
+    """Score one example card in-process and print the advisory."""
+    _init_worker(threads=os.cpu_count() or 1)
+    row = _flatten(_engine._recommend_pipeline(_row_to_input(DEMO_INPUT), path="full"))
     print("\n" + "=" * 60)
-    print("PREDICTION DEMO (v2.2 — Calibrated)")
+    print("PREDICTION DEMO (advisory pipeline, same as /recommend)")
     print("=" * 60)
-    print("Input:")
-    for k, v in test_input.items():
-        if k == "soil_type":
-            print(f"  {k:12s}: {v} ({SOIL_REVERSE.get(v, '?')})")
-        elif k == "irrigation":
-            print(f"  {k:12s}: {v} ({IRRIG_REVERSE.get(v, '?')})")
-        else:
-            print(f"  {k:12s}: {v}")
-
-    results = predict_top_crops(test_input, top_n=5)
-    season = infer_season(test_input["temperature"])
-    print(f"\nInferred Season: {SEASON_REVERSE[season]}")
-    print("\nTop 5 Recommendations:")
-    for r in results:
-        print(f"  {r['rank']}. {r['crop']:20s} ({r['confidence']:.1f}%)")
+    for k, v in DEMO_INPUT.items():
+        print(f"  {k:12s}: {v}")
+    print(f"\nSeason used: {row['season_used']}")
+    for rank in range(1, 4):
+        if row[f"top{rank}_crop"]:
+            print(f"  {rank}. {row[f'top{rank}_crop']:20s} {row[f'top{rank}_confidence']:5.1f}%  "
+                  f"{row[f'top{rank}_advisory_tier']}  (NCS {row[f'top{rank}_ncs']}, "
+                  f"EMS {row[f'top{rank}_ems']})")
     print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-score CSV/Parquet files with the advisory pipeline.")
+    parser.add_argument("--input", help="CSV or Parquet file")
+    parser.add_argument("--output", help="CSV file, or Parquet directory (*.parquet)")
+    parser.add_argument("--chunksize", type=int, default=5000, help="rows per chunk / task")
+    parser.add_argument("--workers", type=int, default=0, help="processes (0 = all cores)")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="native threads per worker (0 = cores // workers)")
+    parser.add_argument("--path", choices=["full", "auto", "cheap"], default="full",
+                        help="pipeline path: full stack, cascade (auto) or RF only")
+    parser.add_argument("--keep-columns", nargs="*", default=[],
+                        help="input columns copied to the output (e.g. district sample_id)")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run")
+    parser.add_argument("--demo", action="store_true", help="score one example row and exit")
+    args = parser.parse_args()
+
+    if args.demo:
+        demo()
+        return
+    if not args.input or not args.output:
+        parser.error("--input and --output are required (or use --demo)")
+    if not os.path.exists(args.input):
+        raise SystemExit(f"Input not found: {args.input}")
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+SHAP Stage — parallel, chunked TreeExplainer aggregates with caching
+====================================================================
+Used by the SHAP steps of final_stacked_model.py and hybrid_model.py.
+
+  - Samples up to SHAP_SAMPLE_ROWS rows (default 10,000) and splits them
+    into chunks scored across a spawn process pool
+  - Each worker reduces its chunk to per-class sums of |SHAP| right away,
+    so the (rows × features × classes) tensor is never held in full;
+    peak memory is workers × one chunk
+  - The TreeExplainer is built once per model and stored under the
+    model's checksum; workers load it from disk instead of rebuilding it
+  - Results are cached by model checksum + sample digest, so re-running a
+    training step with the same fold model skips the SHAP pass entirely
+
+Usage (from a training script):
+    from shap_stage import shap_importance
+    res = shap_importance(model, X_test, feature_names, plot_rows=300)
+    res["mean_abs"]            # (features,)          mean |SHAP| over rows and classes
+    res["per_class_mean_abs"]  # (features, classes)  mean |SHAP| per class
+
+Writes:
+    .shap_cache/explainer-<model16>.joblib
+    .shap_cache/shap-<model16>-<sample16>.joblib
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import joblib
+import numpy as np
+
+from pipeline_common import thread_env
+
+log = logging.getLogger("shap_stage")
+
+BASE_DIR = Path(__file__).parent
+SHAP_CACHE_DIR = Path(os.getenv("SHAP_CACHE_DIR", str(BASE_DIR / ".shap_cache")))
+SHAP_CACHE_ENABLED = os.getenv("SHAP_CACHE", "1") == "1"
+SHAP_SAMPLE_ROWS = int(os.getenv("SHAP_SAMPLE_ROWS", "10000"))
+SHAP_CHUNK_ROWS = int(os.getenv("SHAP_CHUNK_ROWS", "500"))
+SHAP_WORKERS = int(os.getenv("SHAP_WORKERS", "0"))     # 0 = one per core, capped at the chunk count
+
+
+# ===================================================================
+# CHECKSUMS / CACHE
+# ===================================================================
+
+def model_checksum(model) -> str:
+    """sha256 of the pickled model — changes whenever any tree changes."""
+    return hashlib.sha256(pickle.dumps(model, protocol=4)).hexdigest()
+
+
+def _explainer_path(checksum: str) -> Path:
+    return SHAP_CACHE_DIR / f"explainer-{checksum[:16]}.joblib"
+
+
+def _result_path(checksum: str, sample_digest: str) -> Path:
+    return SHAP_CACHE_DIR / f"shap-{checksum[:16]}-{sample_digest[:16]}.joblib"
+
+
+def _atomic_dump(obj, path: Path) -> None:
+    tmp = path.with_suffix(f".tmp{os.getpid()}")
+    joblib.dump(obj, tmp, compress=3)
+    os.replace(tmp, path)
+
+
+def load_explainer(model, checksum: str, use_cache: bool = SHAP_CACHE_ENABLED):
+    """TreeExplainer for `model`, from the cache when one was stored for this checksum."""
+    import shap
+    path = _explainer_path(checksum)
+    if use_cache and path.exists():
+        try:
+            return joblib.load(path), path
+        except Exception as e:
+            log.warning(f"    cached explainer {path.name} unreadable ({e}), rebuilding")
+    explainer = shap.TreeExplainer(model)
+    if not use_cache:
+        return explainer, None
+    try:
+        SHAP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _atomic_dump(explainer, path)
+        return explainer, path
+    except Exception as e:
+        log.warning(f"    explainer not cacheable ({e}); workers rebuild it")
+        return explainer, None
+
+
+# ===================================================================
+# WORKERS
+# ===================================================================
+
+def _as_3d(shap_values) -> np.ndarray:
+    """(rows, features, outputs) whatever shape this shap version returns."""
+    if isinstance(shap_values, list):
+        return np.stack(shap_values, axis=-1)
+    values = np.asarray(shap_values)
+    return values[..., None] if values.ndim == 2 else values
+
+
+_explainer = None
+
+
+def _init_worker(explainer_path: Optional[str], model) -> None:
+    """Pool initializer: load the cached explainer once (or build it from the model)."""
+    global _explainer
+    if explainer_path:
+        _explainer = joblib.load(explainer_path)
+    else:
+        import shap
+        _explainer = shap.TreeExplainer(model)
+
+
+def _chunk_job(chunk_idx: int, X: np.ndarray, keep: int,
+               explainer=None) -> Tuple[int, np.ndarray, int, Optional[np.ndarray]]:
+    """Per-class |SHAP| sums for one chunk (+ the first `keep` rows' raw values for plots)."""
+    values = _as_3d((explainer or _explainer).shap_values(X, check_additivity=False))
+    return chunk_idx, np.abs(values).sum(axis=0), len(X), (values[:keep] if keep else None)
+
+
+# ===================================================================
+# DRIVER
+# ===================================================================
+
+def shap_importance(
+    model,
+    X: np.ndarray,
+    feature_names: Sequence[str],
+    sample_rows: int = SHAP_SAMPLE_ROWS,
+    chunk_rows: int = SHAP_CHUNK_ROWS,
+    workers: int = SHAP_WORKERS,
+    plot_rows: int = 0,
+    seed: int = 42,
+    use_cache: bool = SHAP_CACHE_ENABLED,
+) -> Dict[str, Any]:
+    """
+    Mean |SHAP| of `model` over a random sample of X, overall and per class.
+
+    The sample is drawn with `seed`, split into chunks of `chunk_rows` and
+    scored on `workers` processes (in-process when one worker suffices).
+    `plot_rows` raw SHAP rows (rows, features, classes) are kept for
+    summary plots. Raises ImportError when shap is not installed.
+    """
+    import shap
+
+    t0 = time.perf_counter()
+    X = np.asarray(X)
+    n = min(sample_rows, len(X))
+    idx = np.sort(np.random.RandomState(seed).choice(len(X), n, replace=False))
+    X_s = np.ascontiguousarray(X[idx])
+
+    checksum = model_checksum(model)
+    sample_digest = hashlib.sha256(X_s.tobytes() + f"{X_s.shape}|{shap.__version__}".encode()).hexdigest()
+    result_path = _result_path(checksum, sample_digest)
+    if use_cache and result_path.exists():
+        res = joblib.load(result_path)
+        kept = 0 if res["plot_values"] is None else len(res["plot_values"])
+        if kept >= min(plot_rows, res["rows"]):
+            log.info(f"    SHAP: reused {result_path.name} ({res['rows']:,} rows)")
+            return {**res, "cached": True, "seconds": round(time.perf_counter() - t0, 2)}
+
+    explainer, explainer_path = load_explainer(model, checksum, use_cache)
+    chunks = [X_s[i:i + chunk_rows] for i in range(0, n, chunk_rows)]
+    cores = os.cpu_count() or 1
+    workers = min(workers or cores, len(chunks))
+    threads = max(1, cores // workers)
+
+    keep = [max(0, min(len(c), plot_rows - i * chunk_rows)) for i, c in enumerate(chunks)]
+
+    sums, rows, plot_parts = None, 0, {}
+
+    def _collect(chunk_idx, s, k, raw):
+        nonlocal sums, rows
+        sums = s if sums is None else sums + s
+        rows += k
+        if raw is not None and len(raw):
+            plot_parts[chunk_idx] = raw
+
+    if workers <= 1:
+        for i, c in enumerate(chunks):
+            _collect(*_chunk_job(i, c, keep[i], explainer))
+    else:
+        with thread_env(threads), ProcessPoolExecutor(
+            max_workers=workers, mp_context=get_context("spawn"), initializer=_init_worker,
+            initargs=(str(explainer_path) if explainer_path else None,
+                      None if explainer_path else model),
+        ) as pool:
+            futures = [pool.submit(_chunk_job, i, c, keep[i]) for i, c in enumerate(chunks)]
+            for fut in as_completed(futures):
+                _collect(*fut.result())
+
+    per_class = sums / rows
+    plot_values = (np.concatenate([plot_parts[i] for i in sorted(plot_parts)])[:plot_rows]
+                   if plot_parts else None)
+    res = {
+        "mean_abs": per_class.mean(axis=1),
+        "per_class_mean_abs": per_class,
+        "feature_names": list(feature_names),
+        "rows": rows,
+        "chunks": len(chunks),
+        "workers": workers,
+        "model_checksum": checksum[:16],
+        "plot_values": plot_values,
+        "plot_X": X_s[:len(plot_values)] if plot_values is not None else None,
+    }
+    if use_cache:
+        SHAP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _atomic_dump(res, result_path)
+    seconds = round(time.perf_counter() - t0, 2)
+    log.info(f"    SHAP: {rows:,} rows in {len(chunks)} chunks on {workers} process(es), {seconds:.1f}s")
+    return {**res, "cached": False, "seconds": seconds}
+
+
+def per_class_pct(res: Dict[str, Any], class_names: List[str]) -> Dict[str, Dict[str, float]]:
+    """Per-class feature shares (%) — the bias-audit view of per_class_mean_abs."""
+    per_class = res["per_class_mean_abs"]
+    if per_class.shape[1] != len(class_names):
+        return {}
+    totals = per_class.sum(axis=0)
+    totals[totals == 0] = 1.0
+    pct = per_class / totals * 100
+    return {
+        c: {f: round(float(pct[i, j]), 2) for i, f in enumerate(res["feature_names"])}
+        for j, c in enumerate(class_names)
+    }
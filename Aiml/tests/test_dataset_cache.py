@@ -0,0 +1,34 @@
+"""
+dataset_cache.py tests: cache files are only replaced for their own source.
+
+    cd Aiml && python -m pytest -q tests
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dataset_cache  # noqa: E402
+
+
+def test_rebuild_keeps_other_sources(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(dataset_cache, "CACHE_DIR", cache_dir)
+    data, data_v2 = tmp_path / "data.csv", tmp_path / "data-v2.csv"
+    pd.DataFrame({"n": [1, 2], "crop": ["rice", "maize"]}).to_csv(data, index=False)
+    pd.DataFrame({"n": [3], "crop": ["wheat"]}).to_csv(data_v2, index=False)
+
+    dataset_cache.build(data)
+    v2 = dataset_cache.build(data_v2)
+    pd.DataFrame({"n": [5, 6, 7], "crop": ["rice", "maize", "jute"]}).to_csv(data, index=False)
+    rebuilt = dataset_cache.build(data)
+
+    names = sorted(p.name for p in cache_dir.iterdir())
+    assert names == sorted([f"data-{rebuilt['sha256'][:12]}.json", f"data-{rebuilt['sha256'][:12]}.parquet",
+                            f"data-v2-{v2['sha256'][:12]}.json", f"data-v2-{v2['sha256'][:12]}.parquet"])
+    assert len(dataset_cache.load_dataset(data_v2, use_cache=True)) == 1
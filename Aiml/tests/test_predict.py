@@ -0,0 +1,82 @@
+"""
+Bulk scorer (predict.py) tests.
+
+The model-backed calls (app.score_batch / app._recommend_pipeline) are
+stubbed; validation, chunk assembly and the resumable writer run for real.
+
+    cd Aiml && python -m pytest -q tests
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as engine  # noqa: E402
+import predict  # noqa: E402
+
+VALID = {"N": 80, "P": 40, "K": 40, "temperature": 25, "humidity": 70,
+         "ph": 6.5, "rainfall": 900, "sample_id": "ok"}
+
+
+def fake_response(data):
+    top = [{"crop": "rice", "confidence": 61.2, "advisory_tier": "Recommended",
+            "ncs": 55.0, "ncs_level": "strong", "ems": 0.2, "environmental_match": "strong"}]
+    return {"fallback_mode": False, "global_unsuitable": False, "viable_count": 4,
+            "environment_info": {"season_used": "Kharif"}, "latency_ms": 1.5,
+            "top_recommendations": top}
+
+
+@pytest.fixture
+def scorer(monkeypatch):
+    batches = []
+
+    def fake_batch(inputs, path="full", models=None):
+        batches.append(len(inputs))
+        return [{} for _ in inputs]
+
+    monkeypatch.setattr(engine, "score_batch", fake_batch)
+    monkeypatch.setattr(engine, "_recommend_pipeline",
+                        lambda data, path=None, scores=None: fake_response(data))
+    monkeypatch.setattr(predict, "_engine", engine)
+    return batches
+
+
+def test_validate_chunk(scorer):
+    df = pd.DataFrame([VALID, {**VALID, "ph": 14}, {**VALID, "N": None},
+                       {**VALID, "rainfall": None}, {**VALID, "season": 1.5}])
+    errors = predict.validate_chunk(df).tolist()
+    assert errors[0] is None
+    assert errors[1].startswith("ph: 14 outside")
+    assert errors[2] == "N: required"
+    assert errors[3] == "rainfall: required unless district is given"
+    assert errors[4] == "season: not an integer"
+
+
+@pytest.mark.parametrize("output", ["scored.csv", "scored.parquet"])
+def test_mixed_chunks_share_columns(tmp_path, scorer, output):
+    pytest.importorskip("pyarrow")
+    rows = [{**VALID, "ph": 14, "sample_id": "bad-1"}, {**VALID, "N": None, "sample_id": "bad-2"},
+            VALID, {**VALID, "K": -1, "sample_id": "bad-3"}, VALID]
+    src = tmp_path / "cards.csv"
+    pd.DataFrame(rows).to_csv(src, index=False)
+
+    out = str(tmp_path / output)
+    writer = predict.ResultWriter(out, resume=False, meta={})
+    # chunk 0 is all invalid, chunk 1 mixed, chunk 2 all valid
+    for idx, df in enumerate(predict.read_chunks(str(src), chunksize=2)):
+        _, scored = predict._score_chunk(idx, df, "full", ["sample_id"])
+        assert list(scored.columns) == predict.output_columns(["sample_id"])
+        writer.write(idx, scored)
+    assert scorer == [0, 1, 1]
+
+    result = pd.read_csv(out) if output.endswith(".csv") else pd.read_parquet(out)
+    assert list(result.columns) == predict.output_columns(["sample_id"])
+    assert result["row_id"].tolist() == [0, 1, 2, 3, 4]
+    assert result["status"].tolist() == ["invalid", "invalid", "ok", "invalid", "ok"]
+    assert result["sample_id"].tolist() == ["bad-1", "bad-2", "ok", "bad-3", "ok"]
+    assert result.loc[result["status"] == "ok", "top1_crop"].tolist() == ["rice", "rice"]
+    assert result.loc[result["status"] == "invalid", "top1_crop"].isna().all()
@@ -0,0 +1,177 @@
+"""
+Route-level tests for the engine endpoints that build their own bodies.
+
+They run without model files: precomputed tables and the climate index are
+written to a temp dir, and the model-backed search is stubbed where a
+route would otherwise need a loaded ModelSet.
+
+    cd Aiml && python -m pytest -q tests
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as engine  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(engine.app)
+
+
+@pytest.fixture
+def district_table(tmp_path, monkeypatch):
+    top = [{"crop": "rice", "confidence": 61.2, "advisory_tier": "Recommended"}]
+    table = {
+        "_meta": {"model_version": engine.MODEL_MANAGER.current.version, "generated": "2026-01-01"},
+        "districts": {
+            "west bengal/bardhaman": {"state": "West Bengal", "district": "Bardhaman",
+                                      "seasons": {"kharif": {"top_recommendations": top}}},
+        },
+        "by_district": {"bardhaman": ["west bengal/bardhaman"]},
+    }
+    path = tmp_path / "district_recommendations.json"
+    path.write_text(json.dumps(table))
+    monkeypatch.setattr(engine, "_DISTRICT_TABLE", engine.DistrictTable(str(path)))
+
+
+def test_district_recommendations(client, district_table):
+    resp = client.get("/district-recommendations", params={"district": "Bardhaman"})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["seasons"]["kharif"]["top_recommendations"][0]["crop"] == "rice"
+    assert body["disclaimer"] == engine.RECOMMEND_DISCLAIMER
+    assert body["stale"] is False
+
+
+def test_district_recommendations_unknown(client, district_table):
+    resp = client.get("/district-recommendations", params={"district": "Nowhere"})
+    assert resp.status_code == 404
+
+
+@pytest.fixture
+def climate_index(tmp_path, monkeypatch):
+    months = np.arange(1, 13, dtype=np.float32)
+    path = tmp_path / "climate_index.npz"
+    np.savez(path, keys=np.array(["west bengal/bardhaman"]), states=np.array(["West Bengal"]),
+             districts=np.array(["Bardhaman"]), temperature=(20 + months)[None],
+             rainfall=(10 * months)[None], humidity=np.full((1, 12), 70.0, dtype=np.float32),
+             meta=np.array(json.dumps({"districts": 1})))
+    monkeypatch.setattr(engine, "_CLIMATE_INDEX", engine.ClimateIndex(str(path)))
+
+
+SOIL = {"N": 80, "P": 40, "K": 40, "ph": 6.5}
+
+
+def test_recommend_without_climate_is_422(client):
+    resp = client.post("/recommend", json=SOIL)
+    assert resp.status_code == 422
+    assert "required unless district is given" in json.dumps(resp.json())
+
+
+def test_recommend_unknown_district_is_422(client, climate_index):
+    resp = client.post("/recommend", json={**SOIL, "district": "Nowhere"})
+    assert resp.status_code == 422
+    assert "not in the climate index" in json.dumps(resp.json())
+
+
+def test_climate_all_months(client, climate_index):
+    resp = client.get("/climate", params={"district": "Bardhaman"})
+    assert resp.status_code == 200
+    assert resp.json()["monthly"]["rainfall"] == [10.0 * m for m in range(1, 13)]
+
+
+def test_season_fill_within_feature_ranges(climate_index):
+    # rainfall is filled with the annual normal — the scale the models were trained on
+    for season in engine.SEASON_MONTHS:
+        filled = engine.RecommendInput(**SOIL, district="Bardhaman", season=season)
+        assert filled.rainfall == 10.0 * sum(range(1, 13))
+        for f in engine.CLIMATE_FIELDS:
+            fr = engine._V6_FEAT[f]
+            assert fr["min"] <= getattr(filled, f) <= fr["max"], (season, f)
+    assert all(engine.season_for_month(m) == s
+               for s, months in engine.SEASON_MONTHS.items() for m in months)
+
+
+def test_humidity_without_normals_is_not_filled(client, tmp_path, monkeypatch):
+    path = tmp_path / "climate_index.npz"
+    np.savez(path, keys=np.array(["west bengal/bardhaman"]), states=np.array(["West Bengal"]),
+             districts=np.array(["Bardhaman"]), temperature=np.full((1, 12), 25.0),
+             rainfall=np.full((1, 12), 100.0), humidity=np.full((1, 12), np.nan),
+             meta=np.array(json.dumps({"humidity": None})))
+    monkeypatch.setattr(engine, "_CLIMATE_INDEX", engine.ClimateIndex(str(path)))
+
+    resp = client.post("/recommend", json={**SOIL, "district": "Bardhaman"})
+    assert resp.status_code == 422
+    assert "humidity not in the climate index" in json.dumps(resp.json())
+    assert client.get("/climate", params={"district": "Bardhaman", "season": "rabi"}).json()["humidity"] is None
+    filled = engine.RecommendInput(**SOIL, humidity=65, district="Bardhaman", season=1)
+    assert (filled.humidity, filled.rainfall) == (65, 1200.0)
+
+
+def test_season_inferred_from_calendar(climate_index):
+    filled = engine.RecommendInput(**SOIL, district="Bardhaman")
+    assert filled.season is not None and filled.season_inferred
+    given = engine.RecommendInput(**SOIL, district="Bardhaman", season=2)
+    assert not given.season_inferred
+
+
+def test_optimize(client, monkeypatch):
+    def fake_search(data):
+        return {"target_crop": data.target_crop, "reached": True,
+                "suggested": {"inputs": {"N": 90.0}, "tier": "Recommended"},
+                "model_version": "test", "disclaimer": engine.RECOMMEND_DISCLAIMER}
+
+    monkeypatch.setattr(engine, "optimize_inputs", fake_search)
+    resp = client.post("/optimize", json={**SOIL, "temperature": 25, "humidity": 80,
+                                          "rainfall": 200, "target_crop": "rice"})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["suggested"]["inputs"] == {"N": 90.0}
+    assert body["disclaimer"] == engine.RECOMMEND_DISCLAIMER
+
+
+def test_single_flight_follower_budget():
+    assert engine.Deadline(None).plan() is None
+    assert engine.Deadline(10_000).plan() != engine.Deadline(1).plan()
+
+    flight = engine.SingleFlight()
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return "leader"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flight.run("k", slow))
+        await asyncio.sleep(0.05)
+        follower = await flight.run("k", lambda: "own", wait_s=0.05)
+        release.set()
+        return await leader, follower
+
+    (lead, lead_shared), (own, own_shared) = asyncio.run(scenario())
+    assert (lead, lead_shared) == ("leader", False)
+    assert (own, own_shared) == ("own", False)
+    assert flight.counts["follower_timeouts"] == 1
+
+
+def test_batched_agronomic_constraints_match_per_row():
+    rng = np.random.default_rng(0)
+    crops = sorted(engine.CROP_AGRO_CONSTRAINTS)[:12] + ["not-a-crop"]
+    proba = rng.dirichlet(np.ones(len(crops)), size=40)
+    X = pd.DataFrame({"ph": rng.uniform(3.5, 9.8, 40), "temperature": rng.uniform(-2, 50, 40),
+                             "rainfall": rng.uniform(0, 3000, 40), "humidity": rng.uniform(10, 100, 40)})
+    batch = engine.apply_agronomic_constraints_batch(proba, crops, X)
+    for i, row in enumerate(X.to_dict("records")):
+        expected, _ = engine.apply_agronomic_constraints(proba[i], crops, row)
+        np.testing.assert_allclose(batch[i], expected)
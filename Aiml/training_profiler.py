@@ -0,0 +1,328 @@
+"""
+Training Profiler — wall time, CPU and peak memory per step, fold and learner
+=============================================================================
+Used by final_stacked_model.py and hybrid_model.py.
+
+  - PROFILER.step(name) spans record wall time, CPU time (this process plus
+    finished child processes, e.g. the fold pool), peak RSS sampled in a
+    background thread and, with TRAIN_PROFILE_TRACEMALLOC=1, the peak of
+    Python-tracked allocations. Spans nest (a step and its sub-steps).
+  - Fold and learner jobs (pool workers or in-process fits) are measured
+    with job_stats(): wall/CPU, the job's own peak RSS sampled while it
+    runs and, with tracemalloc on, its Python allocation peak. The parent
+    files them with PROFILER.add_jobs(), which also rolls them up per
+    learner and per fold.
+  - PROFILER.finish() prints a summary table, compares it with the previous
+    run of the same script and stores both under "training_profile" in
+    training_metadata_v6.json.
+
+Peak RSS includes child processes when psutil is installed; otherwise it
+covers the main process only (Linux /proc).
+
+Regressions are steps that ran in both runs (not loaded from a checkpoint)
+and got more than REGRESSION_PCT slower / larger, by at least
+REGRESSION_MIN_S seconds or REGRESSION_MIN_MB MB.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+log = logging.getLogger("training_profiler")
+
+BASE_DIR = Path(__file__).parent
+METADATA_PATH = BASE_DIR / "training_metadata_v6.json"
+PROFILE_ENABLED = os.getenv("TRAIN_PROFILE", "1") == "1"
+TRACEMALLOC_ENABLED = os.getenv("TRAIN_PROFILE_TRACEMALLOC", "0") == "1"
+RSS_SAMPLE_S = 0.05
+REGRESSION_PCT = 20.0
+REGRESSION_MIN_S = 1.0
+REGRESSION_MIN_MB = 50.0
+METRICS = ("wall_s", "cpu_s", "peak_rss_mb")
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+
+# ===================================================================
+# MEASUREMENTS
+# ===================================================================
+
+def rss_mb(children: bool = True) -> float:
+    """Resident set size in MB (+ child processes with psutil; 0.0 where unavailable)."""
+    if HAS_PSUTIL:
+        try:
+            proc = psutil.Process()
+            total = proc.memory_info().rss
+            if children:
+                for child in proc.children(recursive=True):
+                    try:
+                        total += child.memory_info().rss
+                    except psutil.Error:
+                        pass
+            return total / 1024 ** 2
+        except psutil.Error:
+            return 0.0
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+
+
+def cpu_seconds() -> float:
+    """User + system CPU of this process and its reaped children."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+class _RssSampler(threading.Thread):
+    """Polls RSS and raises the peak of every open span."""
+
+    def __init__(self, active: List[Dict], children: bool = True):
+        super().__init__(name="rss-sampler", daemon=True)
+        self.active = active
+        self.children = children
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def sample(self) -> None:
+        now = rss_mb(self.children)
+        with self.lock:
+            for rec in self.active:
+                rec["peak_rss_mb"] = max(rec.get("peak_rss_mb", 0.0), now)
+
+    def run(self) -> None:
+        while not self.stop_event.wait(RSS_SAMPLE_S):
+            self.sample()
+
+
+def _reset_py_peak(active: List[Dict]) -> None:
+    """Carry the tracemalloc peak so far into the open spans, then start a new peak window."""
+    peak = tracemalloc.get_traced_memory()[1]
+    for outer in active:
+        outer["py_peak"] = max(outer.get("py_peak", 0), peak)
+    tracemalloc.reset_peak()
+
+
+@contextmanager
+def job_stats():
+    """
+    Measure one fold/learner job; yields the dict that receives its stats.
+
+    peak_rss_mb is this process's RSS polled by a sampler thread for the
+    length of the job (pool workers are reused, so ru_maxrss would carry
+    over from earlier jobs). py_peak_mb is the tracemalloc peak within the
+    job when TRAIN_PROFILE_TRACEMALLOC=1 — pool workers inherit the env
+    and start tracing themselves.
+    """
+    stats: Dict[str, float] = {}
+    if PROFILE_ENABLED and TRACEMALLOC_ENABLED and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if tracemalloc.is_tracing():
+        _reset_py_peak(PROFILER._active)
+    sampler = _RssSampler([stats], children=False)
+    sampler.sample()
+    sampler.start()
+    w0, c0 = time.perf_counter(), time.process_time()
+    try:
+        yield stats
+    finally:
+        stats["wall_s"] = round(time.perf_counter() - w0, 2)
+        stats["cpu_s"] = round(time.process_time() - c0, 2)
+        sampler.stop_event.set()
+        sampler.join()
+        sampler.sample()
+        stats["peak_rss_mb"] = round(stats["peak_rss_mb"], 1)
+        if tracemalloc.is_tracing():
+            stats["py_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 1)
+
+
+# ===================================================================
+# PROFILER
+# ===================================================================
+
+class TrainingProfiler:
+    """Flat, ordered record of (possibly nested) spans plus per-job stats."""
+
+    def __init__(self):
+        self.script: Optional[str] = None
+        self.enabled = False
+        self.spans: Dict[str, Dict[str, Any]] = {}
+        self.jobs: Dict[str, Dict[str, Dict]] = {}
+        self._active: List[Dict] = []
+        self._sampler: Optional[_RssSampler] = None
+
+    def start(self, script: str, enabled: bool = PROFILE_ENABLED) -> None:
+        self.script = script
+        self.enabled = enabled
+        self._t0 = time.perf_counter()
+        self._cpu0 = cpu_seconds()
+        if not enabled:
+            return
+        if TRACEMALLOC_ENABLED and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._sampler = _RssSampler(self._active)
+        self._sampler.start()
+
+    @contextmanager
+    def step(self, name: str):
+        """Measure a block; yields a dict the caller may annotate (e.g. status)."""
+        rec: Dict[str, Any] = {}
+        if not self.enabled:
+            yield rec
+            return
+        path = " › ".join([r["name"] for r in self._active] + [name])
+        rec.update(name=name, depth=len(self._active), status="ran")
+        self.spans[path] = rec  # reserve the slot so parents list before their sub-steps
+        if tracemalloc.is_tracing():
+            _reset_py_peak(self._active)
+        with self._sampler.lock:
+            self._active.append(rec)
+        self._sampler.sample()
+        w0, c0 = time.perf_counter(), cpu_seconds()
+        try:
+            yield rec
+        finally:
+            rec["wall_s"] = round(time.perf_counter() - w0, 2)
+            rec["cpu_s"] = round(cpu_seconds() - c0, 2)
+            self._sampler.sample()
+            with self._sampler.lock:
+                self._active.remove(rec)
+            rec["peak_rss_mb"] = round(rec.get("peak_rss_mb", 0.0), 1)
+            if tracemalloc.is_tracing():
+                peak = max(rec.pop("py_peak", 0), tracemalloc.get_traced_memory()[1])
+                rec["py_peak_mb"] = round(peak / 1024 ** 2, 1)
+                for outer in self._active:
+                    outer["py_peak"] = max(outer.get("py_peak", 0), peak)
+            self.spans[path] = {k: v for k, v in rec.items() if k != "name"}
+
+    def add_jobs(self, step: str, jobs: Dict[str, Dict]) -> None:
+        """Per-job stats keyed "<learner>/<fold>" (as filled in by job_stats)."""
+        if self.enabled:
+            self.jobs[step] = jobs
+
+    # ── reporting ────────────────────────────────────────────────────
+
+    def _rollups(self) -> Dict[str, Dict[str, Dict]]:
+        out = {}
+        for step, jobs in self.jobs.items():
+            by = {"learner": {}, "fold": {}}
+            for key, stats in jobs.items():
+                learner, fold = key.split("/", 1)
+                for axis, group in (("learner", learner), ("fold", fold)):
+                    agg = by[axis].setdefault(group, {"jobs": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_rss_mb": 0.0})
+                    agg["jobs"] += 1
+                    agg["wall_s"] = round(agg["wall_s"] + stats["wall_s"], 2)
+                    agg["cpu_s"] = round(agg["cpu_s"] + stats["cpu_s"], 2)
+                    agg["peak_rss_mb"] = max(agg["peak_rss_mb"], stats["peak_rss_mb"])
+                    if "py_peak_mb" in stats:
+                        agg["py_peak_mb"] = max(agg.get("py_peak_mb", 0.0), stats["py_peak_mb"])
+            out[step] = {"jobs": jobs, "per_learner": by["learner"], "per_fold": by["fold"]}
+        return out
+
+    def profile(self) -> Dict[str, Any]:
+        return {
+            "date": datetime.now(timezone.utc).isoformat(),
+            "total_wall_s": round(time.perf_counter() - self._t0, 2),
+            "total_cpu_s": round(cpu_seconds() - self._cpu0, 2),
+            "cores": os.cpu_count(),
+            "rss_includes_children": HAS_PSUTIL,
+            "tracemalloc": tracemalloc.is_tracing(),
+            "steps": self.spans,
+            "fold_jobs": self._rollups(),
+        }
+
+    @staticmethod
+    def compare(current: Dict, previous: Optional[Dict]) -> Dict[str, Any]:
+        """Per-span deltas vs the previous run; regressions only where both runs executed the span."""
+        if not previous:
+            return {"previous_date": None, "deltas": {}, "regressions": []}
+        deltas, regressions = {}, []
+        for path, now in current["steps"].items():
+            before = previous.get("steps", {}).get(path)
+            if not before or now.get("status") == "cached" or before.get("status") == "cached":
+                continue
+            d = {}
+            for metric in METRICS:
+                a, b = before.get(metric), now.get(metric)
+                if a is None or b is None:
+                    continue
+                d[metric] = {"previous": a, "current": b,
+                             "change_pct": round((b - a) / a * 100, 1) if a else None}
+                floor = REGRESSION_MIN_MB if metric == "peak_rss_mb" else REGRESSION_MIN_S
+                if b - a >= floor and (not a or (b - a) / a * 100 > REGRESSION_PCT):
+                    regressions.append({"step": path, "metric": metric, **d[metric]})
+            deltas[path] = d
+        return {"previous_date": previous.get("date"),
+                "previous_total_wall_s": previous.get("total_wall_s"),
+                "deltas": deltas, "regressions": regressions}
+
+    def log_summary(self, profile: Dict, comparison: Dict) -> None:
+        log.info("")
+        log.info("  ── Training profile")
+        log.info(f"    {'Step':34s} {'Status':>7s} {'Wall s':>8s} {'CPU s':>8s} {'Peak RSS':>9s} "
+                 f"{'Py peak':>8s} {'Δ wall':>8s}")
+        log.info(f"    {'─' * 34} {'─' * 7} {'─' * 8} {'─' * 8} {'─' * 9} {'─' * 8} {'─' * 8}")
+        for path, rec in profile["steps"].items():
+            label = ("  " * rec["depth"] + path.split(" › ")[-1])[:34]
+            change = comparison["deltas"].get(path, {}).get("wall_s", {}).get("change_pct")
+            py = f"{rec['py_peak_mb']:.0f} MB" if "py_peak_mb" in rec else "—"
+            log.info(f"    {label:34s} {rec['status']:>7s} {rec['wall_s']:8.1f} {rec['cpu_s']:8.1f} "
+                     f"{rec['peak_rss_mb']:6.0f} MB {py:>8s} "
+                     f"{(f'{change:+.0f}%' if change is not None else '—'):>8s}")
+        log.info(f"    {'TOTAL':34s} {'':>7s} {profile['total_wall_s']:8.1f} {profile['total_cpu_s']:8.1f}")
+
+        for step, roll in profile["fold_jobs"].items():
+            for axis in ("per_learner", "per_fold"):
+                log.info(f"    {step} {axis.replace('_', ' ')}:")
+                for group, agg in roll[axis].items():
+                    py = f" {agg['py_peak_mb']:7.0f} MB py peak" if "py_peak_mb" in agg else ""
+                    log.info(f"      {group:12s} {agg['jobs']:3d} job(s) {agg['wall_s']:8.1f}s wall "
+                             f"{agg['cpu_s']:8.1f}s CPU {agg['peak_rss_mb']:7.0f} MB peak{py}")
+
+        if comparison["previous_date"] is None:
+            log.info("    No previous profile for this script — nothing to compare")
+        elif comparison["regressions"]:
+            for r in comparison["regressions"]:
+                log.warning(f"    ⚠ Regression: {r['step']} {r['metric']} "
+                            f"{r['previous']} → {r['current']} ({r['change_pct']:+.0f}%)")
+        else:
+            log.info(f"    ✓ No regressions vs run of {comparison['previous_date']}")
+
+    def finish(self, path: Path = METADATA_PATH) -> Optional[Dict]:
+        """Log the summary, compare with the previous run and store the profile in `path`."""
+        if not self.enabled:
+            return None
+        self._sampler.stop_event.set()
+        profile = self.profile()
+        metadata = {}
+        if path.exists():
+            with open(path) as f:
+                metadata = json.load(f)
+        profiles = metadata.setdefault("training_profile", {})
+        comparison = self.compare(profile, profiles.get(self.script))
+        self.log_summary(profile, comparison)
+
+        profile["comparison"] = comparison
+        profiles[self.script] = profile
+        tmp = path.with_suffix(f".tmp{os.getpid()}")
+        with open(tmp, "w") as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(tmp, path)
+        log.info(f"    Profile saved under training_profile.{self.script} in {path.name}")
+        return profile
+
+
+PROFILER = TrainingProfiler()
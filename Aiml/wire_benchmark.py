@@ -0,0 +1,169 @@
+"""
+Wire Format Benchmark — JSON vs MessagePack (± gzip)
+====================================================
+Measures the cost of the negotiated response encodings in app.py on real
+/recommend and /predict responses.
+
+Responses are produced once per synthetic input (training-mean conditions
+for each crop, as used by the warm-up), then every format is timed on the
+same bodies:
+  - encode_us   — engine side: dict → bytes (+ gzip)
+  - decode_us   — backend side: bytes → dict (gunzip +) parse
+  - bytes       — payload on the wire
+
+It also reports the share of request time spent rendering JSON, before
+(FastAPI default: jsonable_encoder + stdlib JSONResponse) and after
+(render_json with orjson and pre-encoded fragments).
+
+Usage:
+    python wire_benchmark.py --repeat 50
+
+Writes:
+    wire_benchmark.json
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import app as engine
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s  %(levelname)-8s  %(message)s",
+    datefmt="%H:%M:%S",
+)
+log = logging.getLogger("wire_benchmark")
+
+REPORT_OUT = "wire_benchmark.json"
+FORMATS = ["json", "json+gzip", "msgpack", "msgpack+gzip"]
+
+
+def _encode(body: dict, fmt: str) -> bytes:
+    base, _, packed = fmt.partition("+")
+    payload = engine.encode_body(body, base)
+    if packed:
+        payload = gzip.compress(payload, compresslevel=engine.WIRE_GZIP_LEVEL)
+    return payload
+
+
+def _decode(payload: bytes, fmt: str) -> dict:
+    base, _, packed = fmt.partition("+")
+    if packed:
+        payload = gzip.decompress(payload)
+    if base == "msgpack":
+        return engine.msgpack.unpackb(payload, raw=False)
+    return json.loads(payload)
+
+
+def _time_us(fn, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def benchmark(bodies: list, repeat: int) -> dict:
+    results = {}
+    for fmt in FORMATS:
+        enc_us, dec_us, sizes = [], [], []
+        for body in bodies:
+            payload = _encode(body, fmt)
+            sizes.append(len(payload))
+            enc_us.append(_time_us(lambda: _encode(body, fmt), repeat))
+            dec_us.append(_time_us(lambda: _decode(payload, fmt), repeat))
+        results[fmt] = {
+            "bytes_mean": round(float(np.mean(sizes)), 1),
+            "encode_us_mean": round(float(np.mean(enc_us)), 1),
+            "decode_us_mean": round(float(np.mean(dec_us)), 1),
+            "encode_us_p95": round(float(np.percentile(enc_us, 95)), 1),
+            "decode_us_p95": round(float(np.percentile(dec_us, 95)), 1),
+        }
+
+    base = results["json"]
+    for fmt, r in results.items():
+        r["bytes_vs_json"] = round(r["bytes_mean"] / base["bytes_mean"], 3)
+        r["roundtrip_vs_json"] = round(
+            (r["encode_us_mean"] + r["decode_us_mean"])
+            / (base["encode_us_mean"] + base["decode_us_mean"]), 3)
+    return results
+
+
+def serialization_share(bodies: list, pipeline_ms: list, repeat: int) -> dict:
+    renderers = {
+        "default": lambda b: JSONResponse(content=jsonable_encoder(b)).body,
+        "fast": lambda b: engine.encode_body(b, "json"),
+    }
+    out = {"pipeline_ms_mean": round(float(np.mean(pipeline_ms)), 2)}
+    for name, render in renderers.items():
+        enc_ms = [_time_us(lambda: render(body), repeat) / 1000 for body in bodies]
+        share = [e / (e + p) for e, p in zip(enc_ms, pipeline_ms)]
+        out[name] = {
+            "encode_ms_mean": round(float(np.mean(enc_ms)), 3),
+            "share_of_request": round(float(np.mean(share)), 4),
+        }
+    out["speedup"] = round(out["default"]["encode_ms_mean"]
+                           / max(out["fast"]["encode_ms_mean"], 1e-9), 2)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /recommend and /predict wire formats.")
+    parser.add_argument("--repeat", type=int, default=50, help="timing repetitions per body")
+    parser.add_argument("--crops", type=int, default=0, help="synthetic inputs (0 = one per crop)")
+    parser.add_argument("--out", default=REPORT_OUT)
+    args = parser.parse_args()
+
+    if engine.msgpack is None:
+        raise SystemExit("msgpack is not installed (pip install msgpack)")
+
+    inputs = engine._synthetic_inputs(args.crops or None)
+    log.info(f"Building responses for {len(inputs)} synthetic inputs")
+    pipelines = {
+        "recommend": lambda p: engine._recommend_pipeline(engine.RecommendInput(**p), path="full"),
+        "predict": lambda p: engine._predict_pipeline(engine.PredictionInput(**p, mode="both")),
+    }
+    endpoints, pipeline_ms = {}, {}
+    for name, run in pipelines.items():
+        endpoints[name], pipeline_ms[name] = [], []
+        for p in inputs:
+            t0 = time.perf_counter()
+            endpoints[name].append(run(p))
+            pipeline_ms[name].append((time.perf_counter() - t0) * 1000)
+
+    report = {"endpoints": {}, "serialization": {}}
+    for name, bodies in endpoints.items():
+        report["endpoints"][name] = benchmark(bodies, args.repeat)
+        share = serialization_share(bodies, pipeline_ms[name], args.repeat)
+        report["serialization"][name] = share
+        log.info(f"  /{name} JSON render: default {share['default']['encode_ms_mean']:.3f} ms "
+                 f"({share['default']['share_of_request'] * 100:.1f}% of request) → "
+                 f"fast {share['fast']['encode_ms_mean']:.3f} ms "
+                 f"({share['fast']['share_of_request'] * 100:.1f}%), ×{share['speedup']}")
+        log.info(f"  /{name}")
+        log.info(f"    {'format':<14s} {'bytes':>8s} {'enc µs':>8s} {'dec µs':>8s} {'size':>6s} {'rt':>6s}")
+        for fmt, r in report["endpoints"][name].items():
+            log.info(f"    {fmt:<14s} {r['bytes_mean']:8.0f} {r['encode_us_mean']:8.1f} "
+                     f"{r['decode_us_mean']:8.1f} {r['bytes_vs_json']:6.2f} {r['roundtrip_vs_json']:6.2f}")
+
+    report.update({
+        "inputs": len(inputs),
+        "repeat": args.repeat,
+        "gzip_level": engine.WIRE_GZIP_LEVEL,
+        "orjson": engine.orjson is not None,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    })
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    log.info(f"Saved: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
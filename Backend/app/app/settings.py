@@ -192,6 +192,14 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 HF_MODEL_URL = os.environ.get("HF_MODEL_URL") or os.environ.get("HF_API_URL") or "https://shingala-crs.hf.space"
 HF_TOKEN = os.environ.get("HF_TOKEN", "")
+# Response encoding requested from the ML engine: "json" (default) or
+# "msgpack" (needs the msgpack package; falls back to JSON otherwise).
+HF_WIRE_FORMAT = os.environ.get("HF_WIRE_FORMAT", "json").lower()
+# gzip is what requests asks for anyway; "False" sends Accept-Encoding: identity.
+HF_WIRE_GZIP = os.environ.get("HF_WIRE_GZIP", "True").lower() in ("true", "1", "yes")
+# Overall time (seconds) one /recommend call may take, retries included. The
+# engine is told what is left so it can skip optional stages in time.
+HF_RECOMMEND_BUDGET_S = float(os.environ.get("HF_RECOMMEND_BUDGET_S", "20"))
 
 
 # =============================================================================
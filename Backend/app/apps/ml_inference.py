@@ -48,7 +48,7 @@ def _tier_to_risk(tier: str) -> str:
 # V7 Unified recommendation (calls /recommend)
 # ═════════════════════════════════════════════════════════════════════════
 
-def _recommend_via_hf(payload: dict) -> Optional[Dict]:
+def _recommend_via_hf(payload: dict, deadline: Optional[float] = None) -> Optional[Dict]:
     """
     Call HuggingFace Space /recommend and normalise the response
     to the format expected by views.py.
@@ -68,7 +68,7 @@ def _recommend_via_hf(payload: dict) -> Optional[Dict]:
         "warning": "..."
     }
     """
-    hf_resp = call_hf_recommend(payload)
+    hf_resp = call_hf_recommend(payload, deadline)
     if hf_resp is None:
         return None
 
@@ -115,6 +115,8 @@ def _recommend_via_hf(payload: dict) -> Optional[Dict]:
         result["viable_count"] = hf_resp["viable_count"]
     if "excluded_crops" in hf_resp:
         result["excluded_crops"] = hf_resp["excluded_crops"]
+    if hf_resp.get("skipped_stages"):
+        result["skipped_stages"] = hf_resp["skipped_stages"]
 
     warning = hf_resp.get("warning")
     if warning:
@@ -180,10 +182,12 @@ def recommend_crops(
     soil_type: int = 1,
     irrigation: int = 0,
     moisture: float = 43.5,
+    deadline: Optional[float] = None,
 ) -> dict:
     """
     V7 unified recommendation — calls /recommend (no mode).
     All 3 models run internally; returns aggregated top-3.
+    *deadline* (time.monotonic()) bounds the HF call, retries included.
     """
     payload = {
         "N": n, "P": p, "K": k,
@@ -196,7 +200,7 @@ def recommend_crops(
         "irrigation": irrigation,
     }
 
-    result = _recommend_via_hf(payload)
+    result = _recommend_via_hf(payload, deadline)
     if result is not None:
         return result
 
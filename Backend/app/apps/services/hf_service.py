@@ -5,16 +5,28 @@ Calls the HuggingFace Space with timeout and error handling.
 """
 
 import logging
+import time
 from typing import Optional
 
 import requests
 from django.conf import settings
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 logger = logging.getLogger(__name__)
 
 _MAX_RETRIES = 2
 _TIMEOUT = 30  # seconds (increased for HF cold starts)
 
+# Remaining caller budget (ms) sent with each /recommend attempt so the ML
+# engine can skip optional stages instead of answering after we gave up.
+_DEADLINE_HEADER = "X-Deadline-Ms"
+
+_MSGPACK_MEDIA = "application/msgpack"
+
 
 def _get_hf_url() -> str:
     """Return the HF /predict endpoint URL from settings."""
@@ -40,9 +52,29 @@ def _get_hf_headers() -> dict:
     token = getattr(settings, "HF_TOKEN", "") or ""
     if token:
         headers["Authorization"] = f"Bearer {token}"
+    headers.update(_get_wire_headers())
+    return headers
+
+
+def _get_wire_headers() -> dict:
+    """Negotiate the response encoding (HF_WIRE_FORMAT / HF_WIRE_GZIP)."""
+    headers = {}
+    if getattr(settings, "HF_WIRE_FORMAT", "json") == "msgpack" and msgpack is not None:
+        headers["Accept"] = f"{_MSGPACK_MEDIA}, application/json;q=0.5"
+    # requests already asks for gzip/deflate; only opt out when configured to
+    if not getattr(settings, "HF_WIRE_GZIP", True):
+        headers["Accept-Encoding"] = "identity"
     return headers
 
 
+def _decode_response(resp: requests.Response) -> dict:
+    """Parse a MessagePack or JSON body (gzip is undone by requests)."""
+    content_type = resp.headers.get("Content-Type", "")
+    if msgpack is not None and content_type.startswith(_MSGPACK_MEDIA):
+        return msgpack.unpackb(resp.content, raw=False)
+    return resp.json()
+
+
 def call_hf_model(payload: dict) -> Optional[dict]:
     """
     POST *payload* to the HuggingFace Space /predict endpoint.
@@ -66,7 +98,7 @@ def call_hf_model(payload: dict) -> Optional[dict]:
         try:
             resp = requests.post(url, json=payload, headers=headers, timeout=_TIMEOUT)
             resp.raise_for_status()
-            return resp.json()
+            return _decode_response(resp)
         except requests.exceptions.Timeout:
             logger.warning("HF call attempt %d/%d timed out", attempt, _MAX_RETRIES)
             last_exc = TimeoutError("ML service timeout")
@@ -81,7 +113,7 @@ def call_hf_model(payload: dict) -> Optional[dict]:
             # caller can decide what to do instead of blindly retrying.
             if exc.response is not None and 400 <= exc.response.status_code < 500:
                 try:
-                    return exc.response.json()
+                    return _decode_response(exc.response)
                 except Exception:
                     pass
             last_exc = ConnectionError(f"ML service error: HTTP {status_code}")
@@ -93,20 +125,32 @@ def call_hf_model(payload: dict) -> Optional[dict]:
     return None
 
 
-def call_hf_recommend(payload: dict) -> Optional[dict]:
+def call_hf_recommend(payload: dict, deadline: Optional[float] = None) -> Optional[dict]:
     """
     POST *payload* to the HuggingFace Space /recommend endpoint (V7 unified).
     Same retry logic as call_hf_model but targets the /recommend route.
+
+    *deadline* is a time.monotonic() instant set by the caller; without one
+    the call gets HF_RECOMMEND_BUDGET_S from now. Each attempt is sent with
+    the budget it has left (at most _TIMEOUT) in the X-Deadline-Ms header
+    and uses it as its read timeout.
     """
     url = _get_hf_recommend_url()
     headers = _get_hf_headers()
     last_exc: Optional[Exception] = None
+    if deadline is None:
+        deadline = time.monotonic() + getattr(settings, "HF_RECOMMEND_BUDGET_S", _TIMEOUT)
 
     for attempt in range(1, _MAX_RETRIES + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        attempt_timeout = min(_TIMEOUT, remaining)
+        attempt_headers = {**headers, _DEADLINE_HEADER: str(int(attempt_timeout * 1000))}
         try:
-            resp = requests.post(url, json=payload, headers=headers, timeout=_TIMEOUT)
+            resp = requests.post(url, json=payload, headers=attempt_headers, timeout=attempt_timeout)
             resp.raise_for_status()
-            return resp.json()
+            return _decode_response(resp)
         except requests.exceptions.Timeout:
             logger.warning("HF /recommend attempt %d/%d timed out", attempt, _MAX_RETRIES)
             last_exc = TimeoutError("ML service timeout")
@@ -118,7 +162,7 @@ def call_hf_recommend(payload: dict) -> Optional[dict]:
             logger.error("HF /recommend attempt %d/%d HTTP %s", attempt, _MAX_RETRIES, status_code)
             if exc.response is not None and 400 <= exc.response.status_code < 500:
                 try:
-                    return exc.response.json()
+                    return _decode_response(exc.response)
                 except Exception:
                     pass
             last_exc = ConnectionError(f"ML service error: HTTP {status_code}")
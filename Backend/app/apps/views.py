@@ -10,6 +10,7 @@ V10 Unified Advisory:
 import csv
 import logging
 import os
+import time
 import requests
 
 from django.conf import settings
@@ -83,6 +84,9 @@ class CropPredictionView(APIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
+        # The ML budget counts from the request's arrival, not from the HF call
+        deadline = time.monotonic() + settings.HF_RECOMMEND_BUDGET_S
+
         # Use enhanced secure validation
         serializer = SecurePredictionSerializer(data=request.data)
         if not serializer.is_valid():
@@ -112,6 +116,7 @@ class CropPredictionView(APIView):
                 soil_type=vd.get("soil_type", 1),
                 irrigation=vd.get("irrigation", 0),
                 moisture=vd.get("moisture", 43.5),
+                deadline=deadline,
             )
 
             # Enrich top_3 with DB metadata (images, yield, season)
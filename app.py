@@ -7,6 +7,7 @@ from __future__ import annotations
 
 import importlib.util
 import os
+import sys
 from pathlib import Path
 
 AIML_DIR = Path(__file__).resolve().parent / "Aiml"
@@ -17,6 +18,8 @@ if not AIML_APP.exists():
 
 # Ensure relative file loads inside Aiml/app.py work (joblib/csv paths, etc.).
 os.chdir(str(AIML_DIR))
+# ...and sibling imports such as logging_config.
+sys.path.insert(0, str(AIML_DIR))
 
 spec = importlib.util.spec_from_file_location("aiml_app", str(AIML_APP))
 if spec is None or spec.loader is None: